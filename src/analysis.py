@@ -1,23 +1,30 @@
 """File where the programs are stored"""
 
-
+import datetime as dt
 import logging
 from pathlib import Path
+from typing import List, Optional
 
 import coloredlogs
 
 from src import log_program
 from src.data.arxiv import compose_arxiv_query, dl_bulk_data_manifest, download_source_code, explore_bucket_metadata
-from src.data.dbutils import load_sql_engine
-from src.data.intermediate import extract_sql_to_df, metadata_to_sql_db
+from src.data.dbutils import DEFAULT_ENGINE_PROFILE, load_sql_engine
+from src.data.harvester import harvest_arxiv_query
+from src.data.intermediate import DEFAULT_BATCH_SIZE, extract_sql_to_df, metadata_to_sql_db
+from src.data.metadata_store import migrate_json_folder
 from src.data.ml4physics import extract_ml4physics
 from src.data.neurips import (
+    METADATA_STORE_DIR,
     MongoCreds,
     download_neurips_bibtex,
     download_neurips_papers,
     get_neurips_hashs,
     save_neurips_metadata,
 )
+from src.data.neurips_crawler import crawl_neurips as crawl_neurips_papers
+from src.data.query_planner import harvest_arxiv_windows
+from src.data.schema import upgrade_schema
 from src.features.extract_words import extract_keywords
 from src.visualization.wordcloud import feature_wordcloud
 
@@ -36,7 +43,9 @@ def download_metadata(dest_folder: Path):
 
 
 @log_program("Downloading Neurips Metadata JSON", timeit=True)
-def get_neurips_metadata(metadata_csv: Path, mongo_uri: str = "", mongo_host: str = "", mongo_port: int = 0) -> None:
+def get_neurips_metadata(
+    metadata_csv: Path, mongo_uri: str = "", mongo_host: str = "", mongo_port: int = 0, concurrency: int = 1
+) -> None:
     mongo_creds = None
     if mongo_uri:
         logger.info(f"Registering metadata in MongoDB Atlas cluster\nURI:{mongo_uri}")
@@ -47,7 +56,25 @@ def get_neurips_metadata(metadata_csv: Path, mongo_uri: str = "", mongo_host: st
     else:
         logger.info("No MongoDB creds found. Saving locally.")
 
-    save_neurips_metadata(hash_csv=metadata_csv, mongo_creds=mongo_creds)
+    save_neurips_metadata(hash_csv=metadata_csv, mongo_creds=mongo_creds, concurrency=concurrency)
+
+
+@log_program("Downloading Neurips files", timeit=True)
+def get_neurips_files(hash_csv: Path, target_folder: Path, kind: str = "pdf", workers: int = 8) -> None:
+    if kind == "pdf":
+        download_neurips_papers(target_folder, hash_csv=hash_csv, workers=workers)
+    else:
+        download_neurips_bibtex(target_folder, hash_csv=hash_csv, workers=workers)
+
+
+@log_program("Crawling Neurips papers", timeit=True)
+def crawl_neurips(hash_csv: Path, target_folder: Path, artifacts: List[str], workers: int = 8) -> None:
+    crawl_neurips_papers(target_folder, hash_csv=hash_csv, artifacts=artifacts, workers=workers)
+
+
+@log_program("Migrating Neurips metadata", timeit=True)
+def migrate_neurips_metadata(json_folder: Path, store_dir: Optional[Path] = None) -> None:
+    migrate_json_folder(json_folder, store_dir or METADATA_STORE_DIR)
 
 
 def get_keywords(csv_file: Path, n_grams: int, save_folder: Path):
@@ -65,26 +92,66 @@ def get_keywords(csv_file: Path, n_grams: int, save_folder: Path):
 
 
 @log_program("Downloading Neurips Metadata JSON", timeit=True)
-def send_neurips_to_sql_db(json_path, option):
+def send_neurips_to_sql_db(
+    json_path, option, batch_size: int = DEFAULT_BATCH_SIZE, workers: int = 0, profile: str = "bulk-load"
+):
     logger.info("Connecting to SQLite3 DB by default")
-    engine = load_sql_engine()
+    engine = load_sql_engine(profile=profile)
+    logger.info(f"Using DB: {engine.url}")
+    metadata_to_sql_db(json_folder=json_path, sql_engine=engine, options=option, batch_size=batch_size, workers=workers)
+
+
+@log_program("Migrating the database schema", timeit=True)
+def migrate_database(sql_uri: str = "", profile: str = DEFAULT_ENGINE_PROFILE) -> None:
+    engine = load_sql_engine(database=sql_uri, profile=profile)
     logger.info(f"Using DB: {engine.url}")
-    metadata_to_sql_db(json_folder=json_path, sql_engine=engine, options=option)
+    version = upgrade_schema(engine)
+    logger.info(f"Schema at version {version}.")
 
 
 @log_program("Preprocessing text", timeit=True)
-def preprocessing_neurips(sql_uri=""):
-    engine = load_sql_engine(database=sql_uri)
+def preprocessing_neurips(sql_uri="", profile: str = "analytics"):
+    engine = load_sql_engine(database=sql_uri, profile=profile)
     logger.info(f"Using DB: {engine.url}")
     papers = extract_sql_to_df(engine, "papers", columns=["title", "full_text"])
 
 
 @log_program("Register arxiv articles", timeit=True)
-def query_arxiv_articles(q: str, n_results: int, chunk_size: float, sql_uri=""):
-    engine = load_sql_engine(database=sql_uri)
+def query_arxiv_articles(
+    q: str,
+    n_results: int,
+    chunk_size: float,
+    sql_uri="",
+    sequential: bool = False,
+    parser: str = "lxml",
+    restart: bool = False,
+    profile: str = DEFAULT_ENGINE_PROFILE,
+):
+    engine = load_sql_engine(database=sql_uri, profile=profile)
     logger.info(f"Using DB: {engine.url}")
+    upgrade_schema(engine)
     logger.info(f"Preparing query {q} with {n_results:,d} results ({chunk_size:.0%} per request)")
-    compose_arxiv_query(q, engine, max_results=n_results, frac_requests=chunk_size)
+    if sequential:
+        compose_arxiv_query(q, engine, max_results=n_results, frac_requests=chunk_size, parser=parser, restart=restart)
+    else:
+        harvest_arxiv_query(q, engine, max_results=n_results, frac_requests=chunk_size, parser=parser, restart=restart)
+
+
+@log_program("Register arxiv articles by submission date", timeit=True)
+def query_arxiv_windows(
+    q: str,
+    since: Optional[dt.datetime] = None,
+    until: Optional[dt.datetime] = None,
+    page_size: int = 1000,
+    sql_uri="",
+    parser: str = "lxml",
+    restart: bool = False,
+    profile: str = DEFAULT_ENGINE_PROFILE,
+):
+    engine = load_sql_engine(database=sql_uri, profile=profile)
+    logger.info(f"Using DB: {engine.url}")
+    upgrade_schema(engine)
+    harvest_arxiv_windows(q, engine, start=since, end=until, page_size=page_size, parser=parser, restart=restart)
 
 
 @log_program("Register ArXiV manifest", timeit=True)
@@ -95,5 +162,30 @@ def dl_arxiv_manifest(dst_folder: Path, mode: str):
 
 
 @log_program("Download ArXiV bulk data", timeit=True)
-def dl_arxiv_bulk_data(manifest_file: Path, output_folder: Path, yes: bool):
-    download_source_code(manifest_file, output_folder, confirm=yes)
+def dl_arxiv_bulk_data(
+    manifest_file: Path,
+    output_folder: Path,
+    yes: bool,
+    workers: int = 8,
+    chunk_size_mb: int = 64,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+):
+    download_source_code(
+        manifest_file,
+        output_folder,
+        confirm=yes,
+        workers=workers,
+        chunk_size=chunk_size_mb * 2**20,
+        since=since,
+        until=until,
+    )
+
+
+@log_program("Running benchmark", timeit=True)
+def run_benchmark(name: str):
+    from src.benchmarks import BENCHMARKS
+
+    results = BENCHMARKS[name]()
+    for key, value in results.items():
+        logger.info(f"{name} / {key}: {value:,.2f}")
@@ -0,0 +1,369 @@
+"""Benchmarks of the data pipelines, run against local fixtures only"""
+
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterator, List
+from urllib.parse import parse_qs, urlparse
+
+import coloredlogs
+from sqlalchemy import create_engine
+
+from src import ROOT_DIR
+from src.data import Base
+
+FIXTURES_DIR = ROOT_DIR / "tests" / "fixtures"
+
+log_fmt = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+logging.basicConfig(level=logging.INFO, format=log_fmt)
+logger = logging.getLogger(__name__)
+coloredlogs.install()
+
+
+@contextmanager
+def arxiv_fixture_server(fixture: Path, latency: float = 0.0) -> Iterator[str]:
+    """Serves a recorded arXiv Atom page for every `/api/query` request.
+
+    The titles and ids of the entries are prefixed with the `start` parameter of
+    the request, so that every page holds distinct papers.
+
+    Parameters
+    ----------
+    fixture : Path
+        the recorded Atom page
+    latency : float, optional
+        delay added before each response, in seconds, by default 0.0
+
+    Yields
+    ------
+    str
+        the base URL to pass instead of `BASE_URL`
+    """
+    page = fixture.read_text()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            start = parse_qs(urlparse(self.path).query).get("start", ["0"])[0]
+            body = re.sub(r"<title>", f"<title>[{start}] ", page)
+            body = re.sub(r"<id>http://arxiv.org/abs/", f"<id>http://arxiv.org/abs/{start}-", body).encode()
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/atom+xml")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/api/"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def bench_arxiv_harvest(
+    n_pages: int = 10,
+    page_size: int = 5,
+    pause_time: float = 0.3,
+    latency: float = 0.2,
+    fixture: Path = FIXTURES_DIR / "arxiv" / "query_page.xml",
+) -> Dict[str, float]:
+    """Compares the entries/sec of `compose_arxiv_query` and of the concurrent harvester.
+
+    Both runs request `n_pages` pages of `page_size` entries, space their requests
+    by `pause_time` and hit a local server replaying `fixture` with `latency` seconds of delay.
+
+    Returns
+    -------
+    Dict[str, float]
+        entries/sec of the sequential and of the concurrent run
+    """
+    from src.data.arxiv import compose_arxiv_query
+    from src.data.harvester import TokenBucketLimiter, harvest_arxiv_query
+
+    results = {}
+    with arxiv_fixture_server(fixture, latency=latency) as base_url, tempfile.TemporaryDirectory() as tmp_dir:
+        for mode in ["sequential", "harvester"]:
+            engine = create_engine(f"sqlite:///{(Path(tmp_dir) / f'{mode}.db').as_posix()}")
+            Base.metadata.create_all(engine)
+            t1 = time.monotonic()
+            if mode == "sequential":
+                compose_arxiv_query(
+                    "machine learning",
+                    engine,
+                    max_results=n_pages * page_size,
+                    frac_requests=1 / n_pages,
+                    pause_time=pause_time,
+                    base_url=base_url,
+                )
+            else:
+                harvest_arxiv_query(
+                    "machine learning",
+                    engine,
+                    max_results=n_pages * page_size,
+                    frac_requests=1 / n_pages,
+                    limiter=TokenBucketLimiter(rate=1 / pause_time),
+                    base_url=base_url,
+                )
+            elapsed = time.monotonic() - t1
+            n_entries = engine.execute("SELECT COUNT(*) FROM papers").scalar()
+            results[mode] = n_entries / elapsed
+            logger.info(f"{mode}: {n_entries} entries in {elapsed:.2f}s ({results[mode]:.2f} entries/s)")
+            engine.dispose()
+    return results
+
+
+def synthetic_arxiv_entries(
+    n_entries: int, n_authors: int = 2000, fixture: Path = FIXTURES_DIR / "arxiv" / "query_page.xml"
+):
+    """Builds `n_entries` distinct entries out of the recorded page, drawing
+    their authors from a pool of `n_authors` names."""
+    from src.data.arxiv import ArxivAuthor, parse_arxiv_feed
+
+    template = parse_arxiv_feed(fixture.read_bytes())
+    entries = []
+    for i in range(n_entries):
+        entry = template[i % len(template)].copy(deep=True)
+        entry.title = f"{entry.title} #{i}"
+        entry.authors = [ArxivAuthor(name=f"Author{(i * 7 + k) % n_authors} Name{k}") for k in range(3)]
+        entries.append(entry)
+    return entries
+
+
+def bench_arxiv_upsert(n_existing: int = 5000, n_pages: int = 5, page_size: int = 1000) -> Dict[str, float]:
+    """Compares the rows/sec of the per-entry writer (`save_arxiv_entry`) and of the
+    set-based writer (`save_arxiv_entries`) on a SQLite file already holding
+    `n_existing` papers. Every page holds 10% of already registered papers.
+
+    Returns
+    -------
+    Dict[str, float]
+        rows/sec of both writers
+    """
+    from sqlalchemy.orm import sessionmaker
+
+    from src.data.arxiv import save_arxiv_entries, save_arxiv_entry
+
+    entries = synthetic_arxiv_entries(n_existing + n_pages * page_size)
+    existing, pages = entries[:n_existing], entries[n_existing:]
+    pages = [
+        pages[i * page_size : (i + 1) * page_size - page_size // 10]
+        + existing[i * page_size // 10 : (i + 1) * page_size // 10]
+        for i in range(n_pages)
+    ]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for mode in ["per-entry", "bulk"]:
+            engine = create_engine(f"sqlite:///{(Path(tmp_dir) / f'{mode}.db').as_posix()}")
+            Base.metadata.create_all(engine)
+            session = sessionmaker(engine)()
+            save_arxiv_entries(existing, session)
+            session.commit()
+
+            t1 = time.monotonic()
+            for page in pages:
+                if mode == "per-entry":
+                    for entry in page:
+                        save_arxiv_entry(entry, session)
+                else:
+                    save_arxiv_entries(page, session)
+                session.commit()
+            elapsed = time.monotonic() - t1
+            n_rows = sum(len(page) for page in pages)
+            results[mode] = n_rows / elapsed
+            logger.info(f"{mode}: {n_rows} entries in {elapsed:.2f}s ({results[mode]:.2f} rows/s)")
+            session.close()
+            engine.dispose()
+    return results
+
+
+def bench_html_parsers(repeat: int = 50) -> Dict[str, float]:
+    """Compares the pages/sec of the HTML parsers on the recorded NeurIPS and ml4physics pages.
+
+    Each parser extracts every fixture `repeat` times, in the same way as the scrapers.
+
+    Returns
+    -------
+    Dict[str, float]
+        pages/sec of each installed parser
+    """
+    from src.data.html_extract import available_parsers, column_links, heading_sections, papers_table_cells
+
+    pages = [
+        (heading_sections, (FIXTURES_DIR / "neurips" / "abstract_page.html").read_bytes()),
+        (column_links, (FIXTURES_DIR / "neurips" / "proceedings_page.html").read_bytes()),
+        (papers_table_cells, (FIXTURES_DIR / "ml4physics" / "papers_page.html").read_bytes()),
+    ]
+    results = {}
+    for parser in available_parsers():
+        t1 = time.monotonic()
+        for _ in range(repeat):
+            for extract, page in pages:
+                extract(page, parser=parser)
+        elapsed = time.monotonic() - t1
+        results[parser] = repeat * len(pages) / elapsed
+        logger.info(f"{parser}: {repeat * len(pages)} pages in {elapsed:.2f}s ({results[parser]:.1f} pages/s)")
+    return results
+
+
+def synthetic_neurips_corpus(
+    json_folder: Path, n_papers: int, n_authors: int = 2000, full_text_size: int = 2000
+) -> List[Path]:
+    """Writes `n_papers` metadata files shaped like the NeurIPS ones to `json_folder`,
+    drawing their authors from a pool of `n_authors` names.
+
+    Returns
+    -------
+    List[Path]
+        the files written
+    """
+    json_folder.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(n_papers):
+        metadata = {
+            "title": f"Synthetic paper #{i}",
+            "book": "Advances in Neural Information Processing Systems",
+            "page_first": 1,
+            "page_last": 9,
+            "abstract": f"Abstract of paper #{i}. " * 20,
+            "full_text": f"Full text of paper #{i}. " * (full_text_size // 24),
+            "award": [],
+            "sourceid": i,
+            "authors": [
+                {
+                    "given_name": f"Author{(i * 7 + k) % n_authors}",
+                    "family_name": f"Name{k}",
+                    "institution": f"University {k}",
+                }
+                for k in range(3)
+            ],
+        }
+        path = json_folder / f"{1987 + i % 35}_{i:032x}.json"
+        path.write_text(json.dumps(metadata))
+        paths.append(path)
+    return paths
+
+
+def bench_metadata_load(n_papers: int = 5000, batch_size: int = 1000) -> Dict[str, float]:
+    """Compares the papers/sec of `metadata_to_sql_db` committing every paper (batches of
+    one) and committing batches of `batch_size` papers, on a synthetic JSON corpus.
+
+    Returns
+    -------
+    Dict[str, float]
+        papers/sec of both runs
+    """
+    from src.data.author_cache import get_author_cache
+    from src.data.intermediate import metadata_to_sql_db
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        json_folder = Path(tmp_dir) / "json"
+        synthetic_neurips_corpus(json_folder, n_papers)
+        for mode, size in [("per-paper", 1), ("batched", batch_size)]:
+            engine = create_engine(f"sqlite:///{(Path(tmp_dir) / f'{mode}.db').as_posix()}")
+            t1 = time.monotonic()
+            metadata_to_sql_db(json_folder, engine, options="create", batch_size=size)
+            elapsed = time.monotonic() - t1
+            n_papers_db = engine.execute("SELECT COUNT(*) FROM papers").scalar()
+            results[mode] = n_papers_db / elapsed
+            logger.info(f"{mode}: {n_papers_db} papers in {elapsed:.2f}s ({results[mode]:.1f} papers/s)")
+            get_author_cache(engine).invalidate()
+            engine.dispose()
+    return results
+
+
+def bench_metadata_decode(n_papers: int = 2000, full_text_size: int = 200_000) -> Dict[str, float]:
+    """Compares the papers/sec of `metadata_to_sql_db` with the files decoded by the writer
+    and by pools of 1 to `os.cpu_count()` processes, on a synthetic corpus of large documents.
+
+    Returns
+    -------
+    Dict[str, float]
+        papers/sec of each run, by number of decoding processes
+    """
+    from src.data.author_cache import get_author_cache
+    from src.data.intermediate import metadata_to_sql_db
+
+    worker_counts = sorted({0, 1, *(2**k for k in range(1, 6) if 2**k <= os.cpu_count())})
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        json_folder = Path(tmp_dir) / "json"
+        synthetic_neurips_corpus(json_folder, n_papers, full_text_size=full_text_size)
+        for workers in worker_counts:
+            engine = create_engine(f"sqlite:///{(Path(tmp_dir) / f'{workers}.db').as_posix()}")
+            t1 = time.monotonic()
+            metadata_to_sql_db(json_folder, engine, options="create", workers=workers)
+            elapsed = time.monotonic() - t1
+            results[f"{workers}-workers"] = n_papers / elapsed
+            logger.info(
+                f"{workers} decoding processes: {n_papers} papers in {elapsed:.2f}s ({n_papers / elapsed:.1f} papers/s)"
+            )
+            get_author_cache(engine).invalidate()
+            engine.dispose()
+    return results
+
+
+def bench_metadata_replace(n_papers: int = 5000, batch_size: int = 1000) -> Dict[str, float]:
+    """Compares the papers/sec of replacing a whole corpus with one `UPDATE` per paper, as
+    `metadata_to_sql_db` used to, and with the staged batches of `replace_papers_batch`.
+
+    Returns
+    -------
+    Dict[str, float]
+        papers/sec of both runs
+    """
+    from sqlalchemy.orm import sessionmaker
+
+    from src.data.author_cache import get_author_cache
+    from src.data.db_models import Papers
+    from src.data.intermediate import metadata_to_sql_db, paper_row
+    from src.data.metadata_store import iter_metadata
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        json_folder = Path(tmp_dir) / "json"
+        synthetic_neurips_corpus(json_folder, n_papers)
+        for mode in ["per-paper", "staged"]:
+            engine = create_engine(f"sqlite:///{(Path(tmp_dir) / f'{mode}.db').as_posix()}")
+            metadata_to_sql_db(json_folder, engine, options="create")
+            t1 = time.monotonic()
+            if mode == "per-paper":
+                session = sessionmaker(engine)()
+                for year, paper_hash, metadata in iter_metadata(json_folder):
+                    session.query(Papers).filter(Papers.hash == paper_hash).update(
+                        paper_row(year, paper_hash, metadata), synchronize_session="fetch"
+                    )
+                session.commit()
+                session.close()
+            else:
+                metadata_to_sql_db(json_folder, engine, options="replace", batch_size=batch_size)
+            elapsed = time.monotonic() - t1
+            results[mode] = n_papers / elapsed
+            logger.info(f"{mode}: {n_papers} papers replaced in {elapsed:.2f}s ({results[mode]:.1f} papers/s)")
+            get_author_cache(engine).invalidate()
+            engine.dispose()
+    return results
+
+
+BENCHMARKS = {
+    "arxiv-harvest": bench_arxiv_harvest,
+    "arxiv-upsert": bench_arxiv_upsert,
+    "html-parse": bench_html_parsers,
+    "metadata-load": bench_metadata_load,
+    "metadata-decode": bench_metadata_decode,
+    "metadata-replace": bench_metadata_replace,
+}
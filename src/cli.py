@@ -1,4 +1,5 @@
 """Main `scitrend-analysis` cli"""
+
 import os
 import sys
 from pathlib import Path
@@ -9,6 +10,10 @@
 from dotenv import load_dotenv
 
 from src import __version__, analysis, ROOT_DIR
+from src.benchmarks import BENCHMARKS
+from src.data.dbutils import DEFAULT_ENGINE_PROFILE, ENGINE_PROFILES
+from src.data.http_cache import HttpCache
+from src.data.http_client import configure_http_client, get_http_client
 
 
 def version_msg() -> str:
@@ -31,10 +36,28 @@ def version_msg() -> str:
     return "\n".join(message)
 
 
+def engine_profile_option(default: str = DEFAULT_ENGINE_PROFILE):
+    """`--engine-profile` option of the commands using the SQL database"""
+    return click.option(
+        "--engine-profile",
+        "engine_profile",
+        type=click.Choice(list(ENGINE_PROFILES), case_sensitive=False),
+        default=default,
+        show_default=True,
+        help="Settings of the SQL engine (SQLite pragmas, pool and statement cache).",
+    )
+
+
 @click.group()
 @click.version_option(__version__, "-V", "--version", message=version_msg())
-def main():
-    pass
+@click.option("--http2", is_flag=True, help="Send the requests over HTTP/2 (requires httpx[http2]).")
+@click.option("--no-cache", "no_cache", is_flag=True, help="Don't cache the scraped pages on disk.")
+@click.option("--offline", is_flag=True, help="Serve the cached pages without revalidating them.")
+@click.pass_context
+def main(ctx, http2, no_cache, offline):
+    if http2 or no_cache or offline:
+        configure_http_client(http2=http2, cache=None if no_cache else HttpCache(offline=offline))
+    ctx.call_on_close(lambda: get_http_client().log_stats())
 
 
 @main.command()
@@ -55,12 +78,14 @@ def download(dest_folder: str) -> None:
     is_flag=True,
     help="Looks for Mongo Atlas uri under MONGO_ATLAS_URI in your .env file in .config",
 )
+@click.option("-c", "--concurrency", type=int, default=1, help="Number of requests in flight.")
 def download_metadata(
     hash_csv: str,
     mongo_uri: Optional[str] = "",
     mongo_host: Optional[str] = "",
     mongo_port: Optional[int] = 0,
     is_env: bool = False,
+    concurrency: int = 1,
 ) -> None:
     """Downloads Neurips metadata on your selected support"""
     if not is_env:
@@ -73,7 +98,42 @@ def download_metadata(
         mongo_uri = ""
         click.echo(f"Using local MongoDB database at {mongo_host}:{mongo_port}")
 
-    analysis.get_neurips_metadata(Path(hash_csv), mongo_uri=mongo_uri, mongo_host=mongo_host, mongo_port=mongo_port)
+    analysis.get_neurips_metadata(
+        Path(hash_csv), mongo_uri=mongo_uri, mongo_host=mongo_host, mongo_port=mongo_port, concurrency=concurrency
+    )
+
+
+@main.command()
+@click.argument("hash_csv", type=click.Path(exists=True), required=True)
+@click.argument("target_folder", type=click.Path(), required=True)
+@click.option("-k", "--kind", type=click.Choice(["pdf", "bibtex"], case_sensitive=False), default="pdf")
+@click.option("-w", "--workers", type=int, default=8, help="Number of files downloaded at the same time.")
+def download_neurips_files(hash_csv, target_folder, kind, workers):
+    """Downloads the PDFs or BibTeX references of the Neurips papers"""
+    analysis.get_neurips_files(Path(hash_csv), Path(target_folder), kind=kind, workers=workers)
+
+
+@main.command()
+@click.argument("hash_csv", type=click.Path(exists=True), required=True)
+@click.argument("target_folder", type=click.Path(), required=True)
+@click.option("--abstract", is_flag=True, help="Scrape the abstract pages.")
+@click.option("--metadata", is_flag=True, help="Fetch the metadata JSON documents.")
+@click.option("--bibtex", is_flag=True, help="Download the BibTeX references.")
+@click.option("--pdf", is_flag=True, help="Download the PDFs.")
+@click.option("-w", "--workers", type=int, default=8, help="Number of papers crawled at the same time.")
+def crawl_neurips(hash_csv, target_folder, abstract, metadata, bibtex, pdf, workers):
+    """Fetches the selected artifacts of every Neurips paper in a single pass (all of them if none is selected)"""
+    flags = {"abstract": abstract, "metadata": metadata, "bibtex": bibtex, "pdf": pdf}
+    artifacts = [artifact for artifact, selected in flags.items() if selected] or list(flags)
+    analysis.crawl_neurips(Path(hash_csv), Path(target_folder), artifacts, workers=workers)
+
+
+@main.command()
+@click.argument("json_folder", type=click.Path(exists=True), required=True)
+@click.option("-s", "--store-dir", "store_dir", type=click.Path(), default=None, help="Root of the metadata store.")
+def migrate_neurips_metadata(json_folder, store_dir):
+    """Copies a folder of Neurips metadata JSON files into the compressed metadata store"""
+    analysis.migrate_neurips_metadata(Path(json_folder), Path(store_dir) if store_dir else None)
 
 
 @main.command()
@@ -88,17 +148,62 @@ def get_keywords(file_csv: Path, n_grams: int, save_folder: Path):
 @main.command()
 @click.argument("json_path", type=click.Path(exists=True), required=True)
 @click.option("--db-option", "db_option", type=click.Choice(["create", "replace"], case_sensitive=False))
-def neurips_meta_to_sql(json_path, db_option):
+@click.option("-b", "--batch-size", "batch_size", type=int, default=1000, help="Papers inserted per transaction.")
+@click.option("-j", "--workers", type=int, default=0, help="Processes decoding the files (0: none).")
+@engine_profile_option("bulk-load")
+def neurips_meta_to_sql(json_path, db_option, batch_size, workers, engine_profile):
     """If you have downloaded Neurips metadata, sends it to SQL"""
-    analysis.send_neurips_to_sql_db(Path(json_path), db_option)
+    analysis.send_neurips_to_sql_db(
+        Path(json_path), db_option, batch_size=batch_size, workers=workers, profile=engine_profile
+    )
+
+
+@main.command()
+@engine_profile_option()
+def migrate_db(engine_profile):
+    """Creates the missing tables and brings the schema of the database up to date"""
+    analysis.migrate_database(profile=engine_profile)
 
 
 @main.command()
 @click.argument("query", type=str, nargs=-1)
 @click.option("-m", "--max-results", "max_results", type=int, required=True, help="Number of results to fetch.")
 @click.option("-f", "--chunk-size", "chunk_size", type=float, required=True, help="Fraction of max results to fetch")
-def download_arxiv_info(query, max_results, chunk_size):
-    analysis.query_arxiv_articles(" ".join(query), n_results=max_results, chunk_size=chunk_size)
+@click.option("--sequential", is_flag=True, help="Fetch, parse and save one page at a time.")
+@click.option("--parser", type=click.Choice(["lxml", "bs4"], case_sensitive=False), default="lxml")
+@click.option("--restart", is_flag=True, help="Start over instead of resuming the last run of the query.")
+@engine_profile_option()
+def download_arxiv_info(query, max_results, chunk_size, sequential, parser, restart, engine_profile):
+    analysis.query_arxiv_articles(
+        " ".join(query),
+        n_results=max_results,
+        chunk_size=chunk_size,
+        sequential=sequential,
+        parser=parser,
+        restart=restart,
+        profile=engine_profile,
+    )
+
+
+@main.command()
+@click.argument("query", type=str, nargs=-1)
+@click.option("--since", type=click.DateTime(formats=["%Y-%m-%d"]), default=None, help="First submission date.")
+@click.option("--until", type=click.DateTime(formats=["%Y-%m-%d"]), default=None, help="Last submission date.")
+@click.option("-p", "--page-size", "page_size", type=int, default=1000, help="Number of results per request.")
+@click.option("--parser", type=click.Choice(["lxml", "bs4"], case_sensitive=False), default="lxml")
+@click.option("--restart", is_flag=True, help="Start over instead of resuming the last run of the windows.")
+@engine_profile_option()
+def download_arxiv_windows(query, since, until, page_size, parser, restart, engine_profile):
+    """Fetches every result of a query, past the 30,000 results cap, by splitting it into submission date windows"""
+    analysis.query_arxiv_windows(
+        " ".join(query),
+        since=since,
+        until=until,
+        page_size=page_size,
+        parser=parser,
+        restart=restart,
+        profile=engine_profile,
+    )
 
 
 @main.command()
@@ -112,14 +217,33 @@ def dl_arxiv_manifest(dst_folder, mode):
 @click.argument("manifest_file", type=click.Path(exists=True), required=True)
 @click.argument("output_folder", type=click.Path(exists=True), required=True)
 @click.option("-y", "--yes", is_flag=True)
-def arxiv_build_data(manifest_file, output_folder, yes):
+@click.option("-w", "--workers", type=int, default=8, help="Number of files downloaded at the same time.")
+@click.option("--chunk-size-mb", "chunk_size_mb", type=int, default=64, help="Size of each ranged request in MB.")
+@click.option("--since", type=str, default=None, help="First month to download (yymm).")
+@click.option("--until", type=str, default=None, help="Last month to download (yymm).")
+def arxiv_build_data(manifest_file, output_folder, yes, workers, chunk_size_mb, since, until):
     """Downloads bulk data from S3"""
     manifest_file = Path(manifest_file)
     if not manifest_file.suffix.endswith("xml"):
         click.echo("Not a valid manifest file. Must be `.xml` only.")
         return
 
-    analysis.dl_arxiv_bulk_data(manifest_file, Path(output_folder), yes)
+    analysis.dl_arxiv_bulk_data(
+        manifest_file,
+        Path(output_folder),
+        yes,
+        workers=workers,
+        chunk_size_mb=chunk_size_mb,
+        since=since,
+        until=until,
+    )
+
+
+@main.command()
+@click.argument("name", type=click.Choice(list(BENCHMARKS), case_sensitive=False))
+def benchmark(name):
+    """Runs a benchmark against local fixtures"""
+    analysis.run_benchmark(name)
 
 
 if __name__ == "__main__":
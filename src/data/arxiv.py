@@ -8,26 +8,48 @@
 import time
 import zipfile
 from enum import Enum
+from io import BytesIO
 from pathlib import Path
 from subprocess import PIPE, Popen
-from typing import List
+from typing import BinaryIO, Iterator, List, Optional, Tuple, Union
 
 import boto3
 import coloredlogs
-import requests
 from botocore.exceptions import ClientError
 from bs4 import BeautifulSoup
+from lxml import etree
 from bs4.element import Tag
-from pydantic import BaseModel, ValidationError, validator
+from pydantic import BaseModel, NoneStr, ValidationError, validator
+from sqlalchemy import insert
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import session
 from sqlalchemy.orm.session import sessionmaker
-from tqdm import tqdm, trange
+from tqdm import tqdm
 
-from .db_models import Authors, Links, PaperAuthor, Papers
+from .author_cache import AuthorCache, chunks, get_author_cache
+from .db_models import Links, PaperAuthor, Papers
+from .http_client import get_http_client
+from .harvest_jobs import Checkpoint, PageTracker, close_harvest_job, open_harvest_job, record_checkpoint
+from .integrity import CHECKSUM_FILE, ChecksumCache, verify_files
+from .manifest import load_manifest
+from .s3_download import DEFAULT_CHUNK_SIZE, DEFAULT_WORKERS, S3BulkDownloader
 
 PAUSE_TIME = 3
 BASE_URL = "http://export.arxiv.org/api/"
+ATOM_NS = "http://www.w3.org/2005/Atom"
+ARXIV_NS = "http://arxiv.org/schemas/atom"
+OPENSEARCH_NS = "http://a9.com/-/spec/opensearch/1.1/"
+FEED_INFO_TAGS = [f"{{{OPENSEARCH_NS}}}{tag}" for tag in ["totalResults", "startIndex", "itemsPerPage"]]
+ATOM_PARSERS = ("lxml", "bs4")
+# Maximum number of results the API returns for one query
+MAX_RESULTS = 30000
+SUBMITTED_DATE_FMT = "%Y%m%d%H%M"
+
+DateRange = Tuple[dt.datetime, dt.datetime]
+
+
+class ArxivFeedError(ValueError):
+    """The body of a response isn't an Atom feed of the arXiv API, e.g. an error page"""
 
 
 class MethodName(BaseModel):
@@ -38,11 +60,40 @@ class MethodName(BaseModel):
 
     @validator("max_results")
     def max_results_lim_exceeded(cls, v):
-        if v > 30000:
+        if v > MAX_RESULTS:
             raise ValidationError("max_results can't exceed 30,000")
         return v
 
 
+class ArxivLink(BaseModel):
+    type: NoneStr
+    url: NoneStr
+
+
+class ArxivAuthor(BaseModel):
+    name: str
+    affiliation: NoneStr
+
+    def split_name(self) -> Tuple[str, str]:
+        """Splits the full name into (firstname, lastname)"""
+        *firstnames, lastname = self.name.split()
+        return " ".join(firstnames), lastname
+
+
+class ArxivEntry(BaseModel):
+    arxiv_id: NoneStr
+    title: NoneStr
+    abstract: NoneStr
+    published_date: Optional[dt.datetime]
+    updated_date: Optional[dt.datetime]
+    doi: NoneStr
+    comment: NoneStr
+    journal_ref: NoneStr
+    category: NoneStr
+    links: List[ArxivLink] = []
+    authors: List[ArxivAuthor] = []
+
+
 class SearchQueryParams(Enum):
     title = "ti"
     author = "au"
@@ -80,8 +131,79 @@ def md5(fname):
     return hash_md5.hexdigest()
 
 
-def save_arxiv_entry(entry: Tag, session: sessionmaker) -> None:
-    """Takes an entry tag and saves the results within the sessio
+def _parse_date(text: Optional[str]) -> Optional[dt.datetime]:
+    return dt.datetime.fromisoformat(text.strip("Z")) if text else None
+
+
+def iter_arxiv_entries(source: Union[bytes, BinaryIO]) -> Iterator[ArxivEntry]:
+    """Parses an Atom response of the arXiv API incrementally with `lxml.etree.iterparse`.
+
+    Each `<entry>` element is turned into an `ArxivEntry` as soon as it is closed,
+    then cleared along with its already processed siblings, so that the memory used
+    doesn't depend on the number of entries of the page.
+
+    Parameters
+    ----------
+    source : Union[bytes, BinaryIO]
+        the raw body of the response, or a binary file object to read it from
+
+    Yields
+    ------
+    Iterator[ArxivEntry]
+        the entries of the feed, in order
+
+    Raises
+    ------
+    ArxivFeedError
+        once the document is read, if it had no feed information, e.g. an HTML page
+    """
+    if isinstance(source, bytes):
+        source = BytesIO(source)
+
+    feed_info = {}
+    context = etree.iterparse(source, events=("end",), tag=[f"{{{ATOM_NS}}}entry", *FEED_INFO_TAGS])
+    for _, elem in context:
+        if elem.tag != f"{{{ATOM_NS}}}entry":
+            feed_info[etree.QName(elem).localname] = elem.text
+            if len(feed_info) == len(FEED_INFO_TAGS):
+                _log_feed_info(**feed_info)
+            continue
+
+        category = elem.find(f"{{{ATOM_NS}}}category")
+        yield ArxivEntry(
+            arxiv_id=elem.findtext(f"{{{ATOM_NS}}}id"),
+            title=elem.findtext(f"{{{ATOM_NS}}}title"),
+            abstract=elem.findtext(f"{{{ATOM_NS}}}summary"),
+            published_date=_parse_date(elem.findtext(f"{{{ATOM_NS}}}published")),
+            updated_date=_parse_date(elem.findtext(f"{{{ATOM_NS}}}updated")),
+            doi=elem.findtext(f"{{{ARXIV_NS}}}doi"),
+            comment=elem.findtext(f"{{{ARXIV_NS}}}comment"),
+            journal_ref=elem.findtext(f"{{{ARXIV_NS}}}journal_ref"),
+            category=category.get("term") if category is not None else None,
+            links=[
+                ArxivLink(type=link.get("type") or link.get("title"), url=link.get("href"))
+                for link in elem.iterfind(f"{{{ATOM_NS}}}link")
+            ],
+            authors=[
+                ArxivAuthor(
+                    name=author.findtext(f"{{{ATOM_NS}}}name"),
+                    affiliation=author.findtext(f"{{{ARXIV_NS}}}affiliation"),
+                )
+                for author in elem.iterfind(f"{{{ATOM_NS}}}author")
+            ],
+        )
+
+        # Free the entry and every sibling processed before it
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+    del context
+    if "totalResults" not in feed_info:
+        raise ArxivFeedError("The document has no opensearch:totalResults, it isn't an arXiv feed")
+
+
+def entry_from_tag(entry: Tag) -> ArxivEntry:
+    """Converts an entry parsed by BeautifulSoup into an `ArxivEntry`
 
     Parameters
     ----------
@@ -89,81 +211,424 @@ def save_arxiv_entry(entry: Tag, session: sessionmaker) -> None:
         The entry's bs4 body. It usually contains the keywords specified
         by arXiv's API (https://arxiv.org/help/api/user-manual#_details_of_atom_results_returned)
 
+    Returns
+    -------
+    ArxivEntry
+        the entry's record
+    """
+    return ArxivEntry(
+        arxiv_id=entry.id.text if entry.id else None,
+        title=entry.title.text if entry.title else None,
+        abstract=entry.summary.text if entry.summary else None,
+        published_date=_parse_date(entry.published.text) if entry.published else None,
+        updated_date=_parse_date(entry.updated.text) if entry.updated else None,
+        doi=entry.doi.text if entry.doi else None,
+        comment=entry.comment.text if entry.comment else None,
+        journal_ref=entry.journal_ref.text if entry.journal_ref else None,
+        category=entry.category.get("term") if entry.category else None,
+        links=[
+            ArxivLink(type=link.get("type") or link.get("title"), url=link.get("href"))
+            for link in entry.find_all("link")
+        ],
+        authors=[
+            ArxivAuthor(
+                name=author.find("name").text,
+                affiliation=author.find("affiliation").text if author.find("affiliation") else None,
+            )
+            for author in entry.find_all("author")
+        ],
+    )
+
+
+def save_arxiv_entry(entry: ArxivEntry, session: sessionmaker, author_cache: Optional[AuthorCache] = None) -> None:
+    """Takes an entry and saves the results within the session
+
+    Parameters
+    ----------
+    entry : ArxivEntry
+        The entry's record, as returned by `parse_arxiv_feed`
     session : sessionmaker
         The SQLAlchemy session in which every operation is done and committed to.
+    author_cache : Optional[AuthorCache], optional
+        cache resolving the authors, by default the one shared by the loaders of the session's database
     """
-    published_date = dt.datetime.fromisoformat(entry.published.text.strip("Z")) if entry.published else None
-    title = entry.title.text if entry.title else None
-    if title and session.query(Papers).filter(Papers.title == title).first():
+    if entry.title and session.query(Papers).filter(Papers.title == entry.title).first():
         return
 
     paper = Papers(
-        title=title,
-        abstract=entry.summary.text if entry.summary else None,
-        updated_date=dt.datetime.fromisoformat(entry.updated.text.strip("Z")) if entry.updated else None,
-        year=published_date.year if published_date else None,
-        published_date=published_date,
-        doi=entry.doi.text if entry.doi else None,
+        title=entry.title,
+        abstract=entry.abstract,
+        updated_date=entry.updated_date,
+        year=entry.published_date.year if entry.published_date else None,
+        published_date=entry.published_date,
+        doi=entry.doi,
         dataset="arxiv",
-        links=[
-            Links(type=link.get("type") or link.get("title"), url=link.get("href")) for link in entry.find_all("link")
-        ],
-        comment=entry.comment.text if entry.comment else None,
-        publication=entry.journal_ref.text if entry.journal_ref else None,
-        category=entry.category.get("term") if entry.category else None,
+        links=[Links(type=link.type, url=link.url) for link in entry.links],
+        comment=entry.comment,
+        publication=entry.journal_ref,
+        category=entry.category,
     )
-    for author in entry.find_all("authors"):
-        fn, ln = author.find("name").text.split()[:-1], author.find("name").text.split()[-1]
-        ent_author = session.query(Authors).filter(Authors.firstname == fn, Authors.lastname == ln).first()
-        if not ent_author:
-            ent_author = Authors(
-                firstname=fn,
-                lastname=ln,
-                institution=author.find("affiliation").text,
-            )
-        ent_author.papers.append(paper)
-        paper.authors.append(author)
-        session.add(ent_author)
     session.add(paper)
+    if entry.authors:
+        author_cache = author_cache or get_author_cache(session.get_bind())
+        author_ids = author_cache.resolve_many(
+            session, {author.split_name(): author.affiliation for author in reversed(entry.authors)}
+        )
+        session.flush()
+        session.execute(
+            insert(PaperAuthor), [{"paper_id": paper.id, "author_id": author_id} for author_id in author_ids.values()]
+        )
 
 
-def request_arxiv(url: str, session: sessionmaker) -> None:
-    """takes an Arxiv URL and extracts the articles from it
+def save_arxiv_entries(
+    entries: List[ArxivEntry], session: sessionmaker, author_cache: Optional[AuthorCache] = None
+) -> int:
+    """Saves a page of entries with set-based statements instead of per-entry queries.
+
+    Existing titles are probed with one `IN` query per chunk of values and authors are
+    resolved through the author cache, then new papers, authors, links and paper/author
+    associations are inserted with executemany. Nothing is committed.
 
     Parameters
     ----------
-    url : str
-        the url from the arXiv API
+    entries : List[ArxivEntry]
+        The entries of the page, as returned by `parse_arxiv_feed`
     session : sessionmaker
-        A session created by SQLAlchemy's sessionmaker and engine
+        The SQLAlchemy session in which every operation is done.
+    author_cache : Optional[AuthorCache], optional
+        cache resolving the authors, by default the one shared by the loaders of the session's database
+
+    Returns
+    -------
+    int
+        the number of inserted papers
     """
-    r = requests.get(url)
-    if r.status_code == 200:
-        soup = BeautifulSoup(r.content, "xml")
-        logger.info(f"Found {soup.find('totalResults').text} results.")
-        logger.info(f"Starts at {soup.find('startIndex').text} (results per page: {soup.find('itemsPerPage').text})")
-        for entry in tqdm(
-            soup.find_all("entry"), desc="Entry registering", total=len(soup.find_all("entry")), file=sys.stdout
-        ):
-            save_arxiv_entry(entry, session)
+    # Keep the first occurrence of every title not already in the database
+    titles = list({entry.title for entry in entries if entry.title})
+    existing_titles = set()
+    for chunk in chunks(titles):
+        existing_titles.update(title for title, in session.query(Papers.title).filter(Papers.title.in_(chunk)))
+
+    new_entries, seen_titles = [], set(existing_titles)
+    for entry in entries:
+        if entry.title in seen_titles:
+            continue
+        if entry.title:
+            seen_titles.add(entry.title)
+        new_entries.append(entry)
+    if not new_entries:
+        return 0
+
+    # Resolve the authors, the missing ones being inserted in one executemany
+    institutions = {}
+    for entry in new_entries:
+        for author in entry.authors:
+            institutions.setdefault(author.split_name(), author.affiliation)
+    author_cache = author_cache or get_author_cache(session.get_bind())
+    author_ids = author_cache.resolve_many(session, institutions)
+
+    # Insert the papers and fetch their ids back through their titles
+    paper_rows = [
+        {
+            "title": entry.title,
+            "abstract": entry.abstract,
+            "updated_date": entry.updated_date,
+            "year": entry.published_date.year if entry.published_date else None,
+            "published_date": entry.published_date,
+            "doi": entry.doi,
+            "dataset": "arxiv",
+            "comment": entry.comment,
+            "publication": entry.journal_ref,
+            "category": entry.category,
+        }
+        for entry in new_entries
+    ]
+    paper_ids = []
+    titled_rows = [row for row in paper_rows if row["title"]]
+    if titled_rows:
+        session.execute(insert(Papers), titled_rows)
+        title_ids = {}
+        for chunk in chunks([row["title"] for row in titled_rows]):
+            title_ids.update(
+                (title, paper_id)
+                for paper_id, title in session.query(Papers.id, Papers.title).filter(
+                    Papers.title.in_(chunk), Papers.dataset == "arxiv"
+                )
+            )
+    for row in paper_rows:
+        if row["title"]:
+            paper_ids.append(title_ids[row["title"]])
+        else:
+            paper_ids.append(session.execute(insert(Papers), row).inserted_primary_key[0])
+
+    link_rows = [
+        {"type": link.type, "url": link.url, "paper": paper_id}
+        for entry, paper_id in zip(new_entries, paper_ids)
+        for link in entry.links
+    ]
+    if link_rows:
+        session.execute(insert(Links), link_rows)
+
+    paper_author_rows = list(
+        {
+            (paper_id, author_ids[author.split_name()])
+            for entry, paper_id in zip(new_entries, paper_ids)
+            for author in entry.authors
+        }
+    )
+    if paper_author_rows:
+        session.execute(
+            insert(PaperAuthor),
+            [{"paper_id": paper_id, "author_id": author_id} for paper_id, author_id in paper_author_rows],
+        )
+    return len(new_entries)
+
+
+def build_arxiv_url(
+    query: str, start: int, max_results: int, base_url: str = BASE_URL, date_range: Optional[DateRange] = None
+) -> str:
+    """Builds the URL of one page of an arXiv API query
+
+    Parameters
+    ----------
+    query : str
+        the full query. Can be one or multiple words.
+    start : int
+        index of the first result of the page
+    max_results : int
+        number of results on the page
+    base_url : str, optional
+        root of the API, by default BASE_URL
+    date_range : Optional[DateRange], optional
+        restricts the query to the articles submitted between these two dates (both included), by default None
 
+    Returns
+    -------
+    str
+        the URL of the page
+    """
+    fmt_query = query if len(query.split()) == 1 else f'"{query}"'
+    search_query = f"{SearchQueryParams.all.value}:{fmt_query}"
+    if date_range is not None:
+        first, last = (date.strftime(SUBMITTED_DATE_FMT) for date in date_range)
+        search_query += f"+AND+submittedDate:[{first}+TO+{last}]"
+    met = MethodName(
+        search_query=search_query,
+        start=start,
+        max_results=max_results,
+    )
+    return f"{base_url}query?{'&'.join([f'{k}={v}' for k,v in met.dict().items() if v])}"
+
+
+def arxiv_page_size(max_results: int, frac_requests: float) -> int:
+    return int(max_results * frac_requests)
+
+
+def arxiv_pages(
+    query: str,
+    max_results: int = 500,
+    frac_requests: float = 0.5,
+    base_url: str = BASE_URL,
+    start: int = 0,
+    date_range: Optional[DateRange] = None,
+) -> List[Tuple[int, str]]:
+    """Splits a query into pages, each page holding `max_results * frac_requests` results.
+
+    Parameters
+    ----------
+    query : str
+        the full query. Can be one or multiple words.
+    max_results : int, optional
+        maximum requested results, by default 500
+    frac_requests : float, optional
+        chunk fraction, by default 0.5
+    base_url : str, optional
+        root of the API, by default BASE_URL
+    start : int, optional
+        offset of the first page, by default 0
+    date_range : Optional[DateRange], optional
+        submission dates of the articles, see `build_arxiv_url`, by default None
+
+    Returns
+    -------
+    List[Tuple[int, str]]
+        the offset and URL of every page, in order
+    """
+    max_res_per_page = arxiv_page_size(max_results, frac_requests)
+    return [
+        (start_idx, build_arxiv_url(query, start_idx, max_res_per_page, base_url=base_url, date_range=date_range))
+        for start_idx in range(start, max_results, max_res_per_page)
+    ]
+
+
+def arxiv_page_urls(
+    query: str, max_results: int = 500, frac_requests: float = 0.5, base_url: str = BASE_URL
+) -> List[str]:
+    """URLs of the pages of a query, see `arxiv_pages`"""
+    return [url for _, url in arxiv_pages(query, max_results, frac_requests, base_url=base_url)]
+
+
+def _log_feed_info(totalResults: str, startIndex: str, itemsPerPage: str) -> None:
+    logger.info(f"Found {totalResults} results.")
+    logger.info(f"Starts at {startIndex} (results per page: {itemsPerPage})")
+
+
+def parse_arxiv_feed(content: bytes, parser: str = "lxml") -> List[ArxivEntry]:
+    """Parses an Atom response of the arXiv API and returns its entries
+
+    Parameters
+    ----------
+    content : bytes
+        the raw body of the response
+    parser : str, optional
+        "lxml" for the streaming parser (`iter_arxiv_entries`) or "bs4" to build
+        the whole tree with BeautifulSoup, by default "lxml". The bs4 parser is
+        also used as a fallback when the streaming parser rejects the document.
+
+    Returns
+    -------
+    List[ArxivEntry]
+        the entries of the feed
+
+    Raises
+    ------
+    ArxivFeedError
+        if the body isn't an Atom feed of the arXiv API
+    """
+    if parser not in ATOM_PARSERS:
+        raise ValueError(f"Parser must be one of the following: {ATOM_PARSERS}")
+
+    if parser == "lxml":
         try:
-            session.commit()
-        except Exception as e:
-            logger.error(f"SQLAlchemy error: {e}. Rerolling...")
-            session.rollback()
-    else:
-        err_xml = BeautifulSoup(r.content, "xml")
-        msg = err_xml.find("entry").find("summary").text
-        logger.error(f"Error: {msg}")
+            return list(iter_arxiv_entries(content))
+        except etree.XMLSyntaxError as e:
+            logger.warning(f"Streaming parser failed ({e}). Falling back to bs4.")
+
+    soup = BeautifulSoup(content, "xml")
+    feed_info = {tag: soup.find(tag) for tag in ["totalResults", "startIndex", "itemsPerPage"]}
+    missing = [tag for tag, value in feed_info.items() if value is None]
+    if missing:
+        raise ArxivFeedError(f"The document has no {', '.join(missing)}, it isn't an arXiv feed: {content[:200]!r}")
+    _log_feed_info(**{tag: value.text for tag, value in feed_info.items()})
+    return [entry_from_tag(entry) for entry in soup.find_all("entry")]
+
+
+def feed_total_results(content: bytes) -> int:
+    """Reads `opensearch:totalResults`, the number of results of the query, from an Atom response"""
+    total = etree.fromstring(content).find(f"{{{OPENSEARCH_NS}}}totalResults")
+    return int(total.text) if total is not None else 0
+
+
+def is_missing_page(content: bytes, entries: List[ArxivEntry], offset: int) -> bool:
+    """Whether a page has no entries although the feed reports results past its offset.
+
+    arXiv sometimes answers with such a page before the end of the results. It must not be
+    checkpointed, so that the next run fetches it again.
+    """
+    if entries:
+        return False
+    try:
+        return offset < feed_total_results(content)
+    except etree.XMLSyntaxError:
+        return True
+
+
+def log_arxiv_error(content: bytes) -> None:
+    """Logs the message of an arXiv error feed"""
+    err_xml = BeautifulSoup(content, "xml")
+    entry = err_xml.find("entry")
+    msg = entry.find("summary").text if entry and entry.find("summary") else content[:200]
+    logger.error(f"Error: {msg}")
+
+
+def save_arxiv_page(
+    entries: List[ArxivEntry], session: sessionmaker, checkpoint: Optional[Checkpoint] = None
+) -> Optional[int]:
+    """Saves the entries of one page and commits them as a single transaction
+
+    Parameters
+    ----------
+    entries : List[ArxivEntry]
+        the entries of the page
+    session : sessionmaker
+        A session created by SQLAlchemy's sessionmaker and engine
+    checkpoint : Optional[Checkpoint], optional
+        (job id, next offset) of the harvest job, recorded in the same transaction, by default None
 
+    Returns
+    -------
+    Optional[int]
+        the number of processed entries, None if the transaction was rolled back
+    """
+    try:
+        n_inserted = save_arxiv_entries(entries, session)
+        if checkpoint is not None:
+            record_checkpoint(session, checkpoint)
+        session.commit()
+    except Exception as e:
+        logger.error(f"SQLAlchemy error: {e}. Rerolling...")
+        session.rollback()
+        get_author_cache(session.get_bind()).invalidate()
+        return None
+    logger.info(f"{n_inserted} new entries out of {len(entries)}.")
+    return len(entries)
+
+
+def request_arxiv(
+    url: str, session: sessionmaker, parser: str = "lxml", checkpoint: Optional[Checkpoint] = None, offset: int = 0
+) -> Optional[int]:
+    """takes an Arxiv URL and extracts the articles from it
 
-def compose_arxiv_query(query: str, engine: Engine, max_results: int = 500, frac_requests: float = 0.5) -> None:
+    Parameters
+    ----------
+    url : str
+        the url from the arXiv API
+    session : sessionmaker
+        A session created by SQLAlchemy's sessionmaker and engine
+    parser : str, optional
+        Atom parser, "lxml" or "bs4", by default "lxml"
+    checkpoint : Optional[Checkpoint], optional
+        (job id, next offset) to record along with the page, by default None
+    offset : int, optional
+        offset of the page in the results of the query, by default 0
+
+    Returns
+    -------
+    Optional[int]
+        the number of processed entries, None if the page couldn't be fetched or saved
+    """
+    r = get_http_client().get(url)
+    if r.status_code != 200:
+        log_arxiv_error(r.content)
+        return None
+    try:
+        entries = parse_arxiv_feed(r.content, parser=parser)
+    except ArxivFeedError as e:
+        logger.error(f"Couldn't parse {url}: {e}")
+        return None
+    if is_missing_page(r.content, entries, offset):
+        logger.warning(f"The page at offset {offset} has no entries, it's left to the next run")
+        return None
+    return save_arxiv_page(entries, session, checkpoint=checkpoint)
+
+
+def compose_arxiv_query(
+    query: str,
+    engine: Engine,
+    max_results: int = 500,
+    frac_requests: float = 0.5,
+    pause_time: float = PAUSE_TIME,
+    base_url: str = BASE_URL,
+    parser: str = "lxml",
+    restart: bool = False,
+) -> None:
     """Takes a full arXiv query and registers from the API. The processing can be
     done through chunks of data if the request is too big. Total results per page
     must not exceed 30,000 requests as per arXiv's suggestion, and the function pauses
     the code of PAUSE_TIME seconds.
 
+    See `src.data.harvester.harvest_arxiv_query` for the concurrent version.
+
     Parameters
     ----------
     query : str
@@ -174,24 +639,28 @@ def compose_arxiv_query(query: str, engine: Engine, max_results: int = 500, frac
         maximum requested results, by default 500
     frac_requests : float, optional
         chunk fraction, by default 0.5
+    pause_time : float, optional
+        pause between two requests in seconds, by default PAUSE_TIME
+    base_url : str, optional
+        root of the API, by default BASE_URL
+    parser : str, optional
+        Atom parser, "lxml" or "bs4", by default "lxml"
+    restart : bool, optional
+        ignore the checkpoint of a previous run of the query, by default False
     """
-    max_res_per_page = int(max_results * frac_requests)
+    job = open_harvest_job(engine, query, max_results, arxiv_page_size(max_results, frac_requests), restart=restart)
+    pages = arxiv_pages(query, max_results, frac_requests, base_url=base_url, start=job.next_offset)
+    tracker = PageTracker(job.id, [offset for offset, _ in pages], end=max_results)
     Session = sessionmaker(engine)
     session = Session()
-    for start_idx in trange(0, max_results, max_res_per_page):
-        logger.info(f"From {start_idx} to {min(start_idx + max_res_per_page, max_results)}")
-        fmt_query = query if len(query.split()) == 1 else f'"{query}"'
-        met = MethodName(
-            search_query=f"{SearchQueryParams.all.value}:{fmt_query}",
-            start=start_idx,
-            max_results=max_res_per_page,
-        )
-        url = f"{BASE_URL}query?{'&'.join([f'{k}={v}' for k,v in met.dict().items() if v])}"
+    for offset, url in tqdm(pages):
         logger.info(f"Requesting {url}")
-        request_arxiv(url, session)
+        if request_arxiv(url, session, parser=parser, checkpoint=tracker.checkpoint(offset), offset=offset) is not None:
+            tracker.mark_saved(offset)
         # Pause to avoid overloading
-        time.sleep(PAUSE_TIME)
+        time.sleep(pause_time)
     session.close()
+    close_harvest_job(engine, job.id)
 
 
 def dl_bulk_data_manifest(dst_folder: Path, pref_method: str = "kaggle"):
@@ -260,20 +729,10 @@ def explore_bucket_metadata(manifest_xml: Path):
         Path of the XML manifest
     """
     logger.info("ArXiV bucker metadata:")
-    total_size = 0
-
-    with open(manifest_xml, "r") as manifest:
-        soup = BeautifulSoup(manifest, "xml")
-
-        arxiv_ts = soup.arXivSRC.find("timestamp", recursive=False).string
-        logger.info(f"Manifest was last edited on {arxiv_ts}")
-
-        num_files = len(soup.find_all("file"))
-        logger.info(f"ArXiV bucket contains {num_files} tarfiles.")
-
-        for size in soup.find_all("size"):
-            total_size += int(size.string)
-        logger.info(f"Total size: {total_size / 10e9:.2f} GB")
+    manifest = load_manifest(manifest_xml)
+    logger.info(f"Manifest was last edited on {manifest.timestamp}")
+    logger.info(f"ArXiV bucket contains {len(manifest.files)} tarfiles.")
+    logger.info(f"Total size: {manifest.total_size / 10e9:.2f} GB")
 
 
 def _download_paginator(output_dir: Path):
@@ -306,15 +765,37 @@ def _download_paginator(output_dir: Path):
                     logger.error(f"{key} does not exist in arxiv bucket")
 
 
-def download_source_code(manifest_xml: Path, output_dir: Path, confirm: bool = True):
+def download_source_code(
+    manifest_xml: Path,
+    output_dir: Path,
+    confirm: bool = True,
+    workers: int = DEFAULT_WORKERS,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+):
     """Downloads ArXiV bulk data to `output_dir` using the manifest.
 
+    The tars are downloaded by `S3BulkDownloader`: several files at once, by ranged
+    requests of `chunk_size` bytes, resuming partial files and recording the state of
+    each file in `download_status.json`.
+
     Parameters
     ----------
     manifest_xml : Path
         [description]
     output_dir : Path
         [description]
+    confirm : bool, optional
+        skips the confirmation prompt if True, by default True
+    workers : int, optional
+        number of files downloaded at the same time, by default DEFAULT_WORKERS
+    chunk_size : int, optional
+        size of each ranged request in bytes, by default DEFAULT_CHUNK_SIZE
+    since : Optional[str], optional
+        first month to download, as `yymm`, by default None
+    until : Optional[str], optional
+        last month to download, as `yymm`, by default None
 
     Raises
     ------
@@ -323,18 +804,17 @@ def download_source_code(manifest_xml: Path, output_dir: Path, confirm: bool = T
     """
     logger.info(f"Beginning tar download and extraction using {manifest_xml}")
 
-    with open(manifest_xml, "r") as manifest:
-        soup = BeautifulSoup(manifest, "xml")
+    manifest = load_manifest(manifest_xml).filter(since=since, until=until)
 
     # Compute space disk
-    bulk_dl_size = 0
-    number_files = 0
+    bulk_dl_size = manifest.total_size
+    number_files = len(manifest.files)
     total, used, free = [space / (2 ** 30) for space in shutil.disk_usage(output_dir)]
     logger.info(f"{used:.2f}/{total:.2f} GB used.")
 
-    for size in soup.find_all("size"):
-        bulk_dl_size += int(size.string)
-        number_files += 1
+    if not number_files:
+        logger.warning(f"No file of {manifest_xml} matches the requested months.")
+        return
 
     logger.info(f"Found {number_files} in {manifest_xml} ({bulk_dl_size/10e9:.2f} GB).")
     logger.info(f"Average file size: {(bulk_dl_size/number_files)/10e6:.2f} MB")
@@ -355,45 +835,15 @@ def download_source_code(manifest_xml: Path, output_dir: Path, confirm: bool = T
             logger.warning("Aborting process...")
             sys.exit()
 
-    logger.info("Creating S3 resource.")
-    s3ressource = boto3.resource(
-        "s3",  # the AWS resource we want to use
-        aws_access_key_id=os.environ.get("AWS_ACCESS_KEY"),
-        aws_secret_access_key=os.environ.get("AWS_SECRET_KEY"),
-        region_name="us-east-1",  # same region arxiv bucket is in
-    )
-
-    for filename in tqdm(soup.find_all("filename"), total=number_files, desc="File download"):
-        file_key = filename.text
-        logger.info(f"Downloading s3://arxiv/{file_key} to {output_dir / Path(file_key)}...")
-
-        if not (output_dir / Path(file_key)).exists():
-            try:
-                s3ressource.meta.client.download_file(
-                    Bucket="arxiv",
-                    Key=file_key,
-                    Filename=(output_dir / Path(file_key).name).as_posix(),
-                    ExtraArgs={"RequestPayer": "requester"},
-                )
-            except ClientError as e:
-                if e.response["Error"]["Code"] == "404":
-                    logger.error(f"{file_key} does not exist in arxiv bucket")
-                else:
-                    raise
-        else:
-            logger.info(f"{(output_dir / Path(file_key)).as_posix()} already exists. Skipping.")
+    checksums = ChecksumCache(output_dir / CHECKSUM_FILE)
+    downloader = S3BulkDownloader(output_dir, workers=workers, chunk_size=chunk_size, checksums=checksums)
+    downloader.download_all([(file.filename, file.size) for file in manifest.files])
 
-    # Verify integrity
+    # Verify integrity: the sums of the files downloaded above come from the cache
     logger.info("Verifying file integrity.")
     integrity_report = output_dir / "integrity_report.json"
-    problematic_files = []
-
-    for xml_file in tqdm(soup.find_all("file"), total=number_files, desc="Verifying file integrity"):
-        content_md5sum = xml_file.find("content_md5sum").text
-        disk_file = output_dir / Path(xml_file.find("filename").text)
-        file_hash_md5 = md5(disk_file)
-        if content_md5sum != file_hash_md5:
-            problematic_files.append(disk_file.as_posix())
+    expected = {downloader.destination(file.filename): file.md5sum for file in manifest.files}
+    problematic_files = [path.as_posix() for path in verify_files(expected, cache=checksums)]
 
     logger.warning(
         f"There was a problem with {len(problematic_files)}. Please check `integrity_report.json` for details."
@@ -0,0 +1,187 @@
+"""In-process cache resolving (firstname, lastname) pairs to `authors.id`.
+
+The SQL loaders look up every author of every paper. The cache is warmed from the
+`authors` table with a single query, then serves those lookups from memory. Only
+the misses are probed in the database before being inserted: another process may
+have added the author since the cache was warmed, and the unique (lastname, firstname)
+index would reject a second copy.
+"""
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import coloredlogs
+from sqlalchemy import insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm.session import sessionmaker
+
+from .db_models import Authors
+
+# Number of values bound in a single `IN` probe (SQLite allows 999 by default)
+PROBE_CHUNK_SIZE = 500
+DEFAULT_MAXSIZE = 200_000
+
+AuthorKey = Tuple[str, str]
+
+log_fmt = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+logging.basicConfig(level=logging.INFO, format=log_fmt)
+logger = logging.getLogger(__name__)
+coloredlogs.install()
+
+
+def chunks(items: List, size: int = PROBE_CHUNK_SIZE) -> Iterator[List]:
+    """Splits `items` into lists of at most `size` elements"""
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+class AuthorCache:
+    """Bounded LRU mapping of (firstname, lastname) to author ids.
+
+    Parameters
+    ----------
+    maxsize : int, optional
+        maximum number of authors kept in memory, by default DEFAULT_MAXSIZE
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self._ids: "OrderedDict[AuthorKey, int]" = OrderedDict()
+        self.warmed = False
+        self.hits = 0
+        self.misses = 0
+        self.db_lookups = 0
+        self.inserts = 0
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def warm(self, session: sessionmaker) -> None:
+        """Loads up to `maxsize` authors from the `authors` table in one query"""
+        self._ids.clear()
+        rows = (
+            session.query(Authors.id, Authors.firstname, Authors.lastname)
+            .order_by(Authors.id.desc())
+            .limit(self.maxsize)
+            .all()
+        )
+        for author_id, fn, ln in reversed(rows):
+            self._ids.setdefault((fn, ln), author_id)
+        self.warmed = True
+        logger.info(f"Author cache warmed with {len(self._ids):,d} authors.")
+
+    def invalidate(self) -> None:
+        """Forgets every author, e.g. after a rollback or when the tables are recreated"""
+        self._ids.clear()
+        self.warmed = False
+
+    def get(self, key: AuthorKey) -> Optional[int]:
+        author_id = self._ids.get(key)
+        if author_id is None:
+            self.misses += 1
+            return None
+        self._ids.move_to_end(key)
+        self.hits += 1
+        return author_id
+
+    def put(self, key: AuthorKey, author_id: int) -> None:
+        self._ids[key] = author_id
+        self._ids.move_to_end(key)
+        if len(self._ids) > self.maxsize:
+            self._ids.popitem(last=False)
+
+    def probe(self, session: sessionmaker, keys: List[AuthorKey]) -> Dict[AuthorKey, int]:
+        """Looks `keys` up in the database with one query per chunk of lastnames"""
+        wanted = set(keys)
+        author_ids: Dict[AuthorKey, int] = {}
+        for chunk in chunks(list({ln for _, ln in wanted})):
+            self.db_lookups += 1
+            for author_id, fn, ln in session.query(Authors.id, Authors.firstname, Authors.lastname).filter(
+                Authors.lastname.in_(chunk)
+            ):
+                if (fn, ln) in wanted:
+                    author_ids.setdefault((fn, ln), author_id)
+        for key, author_id in author_ids.items():
+            self.put(key, author_id)
+        return author_ids
+
+    def resolve(
+        self, session: sessionmaker, firstname: str, lastname: str, institution: Optional[str] = None
+    ) -> int:
+        """Returns the id of an author, inserting the author if it doesn't exist yet"""
+        return self.resolve_many(session, {(firstname, lastname): institution})[(firstname, lastname)]
+
+    def resolve_many(self, session: sessionmaker, authors: Dict[AuthorKey, Optional[str]]) -> Dict[AuthorKey, int]:
+        """Returns the ids of several authors, inserting the missing ones with executemany
+
+        Parameters
+        ----------
+        session : sessionmaker
+            The SQLAlchemy session in which every operation is done. Nothing is committed.
+        authors : Dict[AuthorKey, Optional[str]]
+            the institution of each (firstname, lastname) pair, used when the author is inserted
+
+        Returns
+        -------
+        Dict[AuthorKey, int]
+            the id of each author
+        """
+        if not self.warmed:
+            self.warm(session)
+
+        author_ids: Dict[AuthorKey, int] = {}
+        unknown = []
+        for key in authors:
+            author_id = self.get(key)
+            if author_id is None:
+                unknown.append(key)
+            else:
+                author_ids[key] = author_id
+
+        # The authors added by other writers since the cache was warmed are only found in the database
+        if unknown:
+            author_ids.update(self.probe(session, unknown))
+
+        missing = [key for key in unknown if key not in author_ids]
+        if len(missing) == 1:
+            (fn, ln), = missing
+            result = session.execute(insert(Authors).values(firstname=fn, lastname=ln, institution=authors[(fn, ln)]))
+            author_ids[(fn, ln)] = result.inserted_primary_key[0]
+            self.put((fn, ln), author_ids[(fn, ln)])
+        elif missing:
+            session.execute(
+                insert(Authors),
+                [{"firstname": fn, "lastname": ln, "institution": authors[(fn, ln)]} for fn, ln in missing],
+            )
+            author_ids.update(self.probe(session, missing))
+        self.inserts += len(missing)
+        return author_ids
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters, along with the number of lookups the cache spared"""
+        return {
+            "size": len(self._ids),
+            "hits": self.hits,
+            "misses": self.misses,
+            "db_lookups": self.db_lookups,
+            "inserts": self.inserts,
+            "saved_roundtrips": self.hits + self.misses - self.db_lookups,
+        }
+
+    def log_stats(self) -> None:
+        stats = self.stats()
+        logger.info(
+            f"Author cache: {stats['hits']:,d} hits, {stats['misses']:,d} misses, "
+            f"{stats['db_lookups']:,d} DB lookups ({stats['saved_roundtrips']:,d} roundtrips saved)."
+        )
+
+
+_CACHES: Dict[str, AuthorCache] = {}
+
+
+def get_author_cache(engine: Engine, maxsize: int = DEFAULT_MAXSIZE) -> AuthorCache:
+    """Returns the cache shared by every loader writing to the database of `engine`"""
+    key = str(engine.url)
+    if key not in _CACHES:
+        _CACHES[key] = AuthorCache(maxsize=maxsize)
+    return _CACHES[key]
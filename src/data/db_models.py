@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Table
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Index, Table
 from sqlalchemy.orm import relationship
 from . import Base
 
@@ -11,6 +11,13 @@ class PaperAuthor(Base):
 
 class Papers(Base):
     __tablename__ = "papers"
+    # Created on existing databases by the migrations of `schema.py`
+    __table_args__ = (
+        Index("uq_papers_hash_dataset", "hash", "dataset", unique=True),
+        Index("ix_papers_title", "title"),
+        Index("ix_papers_year", "year"),
+        Index("ix_papers_dataset", "dataset"),
+    )
 
     id = Column(Integer, primary_key=True)
     hash = Column(String(36))
@@ -34,6 +41,8 @@ def __repr__(self):
 
 class Authors(Base):
     __tablename__ = "authors"
+    # The lastname comes first for the `lastname IN (...)` probes of the author cache
+    __table_args__ = (Index("uq_authors_name", "lastname", "firstname", unique=True),)
     id = Column(Integer, primary_key=True)
     firstname = Column(String(30), nullable=False)
     lastname = Column(String(30), nullable=False)
@@ -53,3 +62,28 @@ class Links(Base):
 
     def __repr__(self):
         return f"{self.type}: {self.url}"
+
+
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+    version = Column(Integer, primary_key=True)
+    description = Column(String(200), nullable=False)
+    applied_date = Column(DateTime)
+
+    def __repr__(self):
+        return f"SchemaVersion({self.version}: {self.description})"
+
+
+class HarvestJobs(Base):
+    __tablename__ = "harvest_jobs"
+    id = Column(Integer, primary_key=True)
+    query = Column(String(200), nullable=False)
+    page_size = Column(Integer, nullable=False)
+    max_results = Column(Integer, nullable=False)
+    next_offset = Column(Integer, nullable=False, default=0)
+    status = Column(String(20), nullable=False)
+    created_date = Column(DateTime)
+    updated_date = Column(DateTime)
+
+    def __repr__(self):
+        return f"HarvestJob({self.query!r}, offset={self.next_offset}/{self.max_results}, status={self.status})"
@@ -7,14 +7,81 @@
 
 import pymongo
 import requests
-from sqlalchemy import create_engine
-from sqlalchemy.engine import Engine
+from pydantic import BaseModel
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import QueuePool
 from requests.exceptions import ConnectionError
 from json.decoder import JSONDecodeError
 
+from .http_client import get_http_client
+
 DATABASES = Literal["sqlite", "mssql", "oracle", "mysql", "postgresql"]
 
 
+class EngineProfile(BaseModel):
+    """Settings of an engine tuned for one kind of workload
+
+    The pragmas are run on every new SQLite connection. The pool and the cache of
+    compiled statements (`query_cache_size`) apply to every dialect.
+    """
+
+    sqlite_pragmas: Dict[str, Any]
+    pool_size: int
+    max_overflow: int
+    query_cache_size: int
+    pool_pre_ping: bool = False
+    pool_recycle: int = -1
+    echo: bool = False
+
+
+ENGINE_PROFILES = {
+    # Loaders writing a whole corpus that can be loaded again if the machine crashes
+    "bulk-load": EngineProfile(
+        sqlite_pragmas={
+            "journal_mode": "WAL",
+            "synchronous": "OFF",
+            "mmap_size": 256 * 2**20,
+            "cache_size": -256 * 2**10,
+            "temp_store": "MEMORY",
+        },
+        pool_size=2,
+        max_overflow=0,
+        query_cache_size=1000,
+    ),
+    # Few long read queries over the whole database
+    "analytics": EngineProfile(
+        sqlite_pragmas={
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "mmap_size": 2**30,
+            "cache_size": -512 * 2**10,
+            "temp_store": "MEMORY",
+        },
+        pool_size=4,
+        max_overflow=4,
+        query_cache_size=500,
+        pool_pre_ping=True,
+    ),
+    # Many short transactions, e.g. the harvesters saving their pages and jobs
+    "interactive": EngineProfile(
+        sqlite_pragmas={
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "mmap_size": 64 * 2**20,
+            "cache_size": -64 * 2**10,
+            "temp_store": "DEFAULT",
+        },
+        pool_size=5,
+        max_overflow=10,
+        query_cache_size=500,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+    ),
+}
+DEFAULT_ENGINE_PROFILE = "interactive"
+
+
 class MongoConnector:
     """Connector handling special instances of MongoDB"""
 
@@ -93,7 +160,7 @@ class NeuripsAPIConnector:
     def get_metadata(cls, hash: str, year: int) -> Dict:
         json_url = f"{cls.base_url}paper/{year}/file/{hash}-Metadata.json"
         try:
-            req_json = requests.get(json_url)
+            req_json = get_http_client().get(json_url)
         except ConnectionError as e:
             return {"error": f"{e}", "url": json_url}
 
@@ -127,6 +194,7 @@ def load_sql_engine(
     port: int = 0,
     database: Union[str, PathLike[str]] = "",
     host: str = "localhost",
+    profile: str = DEFAULT_ENGINE_PROFILE,
 ) -> Engine:
     """Creates a SQL instance based on uri parameters
 
@@ -144,6 +212,8 @@ def load_sql_engine(
         The name of the database (or path if the db is a SQLite db), by default ""
     host : str, optional
         The name of the host of the db, by default "localhost"
+    profile : str, optional
+        The name of one of ENGINE_PROFILES, by default DEFAULT_ENGINE_PROFILE
 
     Returns
     -------
@@ -162,5 +232,53 @@ def load_sql_engine(
     else:
         raise NameError("One or multiple fields aren't referenced.")
 
-    engine = create_engine(db_uri, echo=True)
+    return create_sql_engine(db_uri, profile=profile)
+
+
+def create_sql_engine(db_uri: str, profile: str = DEFAULT_ENGINE_PROFILE) -> Engine:
+    """Creates an engine with the settings of one of ENGINE_PROFILES
+
+    Parameters
+    ----------
+    db_uri : str
+        The URI of the database
+    profile : str, optional
+        The name of the profile, by default DEFAULT_ENGINE_PROFILE
+
+    Returns
+    -------
+    Engine
+        an SQL engine instance
+    """
+    if profile not in ENGINE_PROFILES:
+        raise ValueError(f"Profile must be one of the following: {list(ENGINE_PROFILES)}")
+    settings = ENGINE_PROFILES[profile]
+    options: Dict[str, Any] = dict(echo=settings.echo, query_cache_size=settings.query_cache_size)
+    pool_options = dict(
+        pool_size=settings.pool_size,
+        max_overflow=settings.max_overflow,
+        pool_pre_ping=settings.pool_pre_ping,
+        pool_recycle=settings.pool_recycle,
+    )
+    url = make_url(db_uri)
+    is_sqlite = url.get_backend_name() == "sqlite"
+    if not is_sqlite:
+        options.update(pool_options)
+    elif url.database and url.database != ":memory:":
+        # SQLAlchemy 1.4 opens a new SQLite file connection per checkout, dropping its page cache and map.
+        # In-memory databases keep their single connection.
+        options.update(pool_options, poolclass=QueuePool, connect_args={"check_same_thread": False})
+    if profile == "bulk-load" and url.get_driver_name() == "psycopg2":
+        options.update(executemany_mode="values_plus_batch")
+
+    engine = create_engine(db_uri, **options)
+    if is_sqlite:
+
+        @event.listens_for(engine, "connect")
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for pragma, value in settings.sqlite_pragmas.items():
+                cursor.execute(f"PRAGMA {pragma} = {value}")
+            cursor.close()
+
     return engine
@@ -0,0 +1,125 @@
+"""Concurrent, resumable downloader of files served over HTTP.
+
+Targets that already exist are skipped before any request is sent. The others are
+spread over a pool of threads, streamed by blocks of `chunk_size` bytes into a
+`.part` file and renamed once complete, so a target is either absent or whole. A
+`.part` file is only complete once it has the size announced by the server. An
+interrupted download restarts from the size of its `.part` file with a `Range` request.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import coloredlogs
+from tqdm import tqdm
+
+from .http_client import REQUEST_ERRORS, HttpClient, get_http_client
+
+DEFAULT_WORKERS = 8
+DEFAULT_CHUNK_SIZE = 2**20
+
+log_fmt = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+logging.basicConfig(level=logging.INFO, format=log_fmt)
+logger = logging.getLogger(__name__)
+coloredlogs.install()
+
+
+class FileDownloader:
+    """Downloads (url, destination) pairs with a pool of threads.
+
+    Parameters
+    ----------
+    workers : int, optional
+        number of files downloaded at the same time, by default DEFAULT_WORKERS
+    chunk_size : int, optional
+        size of the blocks read from the response and written to disk, by default DEFAULT_CHUNK_SIZE
+    client : Optional[HttpClient], optional
+        the HTTP client, by default the shared one
+    """
+
+    def __init__(
+        self, workers: int = DEFAULT_WORKERS, chunk_size: int = DEFAULT_CHUNK_SIZE, client: Optional[HttpClient] = None
+    ):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.client = client or get_http_client()
+
+    def download_all(self, files: List[Tuple[str, Path]], desc: str = "File download") -> Dict[str, int]:
+        """Downloads the files whose destination doesn't exist yet
+
+        Returns
+        -------
+        Dict[str, int]
+            number of files per status: "skipped", "done", "missing" or "failed"
+        """
+        pending = [(url, dst) for url, dst in files if not dst.exists()]
+        summary = {"skipped": len(files) - len(pending), "done": 0, "missing": 0, "failed": 0}
+        logger.info(f"{summary['skipped']} files already downloaded, {len(pending)} to go.")
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(self.download_file, url, dst) for url, dst in pending]
+            for future in tqdm(as_completed(futures), total=len(futures), desc=desc):
+                summary[future.result()] += 1
+        logger.info(f"Download summary: {summary}")
+        return summary
+
+    @staticmethod
+    def expected_size(r, offset: int) -> Optional[int]:
+        """Size of the whole file announced by a 200 or 206 response, None if it doesn't tell"""
+        total = r.headers.get("Content-Range", "").rpartition("/")[2]
+        if r.status_code == 206 and total.isdigit():
+            return int(total)
+        length = r.headers.get("Content-Length", "")
+        # The length of an encoded body isn't the one of the file
+        if not length.isdigit() or r.headers.get("Content-Encoding", "identity") != "identity":
+            return None
+        return (offset if r.status_code == 206 else 0) + int(length)
+
+    def download_file(self, url: str, dst: Path) -> str:
+        """Downloads one file, resuming from its `.part` file if there is one.
+
+        Returns
+        -------
+        str
+            "done", "missing" (404) or "failed"
+        """
+        part = dst.with_name(dst.name + ".part")
+        offset = part.stat().st_size if part.exists() else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        try:
+            r = self.client.get(url, stream=True, headers=headers)
+            with r:
+                if r.status_code == 416:
+                    # Nothing left after the offset: the part file holds the whole file, unless it is larger
+                    if r.headers.get("Content-Range", "").rpartition("/")[2] != str(offset):
+                        logger.error(f"{part} doesn't match {url}. Removing it.")
+                        part.unlink()
+                        return "failed"
+                elif r.status_code in (200, 206):
+                    # A server ignoring the range sends the whole file again
+                    mode = "ab" if r.status_code == 206 else "wb"
+                    with open(part, mode, buffering=self.chunk_size) as f:
+                        for chunk in r.iter_content(self.chunk_size):
+                            f.write(chunk)
+                    # A dropped connection may still end the stream cleanly
+                    expected = self.expected_size(r, offset)
+                    if expected is not None and part.stat().st_size != expected:
+                        logger.error(
+                            f"Download of {url} stopped at {part.stat().st_size:,d} of {expected:,d} bytes. "
+                            "It will resume from there."
+                        )
+                        return "failed"
+                elif r.status_code == 404:
+                    logger.error(f"{url} not found")
+                    return "missing"
+                else:
+                    logger.error(f"Download of {url} failed with code {r.status_code}")
+                    return "failed"
+            os.replace(part, dst)
+        except (*REQUEST_ERRORS, OSError) as e:
+            logger.error(f"Download of {url} failed: {e}")
+            return "failed"
+        logger.info(f"{dst.name} successfully written.")
+        return "done"
@@ -0,0 +1,208 @@
+"""Checkpoints of the arXiv query harvests.
+
+Each harvest is recorded in the `harvest_jobs` table with its query, page size and
+`next_offset`, the offset of the first page that is not saved yet. The offset is
+updated in the same transaction as the entries of the page, so after a crash the
+table never claims a page that wasn't committed, and a rerun of the same query
+resumes from that offset.
+"""
+import datetime as dt
+import logging
+from typing import List, Tuple
+
+import coloredlogs
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm.session import sessionmaker
+
+from . import Base
+from .db_models import HarvestJobs
+
+JOB_RUNNING = "running"
+JOB_INCOMPLETE = "incomplete"
+JOB_DONE = "done"
+JOB_ABANDONED = "abandoned"
+
+Checkpoint = Tuple[int, int]
+
+log_fmt = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+logging.basicConfig(level=logging.INFO, format=log_fmt)
+logger = logging.getLogger(__name__)
+coloredlogs.install()
+
+
+def open_harvest_job(
+    engine: Engine, query: str, max_results: int, page_size: int, restart: bool = False
+) -> HarvestJobs:
+    """Returns the unfinished job of the same query and page size, or a new job.
+
+    Parameters
+    ----------
+    engine : Engine
+        SQLAlchemy engine. The `harvest_jobs` table is created if needed.
+    query : str
+        the full query
+    max_results : int
+        maximum requested results
+    page_size : int
+        number of results per page
+    restart : bool, optional
+        abandon the unfinished job and start over, by default False
+
+    Returns
+    -------
+    HarvestJobs
+        the job, detached from its session
+    """
+    Base.metadata.create_all(engine, tables=[HarvestJobs.__table__])
+    Session = sessionmaker(engine, expire_on_commit=False)
+    session = Session()
+    now = dt.datetime.utcnow()
+    job = (
+        session.query(HarvestJobs)
+        .filter_by(query=query, max_results=max_results, page_size=page_size)
+        .filter(HarvestJobs.status.in_([JOB_RUNNING, JOB_INCOMPLETE]))
+        .order_by(HarvestJobs.id.desc())
+        .first()
+    )
+    if job is not None and restart:
+        logger.info(f"Abandoning {job}")
+        job.status = JOB_ABANDONED
+        job.updated_date = now
+        job = None
+
+    if job is None:
+        job = HarvestJobs(
+            query=query,
+            max_results=max_results,
+            page_size=page_size,
+            next_offset=0,
+            status=JOB_RUNNING,
+            created_date=now,
+            updated_date=now,
+        )
+        session.add(job)
+    else:
+        logger.info(f"Resuming {job}")
+        job.status = JOB_RUNNING
+        job.updated_date = now
+    session.commit()
+    session.close()
+    return job
+
+
+def open_window_job(engine: Engine, query: str, max_results: int, page_size: int, restart: bool = False) -> HarvestJobs:
+    """Returns the last job of a date window, or a new job, keyed on the query alone.
+
+    The query holds the label of the window, whose bounds are stable from one run to the
+    next, while its count may change by a few papers: an unfinished job is resumed with
+    the new count and page size. A finished job is returned as is, for its window to be
+    skipped.
+
+    Parameters
+    ----------
+    engine : Engine
+        SQLAlchemy engine. The `harvest_jobs` table is created if needed.
+    query : str
+        the full query, window included
+    max_results : int
+        number of results of the window
+    page_size : int
+        number of results per page
+    restart : bool, optional
+        abandon the last job of the window, even finished, and start over, by default False
+
+    Returns
+    -------
+    HarvestJobs
+        the job, detached from its session
+    """
+    Base.metadata.create_all(engine, tables=[HarvestJobs.__table__])
+    Session = sessionmaker(engine, expire_on_commit=False)
+    session = Session()
+    now = dt.datetime.utcnow()
+    job = (
+        session.query(HarvestJobs)
+        .filter_by(query=query)
+        .filter(HarvestJobs.status != JOB_ABANDONED)
+        .order_by(HarvestJobs.id.desc())
+        .first()
+    )
+    if job is not None and restart:
+        logger.info(f"Abandoning {job}")
+        job.status = JOB_ABANDONED
+        job.updated_date = now
+        job = None
+
+    if job is None:
+        job = HarvestJobs(
+            query=query,
+            max_results=max_results,
+            page_size=page_size,
+            next_offset=0,
+            status=JOB_RUNNING,
+            created_date=now,
+            updated_date=now,
+        )
+        session.add(job)
+    elif job.status != JOB_DONE:
+        logger.info(f"Resuming {job}")
+        job.max_results = max_results
+        job.page_size = page_size
+        job.status = JOB_RUNNING
+        job.updated_date = now
+    session.commit()
+    session.close()
+    return job
+
+
+def close_harvest_job(engine: Engine, job_id: int) -> str:
+    """Marks the job as done if every page was saved, as incomplete otherwise, and returns its status"""
+    session = sessionmaker(engine)()
+    job = session.query(HarvestJobs).get(job_id)
+    job.status = JOB_DONE if job.next_offset >= job.max_results else JOB_INCOMPLETE
+    job.updated_date = dt.datetime.utcnow()
+    status = job.status
+    logger.info(f"Closing {job}")
+    session.commit()
+    session.close()
+    return status
+
+
+def record_checkpoint(session: sessionmaker, checkpoint: Checkpoint) -> None:
+    """Moves the offset of a job within the current transaction. Nothing is committed."""
+    job_id, next_offset = checkpoint
+    session.query(HarvestJobs).filter_by(id=job_id).update(
+        {"next_offset": next_offset, "updated_date": dt.datetime.utcnow()}, synchronize_session=False
+    )
+
+
+class PageTracker:
+    """Computes the checkpoints of a job whose pages may be saved out of order.
+
+    The offset of the job only moves past pages that are all saved: if a page fails,
+    the job resumes from it, even though later pages were committed.
+
+    Parameters
+    ----------
+    job_id : int
+        id of the job in `harvest_jobs`
+    offsets : List[int]
+        offsets of the pages left to save
+    end : int
+        offset reached once every page is saved
+    """
+
+    def __init__(self, job_id: int, offsets: List[int], end: int):
+        self.job_id = job_id
+        self.offsets = sorted(offsets)
+        self.end = end
+        self.saved = set()
+
+    def checkpoint(self, offset: int) -> Checkpoint:
+        """The checkpoint to record along with the page at `offset`"""
+        saved = self.saved | {offset}
+        next_offset = next((o for o in self.offsets if o not in saved), self.end)
+        return self.job_id, next_offset
+
+    def mark_saved(self, offset: int) -> None:
+        self.saved.add(offset)
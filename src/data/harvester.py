@@ -0,0 +1,307 @@
+"""Concurrent harvester for the arXiv API.
+
+`compose_arxiv_query` fetches a page, parses it, writes it and then sleeps, so the
+network, the parser and the database wait for each other. The harvester runs those
+three stages as asyncio tasks linked by bounded queues: while a page is being parsed
+or written, the next request is already waiting for its slot from the rate limiter.
+"""
+
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import coloredlogs
+from pydantic import BaseModel
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm.session import sessionmaker
+
+from .arxiv import (
+    BASE_URL,
+    ArxivFeedError,
+    PAUSE_TIME,
+    arxiv_page_size,
+    arxiv_pages,
+    is_missing_page,
+    log_arxiv_error,
+    parse_arxiv_feed,
+    save_arxiv_page,
+)
+from .harvest_jobs import PageTracker, close_harvest_job, open_harvest_job
+from .http_client import REQUEST_ERRORS, get_http_client
+
+log_fmt = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+logging.basicConfig(level=logging.INFO, format=log_fmt)
+logger = logging.getLogger(__name__)
+coloredlogs.install()
+
+
+class HarvestStats(BaseModel):
+    pages: int = 0
+    failed_pages: int = 0
+    entries: int = 0
+    duplicates: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def entries_per_sec(self) -> float:
+        return self.entries / self.elapsed if self.elapsed else 0.0
+
+
+class RateLimiter(ABC):
+    """Interface of the limiters accepted by `ArxivHarvester`.
+
+    `acquire` is awaited before every request and returns once the request may start.
+    """
+
+    @abstractmethod
+    async def acquire(self) -> None:
+        pass
+
+
+class TokenBucketLimiter(RateLimiter):
+    """Token bucket refilled at `rate` tokens per second and holding at most `capacity` tokens.
+
+    The default (one token every PAUSE_TIME seconds, no burst) reproduces the request
+    spacing asked by arXiv.
+    """
+
+    def __init__(self, rate: float = 1 / PAUSE_TIME, capacity: float = 1):
+        if rate <= 0 or capacity < 1:
+            raise ValueError("rate must be positive and capacity at least 1")
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    async def acquire(self) -> None:
+        # The lock belongs to the running event loop, so that successive runs can share the limiter
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+class ArxivHarvester:
+    """Fetches, parses and saves arXiv pages in three overlapping stages.
+
+    Parameters
+    ----------
+    engine : Engine
+        SQLAlchemy engine. All writes go through a single session on a single thread.
+    limiter : Optional[RateLimiter], optional
+        limiter awaited before each request, by default a `TokenBucketLimiter`
+    max_fetchers : int, optional
+        number of requests allowed in flight, by default 1 (arXiv asks for a single connection)
+    queue_size : int, optional
+        capacity of the queues between the stages, by default 2 pages
+    parser : str, optional
+        Atom parser, "lxml" or "bs4", by default "lxml"
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        limiter: Optional[RateLimiter] = None,
+        max_fetchers: int = 1,
+        queue_size: int = 2,
+        parser: str = "lxml",
+    ):
+        self.engine = engine
+        self.limiter = limiter or TokenBucketLimiter()
+        self.max_fetchers = max_fetchers
+        self.queue_size = queue_size
+        self.parser = parser
+        self.stats = HarvestStats()
+        # arXiv ids saved during the run, so that an entry returned by several queries is saved once
+        self.seen_ids = set()
+
+    def harvest(self, pages: List[Tuple[int, str]], tracker: Optional[PageTracker] = None) -> HarvestStats:
+        """Runs the pipeline over the (offset, URL) `pages` and returns its statistics.
+
+        If a `tracker` is given, the checkpoint of its job is committed with every page.
+        """
+        return self.harvest_many([(pages, tracker)])
+
+    def harvest_many(self, queries: List[Tuple[List[Tuple[int, str]], Optional[PageTracker]]]) -> HarvestStats:
+        """Runs the pages of several queries, each with its own tracker, through the same pipeline"""
+        t1 = time.monotonic()
+        asyncio.run(self._run([(tracker, offset, url) for pages, tracker in queries for offset, url in pages]))
+        self.stats.elapsed = time.monotonic() - t1
+        logger.info(
+            f"Harvested {self.stats.entries} entries from {self.stats.pages} pages "
+            f"({self.stats.failed_pages} failed, {self.stats.duplicates} duplicates) in {self.stats.elapsed:.2f}s "
+            f"({self.stats.entries_per_sec:.2f} entries/s)"
+        )
+        return self.stats
+
+    async def _run(self, pages: List[Tuple[Optional[PageTracker], int, str]]) -> None:
+        url_queue: asyncio.Queue = asyncio.Queue()
+        for page in pages:
+            url_queue.put_nowait(page)
+        raw_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        page_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+
+        # The session only ever lives on the single writer thread
+        Session = sessionmaker(self.engine)
+        session = Session()
+        fetch_pool = ThreadPoolExecutor(max_workers=self.max_fetchers)
+        parse_pool = ThreadPoolExecutor(max_workers=1)
+        write_pool = ThreadPoolExecutor(max_workers=1)
+
+        stages = [
+            asyncio.create_task(self._fetch_all(url_queue, raw_queue, fetch_pool)),
+            asyncio.create_task(self._parse_stage(raw_queue, page_queue, parse_pool)),
+            asyncio.create_task(self._write_stage(page_queue, session, write_pool)),
+        ]
+        try:
+            # A stage that dies would leave the others blocked on its queue
+            done, _ = await asyncio.wait(stages, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if task.exception() is not None:
+                    raise task.exception()
+        finally:
+            for task in stages:
+                task.cancel()
+            await asyncio.get_running_loop().run_in_executor(write_pool, session.close)
+            for pool in [fetch_pool, parse_pool, write_pool]:
+                pool.shutdown(wait=True)
+
+    async def _fetch_all(self, url_queue: asyncio.Queue, raw_queue: asyncio.Queue, pool: ThreadPoolExecutor):
+        fetchers = [
+            asyncio.create_task(self._fetch_stage(url_queue, raw_queue, pool)) for _ in range(self.max_fetchers)
+        ]
+        try:
+            await asyncio.gather(*fetchers)
+        finally:
+            for task in fetchers:
+                task.cancel()
+        await raw_queue.put(None)
+
+    async def _fetch_stage(self, url_queue: asyncio.Queue, raw_queue: asyncio.Queue, pool: ThreadPoolExecutor):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                tracker, offset, url = url_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await self.limiter.acquire()
+            logger.info(f"Requesting {url}")
+            try:
+                r = await loop.run_in_executor(pool, get_http_client().get, url)
+            except REQUEST_ERRORS as e:
+                logger.error(f"Request to {url} failed: {e}")
+                self.stats.failed_pages += 1
+                continue
+            if r.status_code != 200:
+                log_arxiv_error(r.content)
+                self.stats.failed_pages += 1
+                continue
+            await raw_queue.put((tracker, offset, r.content))
+
+    async def _parse_stage(self, raw_queue: asyncio.Queue, page_queue: asyncio.Queue, pool: ThreadPoolExecutor):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await raw_queue.get()
+            if item is None:
+                await page_queue.put(None)
+                return
+            tracker, offset, content = item
+            try:
+                entries = await loop.run_in_executor(pool, parse_arxiv_feed, content, self.parser)
+            except ArxivFeedError as e:
+                # Left to the next run: the checkpoint of the job can't move past this page
+                logger.error(f"Couldn't parse the page at offset {offset}: {e}")
+                self.stats.failed_pages += 1
+                continue
+            if is_missing_page(content, entries, offset):
+                logger.warning(f"The page at offset {offset} has no entries, it's left to the next run")
+                self.stats.failed_pages += 1
+                continue
+            await page_queue.put((tracker, offset, entries))
+
+    async def _write_stage(self, page_queue: asyncio.Queue, session, pool: ThreadPoolExecutor):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await page_queue.get()
+            if item is None:
+                return
+            tracker, offset, entries = item
+            new_entries = [entry for entry in entries if entry.arxiv_id is None or entry.arxiv_id not in self.seen_ids]
+            checkpoint = tracker.checkpoint(offset) if tracker else None
+            n_saved = await loop.run_in_executor(pool, save_arxiv_page, new_entries, session, checkpoint)
+            if n_saved is None:
+                self.stats.failed_pages += 1
+                continue
+            if tracker:
+                tracker.mark_saved(offset)
+            self.seen_ids.update(entry.arxiv_id for entry in new_entries if entry.arxiv_id)
+            self.stats.duplicates += len(entries) - len(new_entries)
+            self.stats.entries += n_saved
+            self.stats.pages += 1
+
+
+def harvest_arxiv_query(
+    query: str,
+    engine: Engine,
+    max_results: int = 500,
+    frac_requests: float = 0.5,
+    limiter: Optional[RateLimiter] = None,
+    max_fetchers: int = 1,
+    queue_size: int = 2,
+    base_url: str = BASE_URL,
+    parser: str = "lxml",
+    restart: bool = False,
+) -> HarvestStats:
+    """Concurrent counterpart of `compose_arxiv_query`: registers every page of
+    the query while respecting the request spacing enforced by `limiter`.
+
+    Parameters
+    ----------
+    query : str
+        the full query. Can be one or multiple words.
+    engine : Engine
+        SQLAlchemy engine.
+    max_results : int, optional
+        maximum requested results, by default 500
+    frac_requests : float, optional
+        chunk fraction, by default 0.5
+    limiter : Optional[RateLimiter], optional
+        limiter awaited before each request, by default one request every PAUSE_TIME seconds
+    max_fetchers : int, optional
+        number of requests allowed in flight, by default 1
+    queue_size : int, optional
+        capacity of the queues between the stages, by default 2
+    base_url : str, optional
+        root of the API, by default BASE_URL
+    parser : str, optional
+        Atom parser, "lxml" or "bs4", by default "lxml"
+    restart : bool, optional
+        ignore the checkpoint of a previous run of the query, by default False
+
+    Returns
+    -------
+    HarvestStats
+        pages, entries and throughput of the run
+    """
+    job = open_harvest_job(engine, query, max_results, arxiv_page_size(max_results, frac_requests), restart=restart)
+    pages = arxiv_pages(query, max_results, frac_requests, base_url=base_url, start=job.next_offset)
+    harvester = ArxivHarvester(engine, limiter=limiter, max_fetchers=max_fetchers, queue_size=queue_size, parser=parser)
+    stats = harvester.harvest(pages, tracker=PageTracker(job.id, [offset for offset, _ in pages], end=max_results))
+    close_harvest_job(engine, job.id)
+    return stats
@@ -0,0 +1,183 @@
+"""Extraction of the NeurIPS and ml4physics HTML pages, with interchangeable parsers.
+
+Every function takes the raw page and the name of a parser:
+
+- "bs4": BeautifulSoup with `html.parser`, the slowest but most lenient
+- "lxml": `lxml.html` and XPath, the default
+- "selectolax": the Modest engine of `selectolax`, when it is installed
+
+The parsers return the same values on the pages of both sites, see the fixtures of
+`tests/fixtures`. The pages are served in UTF-8.
+"""
+
+import logging
+from typing import Callable, Dict, List, Tuple, Union
+
+import coloredlogs
+import lxml.html
+from bs4 import BeautifulSoup
+
+try:
+    from selectolax.parser import HTMLParser
+except ImportError:
+    HTMLParser = None
+
+HTML_PARSERS = ("bs4", "lxml", "selectolax")
+DEFAULT_HTML_PARSER = "lxml"
+
+# XPath version of the `div.col` CSS selector
+COL_XPATH = "//div[contains(concat(' ', normalize-space(@class), ' '), ' col ')]"
+
+Page = Union[bytes, str]
+
+log_fmt = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+logging.basicConfig(level=logging.INFO, format=log_fmt)
+logger = logging.getLogger(__name__)
+coloredlogs.install()
+
+
+def available_parsers() -> List[str]:
+    return [parser for parser in HTML_PARSERS if parser != "selectolax" or HTMLParser is not None]
+
+
+def _check_parser(parser: str) -> None:
+    if parser not in HTML_PARSERS:
+        raise ValueError(f"Parser must be one of the following: {HTML_PARSERS}")
+    if parser == "selectolax" and HTMLParser is None:
+        raise ImportError("selectolax is not installed. Install it or use another parser.")
+
+
+def _lxml_tree(page: Page) -> lxml.html.HtmlElement:
+    return lxml.html.document_fromstring(page.decode("utf-8", errors="replace") if isinstance(page, bytes) else page)
+
+
+def _bs4_sections(page: Page) -> List[Tuple[str, str]]:
+    sections = []
+    for h4 in BeautifulSoup(page, "html.parser").select("div.col h4"):
+        paragraphs = []
+        sibling = h4.find_next_sibling()
+        while sibling is not None and sibling.name == "p":
+            paragraphs.append(sibling.text)
+            sibling = sibling.find_next_sibling()
+        if paragraphs:
+            sections.append((h4.text.strip(), "".join(paragraphs).strip()))
+    return sections
+
+
+def _lxml_next_tag(el: lxml.html.HtmlElement):
+    el = el.getnext()
+    while el is not None and not isinstance(el.tag, str):
+        el = el.getnext()
+    return el
+
+
+def _lxml_sections(page: Page) -> List[Tuple[str, str]]:
+    sections = []
+    for h4 in _lxml_tree(page).xpath(f"{COL_XPATH}//h4"):
+        paragraphs = []
+        sibling = _lxml_next_tag(h4)
+        while sibling is not None and sibling.tag == "p":
+            paragraphs.append(sibling.text_content())
+            sibling = _lxml_next_tag(sibling)
+        if paragraphs:
+            sections.append((h4.text_content().strip(), "".join(paragraphs).strip()))
+    return sections
+
+
+def _selectolax_next_tag(node):
+    node = node.next
+    while node is not None and node.tag in ("-text", "_comment"):
+        node = node.next
+    return node
+
+
+def _selectolax_sections(page: Page) -> List[Tuple[str, str]]:
+    sections = []
+    for h4 in HTMLParser(page).css("div.col h4"):
+        paragraphs = []
+        sibling = _selectolax_next_tag(h4)
+        while sibling is not None and sibling.tag == "p":
+            paragraphs.append(sibling.text(deep=True))
+            sibling = _selectolax_next_tag(sibling)
+        if paragraphs:
+            sections.append((h4.text(deep=True).strip(), "".join(paragraphs).strip()))
+    return sections
+
+
+def _bs4_links(page: Page) -> List[str]:
+    return [a["href"] for a in BeautifulSoup(page, "html.parser").select("div.col li a[href]")]
+
+
+def _lxml_links(page: Page) -> List[str]:
+    return [str(href) for href in _lxml_tree(page).xpath(f"{COL_XPATH}//li//a/@href")]
+
+
+def _selectolax_links(page: Page) -> List[str]:
+    return [a.attributes["href"] for a in HTMLParser(page).css("div.col li a[href]")]
+
+
+def _bs4_cells(page: Page) -> List[str]:
+    section = BeautifulSoup(page, "html.parser").select_one("section#papers")
+    table = section.select_one("div.table-wrapper") if section is not None else None
+    return [td.text for td in table.select("td")] if table is not None else []
+
+
+def _lxml_cells(page: Page) -> List[str]:
+    tables = _lxml_tree(page).xpath(
+        "(//section[@id='papers'])[1]//div[contains(concat(' ', normalize-space(@class), ' '), ' table-wrapper ')]"
+    )
+    return [td.text_content() for td in tables[0].iter("td")] if tables else []
+
+
+def _selectolax_cells(page: Page) -> List[str]:
+    section = HTMLParser(page).css_first("section#papers")
+    table = section.css_first("div.table-wrapper") if section is not None else None
+    return [td.text(deep=True) for td in table.css("td")] if table is not None else []
+
+
+_SECTIONS: Dict[str, Callable[[Page], List[Tuple[str, str]]]] = {
+    "bs4": _bs4_sections,
+    "lxml": _lxml_sections,
+    "selectolax": _selectolax_sections,
+}
+_LINKS: Dict[str, Callable[[Page], List[str]]] = {
+    "bs4": _bs4_links,
+    "lxml": _lxml_links,
+    "selectolax": _selectolax_links,
+}
+_CELLS: Dict[str, Callable[[Page], List[str]]] = {
+    "bs4": _bs4_cells,
+    "lxml": _lxml_cells,
+    "selectolax": _selectolax_cells,
+}
+
+
+def heading_sections(page: Page, parser: str = DEFAULT_HTML_PARSER) -> List[Tuple[str, str]]:
+    """Reads the `h4` headings of the `div.col` blocks with the text of the paragraphs right after them
+
+    Parameters
+    ----------
+    page : Page
+        the HTML page, e.g. the abstract page of a NeurIPS paper
+    parser : str, optional
+        one of HTML_PARSERS, by default DEFAULT_HTML_PARSER
+
+    Returns
+    -------
+    List[Tuple[str, str]]
+        (heading, paragraphs) pairs, stripped. Headings without a paragraph are left out.
+    """
+    _check_parser(parser)
+    return _SECTIONS[parser](page)
+
+
+def column_links(page: Page, parser: str = DEFAULT_HTML_PARSER) -> List[str]:
+    """The `href` of the links of the lists of the `div.col` blocks, e.g. the papers of a proceedings page"""
+    _check_parser(parser)
+    return _LINKS[parser](page)
+
+
+def papers_table_cells(page: Page, parser: str = DEFAULT_HTML_PARSER) -> List[str]:
+    """The raw text of the cells of the table of `section#papers`, as on the ml4physics pages"""
+    _check_parser(parser)
+    return _CELLS[parser](page)
@@ -0,0 +1,193 @@
+"""On-disk cache of HTTP responses, revalidated with conditional requests.
+
+Bodies are stored under the SHA-256 of their URL, along with the `ETag` and
+`Last-Modified` headers of the response. A cached URL is requested again with
+`If-None-Match`/`If-Modified-Since`, and a `304 Not Modified` answer is served from
+disk. In offline mode, cached responses are served without any request.
+
+The cache holds at most `max_bytes` of bodies: the least recently used entries are
+evicted first. It is shared by the threads of the crawlers: an entry evicted or
+rewritten by another thread is served as a miss.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+import coloredlogs
+import requests
+from pydantic import BaseModel
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from . import ROOT_DIR
+
+DEFAULT_CACHE_DIR = ROOT_DIR / "data" / "cache" / "http"
+DEFAULT_MAX_BYTES = 1024 * 2**20
+INDEX_FILE = "index.json"
+# The index is saved after this many new entries
+SAVE_EVERY = 100
+
+log_fmt = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+logging.basicConfig(level=logging.INFO, format=log_fmt)
+logger = logging.getLogger(__name__)
+coloredlogs.install()
+
+
+class CacheEntry(BaseModel):
+    url: str
+    size: int
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content_type: Optional[str]
+    last_used: float
+
+
+class CacheStats(BaseModel):
+    hits: int = 0
+    revalidated: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of the requests served from disk, with or without revalidation"""
+        total = self.hits + self.revalidated + self.misses
+        return (self.hits + self.revalidated) / total if total else 0.0
+
+
+class HttpCache:
+    """Disk cache of GET responses keyed by URL.
+
+    Parameters
+    ----------
+    root : Path, optional
+        folder of the cache, by default DEFAULT_CACHE_DIR
+    max_bytes : int, optional
+        maximum size of the cached bodies, by default DEFAULT_MAX_BYTES
+    offline : bool, optional
+        serve cached responses without revalidating them, by default False
+    """
+
+    def __init__(self, root: Path = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES, offline: bool = False):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self._lock = threading.Lock()
+        self.entries: Dict[str, CacheEntry] = {}
+        if (root / INDEX_FILE).exists():
+            with open(root / INDEX_FILE, "r") as f:
+                self.entries = {key: CacheEntry(**entry) for key, entry in json.load(f).items()}
+        self.total_bytes = sum(entry.size for entry in self.entries.values())
+        self._unsaved = 0
+        self.stats = CacheStats()
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha256(url.encode()).hexdigest()
+
+    def body_path(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self.entries.get(self.key(url))
+        if entry is not None and not self.body_path(self.key(url)).exists():
+            return None
+        return entry
+
+    def conditional_headers(self, entry: CacheEntry) -> Dict[str, str]:
+        headers = {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def response(self, url: str, revalidated: bool = False) -> Optional[requests.Response]:
+        """Builds a `200 OK` response out of the cached body of `url`, None if it was evicted meanwhile"""
+        key = self.key(url)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            entry.last_used = time.time()
+        try:
+            content = self.body_path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            if revalidated:
+                self.stats.revalidated += 1
+            else:
+                self.stats.hits += 1
+        r = requests.Response()
+        r.status_code = 200
+        r.url = url
+        r.headers = CaseInsensitiveDict({"Content-Type": entry.content_type or "", "Content-Length": str(entry.size)})
+        r.encoding = get_encoding_from_headers(r.headers)
+        r._content = content
+        return r
+
+    def store(self, url: str, r: requests.Response) -> None:
+        """Saves a `200 OK` response"""
+        key = self.key(url)
+        path = self.body_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Each thread writes its own temporary file, the last rename wins
+        with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f"{key}.", suffix=".tmp", delete=False) as f:
+            f.write(r.content)
+        os.replace(f.name, path)
+        entry = CacheEntry(
+            url=url,
+            size=len(r.content),
+            etag=r.headers.get("ETag"),
+            last_modified=r.headers.get("Last-Modified"),
+            content_type=r.headers.get("Content-Type"),
+            last_used=time.time(),
+        )
+        with self._lock:
+            self.stats.misses += 1
+            previous = self.entries.get(key)
+            self.total_bytes += entry.size - (previous.size if previous else 0)
+            self.entries[key] = entry
+            self._evict()
+            self._unsaved += 1
+            if self._unsaved >= SAVE_EVERY:
+                self._save()
+
+    def _evict(self) -> None:
+        if self.total_bytes <= self.max_bytes:
+            return
+        for key, entry in sorted(self.entries.items(), key=lambda item: item[1].last_used):
+            if self.total_bytes <= self.max_bytes:
+                break
+            self.body_path(key).unlink(missing_ok=True)
+            del self.entries[key]
+            self.total_bytes -= entry.size
+            self.stats.evictions += 1
+
+    def _save(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.root / (INDEX_FILE + ".tmp")
+        with open(tmp_file, "w") as f:
+            json.dump({key: entry.dict() for key, entry in self.entries.items()}, f)
+        os.replace(tmp_file, self.root / INDEX_FILE)
+        self._unsaved = 0
+
+    def save(self) -> None:
+        with self._lock:
+            self._save()
+
+    def log_stats(self) -> None:
+        logger.info(
+            f"HTTP cache: {self.stats.hits:,d} hits, {self.stats.revalidated:,d} revalidated, "
+            f"{self.stats.misses:,d} misses ({self.stats.hit_rate:.1%} hit rate), {self.stats.evictions:,d} evictions, "
+            f"{self.total_bytes / 2**20:.1f}/{self.max_bytes / 2**20:.0f} MB used."
+        )
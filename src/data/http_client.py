@@ -0,0 +1,224 @@
+"""HTTP client shared by the scrapers.
+
+Every request goes through one `requests.Session`, so connections are kept alive and
+reused instead of paying a TCP and TLS handshake per request. Each host gets its own
+pool, sized after the concurrency the scrapers use against it, and every request has
+a timeout. Latency and throughput are counted per host.
+
+Requests sent with `cached=True` go through an `HttpCache`: pages already fetched are
+revalidated with a conditional request, and served from disk when unchanged.
+
+HTTP/2 is used when asked for and `httpx` (with its `h2` extra) is installed.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+import coloredlogs
+import requests
+from pydantic import BaseModel
+from requests.adapters import HTTPAdapter
+
+from .http_cache import HttpCache
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (10, 60)
+DEFAULT_POOL_SIZE = 10
+# Connections kept alive per host
+POOL_SIZES = {
+    "papers.nips.cc": 16,
+    "proceedings.neurips.cc": 16,
+    "export.arxiv.org": 2,
+    "ml4physicalsciences.github.io": 4,
+    "api.archives-ouvertes.fr": 4,
+}
+
+log_fmt = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+logging.basicConfig(level=logging.INFO, format=log_fmt)
+logger = logging.getLogger(__name__)
+coloredlogs.install()
+
+# Errors raised by `HttpClient.get`, whichever library sent the request
+REQUEST_ERRORS = (requests.exceptions.RequestException,) + ((httpx.HTTPError,) if httpx is not None else ())
+
+
+class HostStats(BaseModel):
+    requests: int = 0
+    errors: int = 0
+    bytes: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def mean_latency(self) -> float:
+        return self.elapsed / self.requests if self.requests else 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Bytes per second spent waiting on the host"""
+        return self.bytes / self.elapsed if self.elapsed else 0.0
+
+
+class HttpClient:
+    """Keep-alive HTTP client with per-host connection pools, timeouts and counters.
+
+    Parameters
+    ----------
+    pool_sizes : Optional[Dict[str, int]], optional
+        number of connections kept alive for each host, by default POOL_SIZES
+    default_pool_size : int, optional
+        number of connections kept alive for the other hosts, by default DEFAULT_POOL_SIZE
+    timeout : Tuple[float, float], optional
+        (connect, read) timeout used when a request doesn't set one, by default DEFAULT_TIMEOUT
+    http2 : bool, optional
+        send the non-streamed requests over HTTP/2 with `httpx`, by default False
+    cache : Optional[HttpCache], optional
+        cache of the requests sent with `cached=True`, by default None
+    """
+
+    def __init__(
+        self,
+        pool_sizes: Optional[Dict[str, int]] = None,
+        default_pool_size: int = DEFAULT_POOL_SIZE,
+        timeout: Tuple[float, float] = DEFAULT_TIMEOUT,
+        http2: bool = False,
+        cache: Optional[HttpCache] = None,
+    ):
+        self.timeout = timeout
+        self.cache = cache
+        self.session = requests.Session()
+        default_adapter = HTTPAdapter(pool_connections=len(POOL_SIZES), pool_maxsize=default_pool_size)
+        self.session.mount("http://", default_adapter)
+        self.session.mount("https://", default_adapter)
+        for host, size in (POOL_SIZES if pool_sizes is None else pool_sizes).items():
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size)
+            self.session.mount(f"http://{host}", adapter)
+            self.session.mount(f"https://{host}", adapter)
+
+        self.http2_client = None
+        if http2:
+            if httpx is None:
+                logger.warning("httpx is not installed. Falling back to HTTP/1.1.")
+            else:
+                self.http2_client = httpx.Client(
+                    http2=True,
+                    timeout=httpx.Timeout(timeout[1], connect=timeout[0]),
+                    limits=httpx.Limits(max_keepalive_connections=max(POOL_SIZES.values(), default=default_pool_size)),
+                    follow_redirects=True,
+                )
+
+        self._lock = threading.Lock()
+        self.host_stats: Dict[str, HostStats] = {}
+
+    def get(
+        self, url: str, stream: bool = False, cached: bool = False, **kwargs
+    ) -> Union[requests.Response, "httpx.Response"]:
+        """Sends a GET request. `kwargs` are passed to `requests.Session.get`.
+
+        With `cached`, a non-streamed request goes through the cache of the client, if it has one.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        if cached and not stream and self.cache is not None:
+            return self._cached_get(url, **kwargs)
+        return self._send(url, stream, **kwargs)
+
+    def _cached_get(self, url: str, **kwargs) -> requests.Response:
+        entry = self.cache.lookup(url)
+        if entry is not None and self.cache.offline:
+            r = self.cache.response(url)
+            if r is not None:
+                return r
+            entry = None
+        headers = kwargs.pop("headers", {})
+        conditional_headers = self.cache.conditional_headers(entry) if entry is not None else {}
+        # Conditional requests are sent with `requests`, whose responses the cache is built from
+        r = self._send(url, stream=False, http2=False, headers={**headers, **conditional_headers}, **kwargs)
+        if r.status_code == 304 and entry is not None:
+            cached = self.cache.response(url, revalidated=True)
+            if cached is not None:
+                return cached
+            # Evicted by another thread since the lookup: the whole body is needed
+            r = self._send(url, stream=False, http2=False, headers=headers, **kwargs)
+        if r.status_code == 200:
+            self.cache.store(url, r)
+        return r
+
+    def _send(self, url: str, stream: bool, http2: bool = True, **kwargs) -> Union[requests.Response, "httpx.Response"]:
+        host = urlparse(url).netloc
+        t1 = time.monotonic()
+        try:
+            if self.http2_client is not None and http2 and not stream:
+                timeout = kwargs.pop("timeout")
+                r = self.http2_client.get(url, timeout=httpx.Timeout(timeout[1], connect=timeout[0]), **kwargs)
+            else:
+                r = self.session.get(url, stream=stream, **kwargs)
+        except Exception:
+            self._record(host, time.monotonic() - t1, 0, error=True)
+            raise
+        # Streamed bodies are not read yet, their size is taken from the headers
+        n_bytes = int(r.headers.get("Content-Length", 0)) if stream else len(r.content)
+        self._record(host, time.monotonic() - t1, n_bytes, error=r.status_code >= 400)
+        return r
+
+    def _record(self, host: str, elapsed: float, n_bytes: int, error: bool) -> None:
+        with self._lock:
+            stats = self.host_stats.setdefault(host, HostStats())
+            stats.requests += 1
+            stats.errors += error
+            stats.bytes += n_bytes
+            stats.elapsed += elapsed
+
+    def log_stats(self) -> None:
+        with self._lock:
+            for host, stats in self.host_stats.items():
+                logger.info(
+                    f"{host}: {stats.requests:,d} requests ({stats.errors:,d} errors), "
+                    f"{stats.mean_latency * 1000:.0f}ms mean latency, {stats.throughput / 2**20:.2f} MB/s"
+                )
+        if self.cache is not None:
+            self.cache.log_stats()
+
+    def close(self) -> None:
+        if self.cache is not None:
+            self.cache.save()
+        self.session.close()
+        if self.http2_client is not None:
+            self.http2_client.close()
+
+
+_CLIENT: Optional[HttpClient] = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    """Returns the client shared by every scraper of the process"""
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = HttpClient(cache=HttpCache())
+        return _CLIENT
+
+
+def configure_http_client(**kwargs) -> HttpClient:
+    """Replaces the shared client by one built with `kwargs`, see `HttpClient`"""
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is not None:
+            _CLIENT.close()
+        _CLIENT = HttpClient(**kwargs)
+        return _CLIENT
+
+
+@atexit.register
+def _close_http_client() -> None:
+    # Saves the index of the cache of the shared client
+    if _CLIENT is not None:
+        _CLIENT.close()
@@ -0,0 +1,126 @@
+"""Integrity checks of the downloaded bulk tars.
+
+MD5 sums are cached in `checksum_cache.json` next to the files, keyed by path and
+validated against the file's size and modification time: a file that didn't change
+since it was last hashed (or downloaded, as the downloader hashes the stream) is
+never read again.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import coloredlogs
+from tqdm import tqdm
+
+CHECKSUM_FILE = "checksum_cache.json"
+READ_BUFFER_SIZE = 8 * 2**20
+
+log_fmt = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+logging.basicConfig(level=logging.INFO, format=log_fmt)
+logger = logging.getLogger(__name__)
+coloredlogs.install()
+
+
+def file_md5(path: Path, buffer_size: int = READ_BUFFER_SIZE) -> str:
+    """MD5 of a file, read by blocks of `buffer_size` bytes"""
+    hash_md5 = hashlib.md5()
+    with open(path, "rb", buffering=0) as f:
+        for chunk in iter(lambda: f.read(buffer_size), b""):
+            hash_md5.update(chunk)
+    return hash_md5.hexdigest()
+
+
+class ChecksumCache:
+    """MD5 sums keyed by (path, size, mtime), persisted as JSON.
+
+    Parameters
+    ----------
+    cache_file : Path
+        the JSON file holding the sums
+    """
+
+    def __init__(self, cache_file: Path):
+        self.cache_file = cache_file
+        self._lock = threading.Lock()
+        self.records: Dict[str, Dict] = {}
+        if cache_file.exists():
+            with open(cache_file, "r") as f:
+                self.records = json.load(f)
+
+    @staticmethod
+    def _signature(path: Path) -> Dict[str, int]:
+        stat = path.stat()
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def get(self, path: Path) -> Optional[str]:
+        """Returns the cached sum of `path`, or None if the file changed since it was hashed"""
+        with self._lock:
+            record = self.records.get(path.as_posix())
+        if record is None or not path.exists():
+            return None
+        signature = self._signature(path)
+        if record["size"] != signature["size"] or record["mtime_ns"] != signature["mtime_ns"]:
+            return None
+        return record["md5"]
+
+    def put(self, path: Path, md5sum: str) -> None:
+        record = {**self._signature(path), "md5": md5sum}
+        with self._lock:
+            self.records[path.as_posix()] = record
+
+    def save(self) -> None:
+        with self._lock:
+            tmp_file = self.cache_file.with_suffix(".tmp")
+            with open(tmp_file, "w") as f:
+                json.dump(self.records, f)
+            os.replace(tmp_file, self.cache_file)
+
+
+def verify_files(
+    expected: Dict[Path, str], cache: Optional[ChecksumCache] = None, workers: Optional[int] = None
+) -> List[Path]:
+    """Compares files to their expected MD5 sums.
+
+    Sums missing from the cache are computed in a pool of `workers` processes.
+
+    Parameters
+    ----------
+    expected : Dict[Path, str]
+        the expected MD5 of each file
+    cache : Optional[ChecksumCache], optional
+        cache of the sums already computed, by default None
+    workers : Optional[int], optional
+        number of processes, by default the number of CPUs
+
+    Returns
+    -------
+    List[Path]
+        the files that are missing or don't match their sum
+    """
+    sums = {}
+    to_hash = []
+    for path in expected:
+        md5sum = cache.get(path) if cache else None
+        if md5sum is not None:
+            sums[path] = md5sum
+        elif path.exists():
+            to_hash.append(path)
+    logger.info(f"{len(sums)} sums found in cache, {len(to_hash)} files to hash.")
+
+    if to_hash:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for path, md5sum in tqdm(
+                zip(to_hash, pool.map(file_md5, to_hash)), total=len(to_hash), desc="Verifying file integrity"
+            ):
+                sums[path] = md5sum
+                if cache:
+                    cache.put(path, md5sum)
+        if cache:
+            cache.save()
+
+    return [path for path, md5sum in expected.items() if sums.get(path) != md5sum]
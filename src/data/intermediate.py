@@ -1,20 +1,27 @@
 """Scripts to transfer data from file / db and vice-versa"""
-import json
 import logging
 import pdb
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Tuple
 
 import coloredlogs
 import pandas as pd
+from sqlalchemy import Boolean, Column, Integer, MetaData, String, Table, Text, func, insert, select, update
 from sqlalchemy.engine import Engine
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.schema import CreateTable
 from sqlalchemy.orm.exc import FlushError
 from sqlalchemy.orm.session import sessionmaker
 from tqdm import tqdm
 
 from . import Base
-from .db_models import Authors, Papers
+from .author_cache import AuthorCache, get_author_cache
+from .db_models import PaperAuthor, Papers
+from .metadata_store import count_metadata, iter_metadata, iter_metadata_parallel
+from .schema import upgrade_schema
+
+# Papers inserted per transaction by `metadata_to_sql_db`
+DEFAULT_BATCH_SIZE = 1000
 
 log_fmt = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 logging.basicConfig(level=logging.INFO, format=log_fmt)
@@ -22,122 +29,238 @@
 coloredlogs.install()
 
 
-def metadata_to_sql_db(json_folder: Path, sql_engine: Engine, options: str = "create"):
+def paper_row(year: int, paper_hash: str, metadata: Dict) -> Dict:
+    """The `papers` row of a metadata document"""
+    return {
+        "year": year,
+        "hash": paper_hash,
+        "title": metadata["title"],
+        "publication": metadata["book"],
+        "abstract": metadata["abstract"],
+        "full_text": metadata["full_text"],
+        "category": "deep learning",
+        "dataset": "neurips",
+    }
+
+
+def load_papers_batch(session: sessionmaker, batch: List[Tuple[int, str, Dict]], author_cache: AuthorCache) -> int:
+    """Inserts a batch of papers, their new authors and their links in a single transaction
+
+    Each table gets a single executemany. The ids of the new papers are read back
+    in one query, as every id above the largest one before the insert. That holds
+    because there is a single writer.
+
+    Parameters
+    ----------
+    session : sessionmaker
+        The SQLAlchemy session in which every operation is done. Committed at the end.
+    batch : List[Tuple[int, str, Dict]]
+        (year, hash, metadata) of the papers
+    author_cache : AuthorCache
+        cache of the author ids of the database
+
+    Returns
+    -------
+    int
+        the number of papers inserted
+    """
+    last_id = session.query(func.max(Papers.id)).scalar() or 0
+    session.execute(insert(Papers), [paper_row(year, paper_hash, metadata) for year, paper_hash, metadata in batch])
+    paper_ids = dict(session.query(Papers.hash, Papers.id).filter(Papers.id > last_id))
+
+    paper_authors = {}
+    institutions = {}
+    for _, paper_hash, metadata in batch:
+        authors = {
+            (author["given_name"], author["family_name"]): author["institution"]
+            for author in reversed(metadata["authors"])
+        }
+        paper_authors[paper_hash] = list(authors)
+        # The first paper of an author gives its institution
+        for key, institution in authors.items():
+            institutions.setdefault(key, institution)
+
+    author_ids = author_cache.resolve_many(session, institutions) if institutions else {}
+    links = [
+        {"paper_id": paper_ids[paper_hash], "author_id": author_ids[key]}
+        for paper_hash, keys in paper_authors.items()
+        for key in keys
+    ]
+    if links:
+        session.execute(insert(PaperAuthor), links)
+    session.commit()
+    return len(batch)
+
+
+def load_papers(session: sessionmaker, batch: List[Tuple[int, str, Dict]], author_cache: AuthorCache) -> int:
+    """Loads a batch with `load_papers_batch`. If it fails, its papers are loaded one by one, so
+    that only the faulty ones are lost. Returns the number of papers inserted."""
+    try:
+        return load_papers_batch(session, batch, author_cache)
+    except (IntegrityError, FlushError, KeyError) as e:
+        session.rollback()
+        author_cache.invalidate()
+        if len(batch) == 1:
+            logger.error(f"Caught integrity issues with {batch[0][1]}: {e}. Rerolling session...")
+            return 0
+        logger.warning(f"Batch of {len(batch)} papers rejected ({e}). Loading them one by one...")
+        return sum(load_papers(session, [paper], author_cache) for paper in batch)
+
+
+def papers_staging_table() -> Table:
+    """Temporary table holding the rows of a batch of `replace_papers_batch`, one per connection"""
+    return Table(
+        "papers_staging",
+        MetaData(),
+        Column("hash", String(36), primary_key=True),
+        Column("year", Integer),
+        Column("title", String(100)),
+        Column("publication", String(100)),
+        Column("abstract", Text),
+        Column("full_text", Text),
+        # Error records only update the year, category and dataset
+        Column("partial", Boolean, nullable=False),
+        prefixes=["TEMPORARY"],
+    )
+
+
+def replace_papers_batch(session: sessionmaker, batch: List[Tuple[int, str, Dict]]) -> int:
+    """Updates the papers of a batch, matched by hash, in a single transaction
+
+    The batch is inserted with one executemany in a temporary staging table, from which
+    the papers are updated with a single UPDATE statement, instead of a SELECT and an
+    UPDATE per paper. The new values are read from the staging table by its primary key,
+    which every backend supports (SQLAlchemy 1.4 can't write `UPDATE ... FROM` for SQLite).
+    Error records only update the year, category and dataset.
+
+    Parameters
+    ----------
+    session : sessionmaker
+        The SQLAlchemy session in which every operation is done. Committed at the end.
+    batch : List[Tuple[int, str, Dict]]
+        (year, hash, metadata) of the papers
+
+    Returns
+    -------
+    int
+        the number of rows of `papers` updated
+    """
+    connection = session.connection()
+    staging = papers_staging_table()
+    connection.execute(CreateTable(staging, if_not_exists=True))
+    connection.execute(staging.delete())
+    rows = {}
+    for year, paper_hash, metadata in batch:
+        if "error" in metadata:
+            rows[paper_hash] = {"hash": paper_hash, "year": year, "partial": True}
+        else:
+            rows[paper_hash] = {**paper_row(year, paper_hash, metadata), "partial": False}
+    connection.execute(
+        insert(staging),
+        [{column.name: row.get(column.name) for column in staging.columns} for row in rows.values()],
+    )
+
+    n_updated = 0
+    for partial, columns in [(False, ["year", "title", "publication", "abstract", "full_text"]), (True, ["year"])]:
+        result = connection.execute(
+            update(Papers)
+            .where(Papers.hash.in_(select(staging.c.hash).where(staging.c.partial == partial)))
+            .values(
+                {
+                    **{
+                        column: select(staging.c[column]).where(staging.c.hash == Papers.hash).scalar_subquery()
+                        for column in columns
+                    },
+                    "category": "deep learning",
+                    "dataset": "neurips",
+                }
+            )
+        )
+        n_updated += result.rowcount
+    session.commit()
+    return n_updated
+
+
+def replace_papers(session: sessionmaker, batch: List[Tuple[int, str, Dict]], author_cache: AuthorCache) -> int:
+    """Replaces a batch with `replace_papers_batch`, rolling it back if it fails. Returns the number of
+    papers updated. The authors are left as they are."""
+    try:
+        return replace_papers_batch(session, batch)
+    except (SQLAlchemyError, KeyError) as e:
+        logger.error(f"Batch of {len(batch)} papers not replaced: {e}. Rerolling session...")
+        session.rollback()
+        return 0
+
+
+def metadata_to_sql_db(
+    json_folder: Path,
+    sql_engine: Engine,
+    options: str = "create",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    workers: int = 0,
+):
     """[summary]
 
     Possible keys are 'title', 'book', 'page_first', 'page_last',
     'abstract', 'full_text', 'award', 'sourceid', 'authors'
 
+    The papers are written by transactions of `batch_size` papers: inserted with `load_papers_batch` in
+    "create" mode, updated with `replace_papers_batch` in "replace" mode.
+    With `workers`, the files are decoded by a pool of processes while this one only writes to the database.
+
     Parameters
     ----------
     json_folder : Path
-        [description]
+        folder of `<year>_<hash>.json` files, or root of a metadata store
     sql_engine : Engine
         [description]
+    options : str, optional
+        "create" to recreate the tables and fill them, "replace" to update the papers in place, by default "create"
+    batch_size : int, optional
+        number of papers per transaction, by default DEFAULT_BATCH_SIZE
+    workers : int, optional
+        number of processes decoding the files, by default 0 (decoded by the writer)
     """
 
     logger.info(f"Using engine from {sql_engine.url}...")
     if options == "create":
         Base.metadata.drop_all(sql_engine)
-        Base.metadata.create_all(sql_engine)
+        upgrade_schema(sql_engine)
         logger.info("Destroyed and created tables.")
+    else:
+        upgrade_schema(sql_engine)
 
     Session = sessionmaker(sql_engine)
     session = Session()
+    author_cache = get_author_cache(sql_engine)
+    if options == "create":
+        author_cache.invalidate()
 
-    total_data = len(list(json_folder.iterdir()))
-    for json_meta in tqdm(json_folder.iterdir(), desc="Transferring to db", total=total_data):
-        year, paper_hash = json_meta.stem.split("_")
-        year = int(year)
-
-        with open(json_meta, "rb") as json_f:
-            metadata = json.load(json_f)
-
+    total_data = count_metadata(json_folder)
+    save_batch = load_papers if options == "create" else replace_papers
+    n_saved = 0
+    batch = []
+    documents = iter_metadata_parallel(json_folder, workers) if workers > 0 else iter_metadata(json_folder)
+    for year, paper_hash, metadata in tqdm(documents, desc="Transferring to db", total=total_data):
         if "error" in metadata.keys():
             logger.warning("Invalid file detected. Skipping.")
-            if options == "replace":
-                session.query(Papers).filter(Papers.hash == paper_hash).update(
-                    {"year": year, "category": "deep learning", "dataset": "neurips"}, synchronize_session="fetch"
-                )
-            else:
-                paper = Papers(year=year, hash=paper_hash, category="deep learning", dataset="neurips")
-                # session.add(paper)
-            continue
-
-        if options == "replace":
-            session.query(Papers).filter(Papers.hash == paper_hash).update(
-                {
-                    "year": year,
-                    "hash": paper_hash,
-                    "title": metadata["title"],
-                    "publication": metadata["book"],
-                    "abstract": metadata["abstract"],
-                    "full_text": metadata["full_text"],
-                    "category": "deep learning",
-                    "dataset": "neurips",
-                },
-                synchronize_session="fetch",
-            )
-        else:
-            # Create paper
-            paper = Papers(
-                year=year,
-                hash=paper_hash,
-                title=metadata["title"],
-                publication=metadata["book"],
-                abstract=metadata["abstract"],
-                full_text=metadata["full_text"],
-                category="deep learning",
-                dataset="neurips",
-            )
+            if options == "create":
+                continue
 
-            for author in metadata["authors"]:
-                given_name = author["given_name"]
-                last_name = author["family_name"]
-                institution = author["institution"]
-                try:
-                    ent_author = (
-                        session.query(Authors)
-                        .filter(Authors.firstname == given_name, Authors.lastname == last_name)
-                        .first()
-                    )
-                    if not ent_author:
-                        ent_author = Authors(
-                            firstname=given_name,
-                            lastname=last_name,
-                            institution=institution,
-                        )
-                        ent_author.papers.append(paper)
-                        session.add(ent_author)
-                        session.commit()
-
-                    paper.authors.append(ent_author)
-
-                except IntegrityError:
-                    logger.error(f"Caught integrity issues with {ent_author}. Rerolling session...")
-                    session.rollback()
-                except FlushError:
-                    logger.error(f"Flush error with {ent_author}. Rerolling...")
-                    session.rollback()
-
-                # pdb.set_trace()
-
-            # pdb.set_trace()
-            session.add(paper)
-
-            try:
-                session.commit()
-            except FlushError:
-                session.rollback()
-            # session.flush()
-
-            # assoc = PaperAuthor(paper=paper, author=author)
+        batch.append((year, paper_hash, metadata))
+        if len(batch) >= batch_size:
+            n_saved += save_batch(session, batch, author_cache)
+            batch = []
+    if batch:
+        n_saved += save_batch(session, batch, author_cache)
 
     # Commit session at the end of your operations
     try:
         session.commit()
     except FlushError:
         session.rollback()
+    logger.info(f"{n_saved:,d} papers {'inserted' if options == 'create' else 'replaced'} out of {total_data:,d}.")
+    author_cache.log_stats()
     logger.info("Done!")
     session.close()
 
@@ -0,0 +1,142 @@
+"""Reader of `arXiv_src_manifest.xml`, the index of arXiv's bulk source tars.
+
+The manifest is read in a single streaming pass and its records are saved to a
+compact JSON index next to it (`arXiv_src_manifest.index.json`). The index is reused
+as long as the manifest's size and modification time don't change.
+"""
+import datetime as dt
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple, Union
+
+import coloredlogs
+from lxml import etree
+from pydantic import BaseModel, NoneStr
+
+INDEX_SUFFIX = ".index.json"
+
+log_fmt = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+logging.basicConfig(level=logging.INFO, format=log_fmt)
+logger = logging.getLogger(__name__)
+coloredlogs.install()
+
+
+def yymm_key(yymm: str) -> int:
+    """Sortable value of a `yymm` string (arXiv starts in 1991, so `9108` < `0001`)"""
+    yy, mm = int(yymm[:2]), int(yymm[2:4])
+    return (1900 + yy if yy >= 91 else 2000 + yy) * 100 + mm
+
+
+class ManifestFile(BaseModel):
+    filename: str
+    size: int
+    md5sum: NoneStr
+    content_md5sum: NoneStr
+    first_item: NoneStr
+    last_item: NoneStr
+    num_items: Optional[int]
+    seq_num: Optional[int]
+    timestamp: Optional[dt.datetime]
+    yymm: NoneStr
+
+
+class Manifest(BaseModel):
+    timestamp: NoneStr
+    files: List[ManifestFile] = []
+
+    @property
+    def total_size(self) -> int:
+        return sum(file.size for file in self.files)
+
+    def filter(self, since: Optional[str] = None, until: Optional[str] = None) -> "Manifest":
+        """Keeps the files whose `yymm` is between `since` and `until` (both included)"""
+        low = yymm_key(since) if since else 0
+        high = yymm_key(until) if until else float("inf")
+        return Manifest(
+            timestamp=self.timestamp,
+            files=[file for file in self.files if file.yymm and low <= yymm_key(file.yymm) <= high],
+        )
+
+
+_FIELDS = list(ManifestFile.__fields__)
+
+
+def iter_manifest(manifest_xml: Path) -> Iterator[Union[ManifestFile, str]]:
+    """Streams the manifest with `lxml.etree.iterparse`.
+
+    Yields a `ManifestFile` for each `<file>` element and, once reached, the
+    manifest's own timestamp as a string.
+    """
+    context = etree.iterparse(str(manifest_xml), events=("end",), tag=["file", "timestamp"])
+    for _, elem in context:
+        parent = elem.getparent()
+        if elem.tag == "timestamp":
+            if parent is not None and parent.tag != "file":
+                yield elem.text
+            continue
+
+        yield ManifestFile(**{child.tag: child.text for child in elem if child.tag in _FIELDS})
+        elem.clear()
+        while elem.getprevious() is not None:
+            del parent[0]
+    del context
+
+
+def _signature(manifest_xml: Path) -> Tuple[int, int]:
+    stat = manifest_xml.stat()
+    return stat.st_size, stat.st_mtime_ns
+
+
+def index_path(manifest_xml: Path) -> Path:
+    return manifest_xml.with_name(manifest_xml.stem + INDEX_SUFFIX)
+
+
+def load_manifest(manifest_xml: Path, use_index: bool = True) -> Manifest:
+    """Reads the manifest, from its index if it is up to date.
+
+    Parameters
+    ----------
+    manifest_xml : Path
+        Path of the XML manifest
+    use_index : bool, optional
+        whether to read and write the on-disk index, by default True
+
+    Returns
+    -------
+    Manifest
+        the manifest's timestamp and files
+    """
+    index_file = index_path(manifest_xml)
+    size, mtime_ns = _signature(manifest_xml)
+    if use_index and index_file.exists():
+        with open(index_file, "r") as f:
+            index = json.load(f)
+        if index["source_size"] == size and index["source_mtime_ns"] == mtime_ns and index["fields"] == _FIELDS:
+            logger.info(f"Reading manifest from {index_file}")
+            return Manifest(
+                timestamp=index["timestamp"], files=[ManifestFile(**dict(zip(_FIELDS, row))) for row in index["rows"]]
+            )
+
+    logger.info(f"Parsing {manifest_xml}")
+    manifest = Manifest()
+    for record in iter_manifest(manifest_xml):
+        if isinstance(record, ManifestFile):
+            manifest.files.append(record)
+        else:
+            manifest.timestamp = record
+
+    if use_index:
+        index = {
+            "source_size": size,
+            "source_mtime_ns": mtime_ns,
+            "timestamp": manifest.timestamp,
+            "fields": _FIELDS,
+            "rows": [[getattr(file, field) for field in _FIELDS] for file in manifest.files],
+        }
+        tmp_file = index_file.with_suffix(".tmp")
+        with open(tmp_file, "w") as f:
+            json.dump(index, f, separators=(",", ":"), default=str)
+        os.replace(tmp_file, index_file)
+    return manifest
@@ -0,0 +1,189 @@
+"""Destinations of the NeurIPS metadata documents: a metadata store, a folder of JSON files or a Mongo collection.
+
+The sinks are written to by a single thread. Documents are keyed by the hash of
+their paper. `missing` finds the papers that weren't fetched yet with a single
+directory scan or a single `_id` query, instead of one lookup per paper.
+"""
+
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+import bson
+import coloredlogs
+import pymongo
+from pydantic import BaseModel
+
+from .metadata_store import MetadataStore
+
+MONGO_BATCH_SIZE = 500
+# Well under the 48MB limit of a single message
+MONGO_BATCH_BYTES = 16 * 2**20
+DUPLICATE_KEY_ERROR = 11000
+
+log_fmt = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+logging.basicConfig(level=logging.INFO, format=log_fmt)
+logger = logging.getLogger(__name__)
+coloredlogs.install()
+
+
+class MongoWriteStats(BaseModel):
+    batches: int = 0
+    inserted: int = 0
+    duplicates: int = 0
+    errors: int = 0
+    bytes: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def docs_per_sec(self) -> float:
+        return self.inserted / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def bytes_per_sec(self) -> float:
+        return self.bytes / self.elapsed if self.elapsed else 0.0
+
+
+class MetadataSink:
+    """Interface of the sinks accepted by `fetch_neurips_metadata`"""
+
+    def exists(self, year: int, hash: str) -> bool:
+        raise NotImplementedError
+
+    def missing(self, pairs: List[Tuple[int, str]]) -> List[Tuple[int, str]]:
+        """The (year, hash) pairs that aren't in the sink yet, in the same order"""
+        return [(year, hash) for year, hash in pairs if not self.exists(year, hash)]
+
+    def write(self, year: int, hash: str, metadata: Dict) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class JsonFolderSink(MetadataSink):
+    """Saves each document as `<year>_<hash>.json` in `json_dir`"""
+
+    def __init__(self, json_dir: Path):
+        self.json_dir = json_dir
+        self.json_dir.mkdir(parents=True, exist_ok=True)
+
+    def path(self, year: int, hash: str) -> Path:
+        return self.json_dir / f"{year}_{hash}.json"
+
+    def exists(self, year: int, hash: str) -> bool:
+        return self.path(year, hash).exists()
+
+    def missing(self, pairs: List[Tuple[int, str]]) -> List[Tuple[int, str]]:
+        with os.scandir(self.json_dir) as entries:
+            names = {entry.name for entry in entries}
+        return [(year, hash) for year, hash in pairs if self.path(year, hash).name not in names]
+
+    def write(self, year: int, hash: str, metadata: Dict) -> None:
+        with open(self.path(year, hash), "w") as json_f:
+            json.dump(metadata, json_f, indent=2)
+        logger.info(f"{self.path(year, hash)} written!")
+
+
+class StoreSink(MetadataSink):
+    """Appends each document to a `MetadataStore`"""
+
+    def __init__(self, store: MetadataStore):
+        self.store = store
+
+    def exists(self, year: int, hash: str) -> bool:
+        return hash in self.store
+
+    def missing(self, pairs: List[Tuple[int, str]]) -> List[Tuple[int, str]]:
+        return [(year, hash) for year, hash in pairs if hash not in self.store]
+
+    def write(self, year: int, hash: str, metadata: Dict) -> None:
+        self.store.append(year, hash, metadata)
+        logger.info(f"Entry {hash} stored!")
+
+    def close(self) -> None:
+        self.store.close()
+
+
+class MongoSink(MetadataSink):
+    """Inserts the documents in `collection`, with the hash of the paper as `_id`.
+
+    Documents are buffered and sent with unordered `insert_many` calls, each time
+    `batch_size` documents or `max_batch_bytes` bytes of BSON are pending. With an
+    unordered insert, a duplicate key only rejects its own document.
+
+    Parameters
+    ----------
+    collection : pymongo.collection.Collection
+        the collection to fill
+    batch_size : int, optional
+        maximum number of documents per insert, by default MONGO_BATCH_SIZE
+    max_batch_bytes : int, optional
+        maximum BSON size of the documents of an insert, by default MONGO_BATCH_BYTES
+    """
+
+    def __init__(
+        self,
+        collection: pymongo.collection.Collection,
+        batch_size: int = MONGO_BATCH_SIZE,
+        max_batch_bytes: int = MONGO_BATCH_BYTES,
+    ):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.max_batch_bytes = max_batch_bytes
+        self._buffer: List[Dict] = []
+        self._buffer_bytes = 0
+        self.stats = MongoWriteStats()
+
+    def exists(self, year: int, hash: str) -> bool:
+        return self.collection.find_one({"_id": hash}) is not None
+
+    def fetched_hashes(self) -> Set[str]:
+        return {doc["_id"] for doc in self.collection.find({}, projection={"_id": True})}
+
+    def missing(self, pairs: List[Tuple[int, str]]) -> List[Tuple[int, str]]:
+        fetched = self.fetched_hashes()
+        return [(year, hash) for year, hash in pairs if hash not in fetched]
+
+    def write(self, year: int, hash: str, metadata: Dict) -> None:
+        metadata["_id"] = hash
+        self._buffer.append(metadata)
+        self._buffer_bytes += len(bson.encode(metadata))
+        if len(self._buffer) >= self.batch_size or self._buffer_bytes >= self.max_batch_bytes:
+            self.flush()
+
+    def flush(self) -> None:
+        """Inserts the pending documents"""
+        if not self._buffer:
+            return
+        batch, n_bytes = self._buffer, self._buffer_bytes
+        self._buffer, self._buffer_bytes = [], 0
+
+        t1 = time.monotonic()
+        try:
+            n_inserted = len(self.collection.insert_many(batch, ordered=False).inserted_ids)
+        except pymongo.errors.BulkWriteError as e:
+            n_inserted = e.details["nInserted"]
+            for error in e.details["writeErrors"]:
+                if error["code"] == DUPLICATE_KEY_ERROR:
+                    self.stats.duplicates += 1
+                    logger.error(f"Entry {error['op']['_id']} already exists!")
+                else:
+                    self.stats.errors += 1
+                    logger.error(f"Entry {error['op']['_id']} not inserted: {error['errmsg']}")
+        self.stats.elapsed += time.monotonic() - t1
+        self.stats.batches += 1
+        self.stats.inserted += n_inserted
+        self.stats.bytes += n_bytes
+        logger.info(f"{n_inserted} entries inserted out of {len(batch)}.")
+
+    def close(self) -> None:
+        self.flush()
+        logger.info(
+            f"{self.stats.inserted:,d} entries inserted in {self.stats.batches:,d} batches "
+            f"({self.stats.duplicates:,d} duplicates, {self.stats.errors:,d} errors): "
+            f"{self.stats.docs_per_sec:.0f} docs/s, {self.stats.bytes_per_sec / 2**20:.2f} MB/s"
+        )
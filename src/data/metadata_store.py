@@ -0,0 +1,324 @@
+"""Append-only, compressed store of the NeurIPS metadata documents.
+
+Documents are appended to gzip shards (`shard-00000.jsonl.gz`, ...), each one as
+its own gzip member holding a single JSON line. A shard is thus a valid `.jsonl.gz`
+file, and any document can be decompressed on its own. `index.tsv` maps the hash of
+every paper to its year, shard, offset and length, and is appended to after each
+document. It is loaded in memory when the store is opened.
+
+The shard is flushed before the index line of each document, so that after a crash
+the shards hold at least every indexed document, and at most an unindexed tail that
+is dropped on the next append. Should a shard still be shorter than its index claims,
+e.g. after a power loss, the index lines past its end are dropped when it is opened.
+
+A shard is closed once it exceeds `max_shard_bytes` and the next document starts a
+new one. Appending a hash that is already stored supersedes the previous document.
+"""
+
+import gzip
+import json
+import logging
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+import coloredlogs
+from tqdm import tqdm
+
+try:
+    import orjson
+
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+INDEX_FILE = "index.tsv"
+SHARD_FMT = "shard-{:05d}.jsonl.gz"
+DEFAULT_SHARD_BYTES = 256 * 2**20
+COMPRESS_LEVEL = 6
+# Documents decoded per task, and tasks in flight, of `iter_metadata_parallel`
+DECODE_CHUNK_SIZE = 32
+DECODE_QUEUE_SIZE = 64
+# Keys of the documents read by the SQL loaders
+METADATA_KEYS = ("title", "book", "abstract", "full_text", "authors")
+
+log_fmt = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+logging.basicConfig(level=logging.INFO, format=log_fmt)
+logger = logging.getLogger(__name__)
+coloredlogs.install()
+
+
+class IndexEntry(NamedTuple):
+    year: int
+    shard: int
+    offset: int
+    length: int
+
+
+class MetadataStore:
+    """Sharded JSONL store of documents keyed by hash.
+
+    Parameters
+    ----------
+    root : Path
+        folder of the shards and of the index, created if needed
+    max_shard_bytes : int, optional
+        size after which a new shard is started, by default DEFAULT_SHARD_BYTES
+    """
+
+    def __init__(self, root: Path, max_shard_bytes: int = DEFAULT_SHARD_BYTES):
+        self.root = root
+        self.max_shard_bytes = max_shard_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.index: Dict[str, IndexEntry] = {}
+        self._lost_entries = 0
+        index_file = self.root / INDEX_FILE
+        if index_file.exists():
+            shard_sizes: Dict[int, int] = {}
+            with open(index_file, "r") as f:
+                for line in f:
+                    hash, *fields = line.rstrip("\n").split("\t")
+                    if len(fields) != 4:
+                        continue
+                    entry = IndexEntry(*map(int, fields))
+                    if entry.shard not in shard_sizes:
+                        shard_path = self.shard_path(entry.shard)
+                        shard_sizes[entry.shard] = shard_path.stat().st_size if shard_path.exists() else 0
+                    if entry.offset + entry.length > shard_sizes[entry.shard]:
+                        # The document never reached the shard: keep the previous one of the hash, if any
+                        self._lost_entries += 1
+                        continue
+                    self.index[hash] = entry
+            if self._lost_entries:
+                logger.warning(f"{self._lost_entries} indexed documents are missing from the shards of {self.root}")
+
+        self._shard = max((entry.shard for entry in self.index.values()), default=0)
+        self._shard_file = None
+        self._index_file = None
+
+    @staticmethod
+    def is_store(path: Path) -> bool:
+        return (path / INDEX_FILE).exists()
+
+    def shard_path(self, shard: int) -> Path:
+        return self.root / SHARD_FMT.format(shard)
+
+    def __contains__(self, hash: str) -> bool:
+        return hash in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def append(self, year: int, hash: str, doc: Dict) -> None:
+        """Appends a document. Nothing is guaranteed to be on disk before `flush` or `close`."""
+        if self._shard_file is None:
+            self._open_for_append()
+        if self._shard_file.tell() >= self.max_shard_bytes:
+            self._shard_file.close()
+            self._shard += 1
+            self._shard_file = open(self.shard_path(self._shard), "ab")
+
+        data = gzip.compress(json.dumps(doc, separators=(",", ":")).encode() + b"\n", compresslevel=COMPRESS_LEVEL)
+        offset = self._shard_file.tell()
+        self._shard_file.write(data)
+        # The index line must never reach the disk before the document
+        self._shard_file.flush()
+        entry = IndexEntry(year, self._shard, offset, len(data))
+        self._index_file.write(f"{hash}\t" + "\t".join(map(str, entry)) + "\n")
+        self.index[hash] = entry
+
+    def _open_for_append(self) -> None:
+        self._shard_file = open(self.shard_path(self._shard), "ab")
+        # Documents are written before their index line: drop a document that lost its line in a crash
+        indexed_end = max(
+            (entry.offset + entry.length for entry in self.index.values() if entry.shard == self._shard), default=0
+        )
+        if self._shard_file.tell() > indexed_end:
+            self._shard_file.truncate(indexed_end)
+            self._shard_file.seek(indexed_end)
+        index_file = self.root / INDEX_FILE
+        if self._lost_entries:
+            # The lines of the lost documents would point into the documents appended from now on
+            self._rewrite_index()
+        # Start on a new line if the last one was cut
+        cut_line = False
+        if index_file.exists() and index_file.stat().st_size:
+            with open(index_file, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                cut_line = f.read(1) != b"\n"
+        self._index_file = open(index_file, "a")
+        if cut_line:
+            self._index_file.write("\n")
+
+    def _rewrite_index(self) -> None:
+        tmp_file = self.root / f"{INDEX_FILE}.tmp"
+        with open(tmp_file, "w") as f:
+            for hash, entry in sorted(self.index.items(), key=lambda item: (item[1].shard, item[1].offset)):
+                f.write(f"{hash}\t" + "\t".join(map(str, entry)) + "\n")
+        os.replace(tmp_file, self.root / INDEX_FILE)
+        self._lost_entries = 0
+
+    def get(self, hash: str) -> Optional[Dict]:
+        """Reads a single document, or returns None if the hash isn't stored"""
+        entry = self.index.get(hash)
+        if entry is None:
+            return None
+        self.flush()
+        with open(self.shard_path(entry.shard), "rb") as f:
+            f.seek(entry.offset)
+            return json.loads(gzip.decompress(f.read(entry.length)))
+
+    def scan(self) -> Iterator[Tuple[int, str, Dict]]:
+        """Yields every (year, hash, document), reading each shard from start to end"""
+        self.flush()
+        entries = sorted(self.index.items(), key=lambda item: (item[1].shard, item[1].offset))
+        f, shard = None, None
+        try:
+            for hash, entry in entries:
+                if entry.shard != shard:
+                    if f is not None:
+                        f.close()
+                    f, shard = open(self.shard_path(entry.shard), "rb"), entry.shard
+                f.seek(entry.offset)
+                yield entry.year, hash, json.loads(gzip.decompress(f.read(entry.length)))
+        finally:
+            if f is not None:
+                f.close()
+
+    def flush(self) -> None:
+        if self._shard_file is not None:
+            self._shard_file.flush()
+            self._index_file.flush()
+
+    def close(self) -> None:
+        if self._shard_file is not None:
+            self._shard_file.close()
+            self._index_file.close()
+            self._shard_file = self._index_file = None
+
+
+def iter_json_folder(json_folder: Path) -> Iterator[Tuple[int, str, Dict]]:
+    """Yields the (year, hash, document) of every `<year>_<hash>.json` file of a folder"""
+    for json_meta in json_folder.iterdir():
+        if json_meta.suffix != ".json":
+            continue
+        year, paper_hash = json_meta.stem.split("_")
+        with open(json_meta, "rb") as json_f:
+            yield int(year), paper_hash, json.load(json_f)
+
+
+def iter_metadata(source: Path) -> Iterator[Tuple[int, str, Dict]]:
+    """Yields the (year, hash, document) of a metadata store or of a folder of JSON files"""
+    if MetadataStore.is_store(source):
+        yield from MetadataStore(source).scan()
+    else:
+        yield from iter_json_folder(source)
+
+
+def count_metadata(source: Path) -> int:
+    if MetadataStore.is_store(source):
+        return len(MetadataStore(source))
+    return sum(1 for path in source.iterdir() if path.suffix == ".json")
+
+
+# A JSON file, or the (shard, offset, length) of a document of a store
+MetadataRef = Union[str, Tuple[str, int, int]]
+
+
+def metadata_refs(source: Path) -> Iterator[Tuple[int, str, MetadataRef]]:
+    """Yields the (year, hash, reference) of every document of a metadata store or of a folder of JSON files,
+    in the order of `iter_metadata`"""
+    if MetadataStore.is_store(source):
+        store = MetadataStore(source)
+        for hash, entry in sorted(store.index.items(), key=lambda item: (item[1].shard, item[1].offset)):
+            yield entry.year, hash, (store.shard_path(entry.shard).as_posix(), entry.offset, entry.length)
+    else:
+        for json_meta in source.iterdir():
+            if json_meta.suffix == ".json":
+                year, paper_hash = json_meta.stem.split("_")
+                yield int(year), paper_hash, json_meta.as_posix()
+
+
+def read_metadata(ref: MetadataRef) -> Dict:
+    if isinstance(ref, str):
+        with open(ref, "rb") as json_f:
+            return json_loads(json_f.read())
+    path, offset, length = ref
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return json_loads(gzip.decompress(f.read(length)))
+
+
+def normalize_metadata(doc: Dict) -> Dict:
+    """Keeps the keys the SQL loaders read, so that less is sent back from the worker processes"""
+    if "error" in doc:
+        return {"error": doc["error"]}
+    return {key: doc[key] for key in METADATA_KEYS if key in doc}
+
+
+def decode_metadata_chunk(refs: List[Tuple[int, str, MetadataRef]]) -> List[Tuple[int, str, Dict]]:
+    """Reads, decodes and normalizes a chunk of documents. Run in the worker processes."""
+    return [(year, hash, normalize_metadata(read_metadata(ref))) for year, hash, ref in refs]
+
+
+def iter_metadata_parallel(
+    source: Path, workers: int, chunk_size: int = DECODE_CHUNK_SIZE, queue_size: int = DECODE_QUEUE_SIZE
+) -> Iterator[Tuple[int, str, Dict]]:
+    """Same as `iter_metadata`, with the documents decoded by a pool of processes
+
+    The documents are normalized (see `normalize_metadata`) and yielded in the same
+    order as `iter_metadata`. At most `queue_size` chunks are decoded ahead of the consumer.
+
+    Parameters
+    ----------
+    source : Path
+        root of a metadata store, or folder of JSON files
+    workers : int
+        number of processes decoding the documents
+    chunk_size : int, optional
+        number of documents decoded per task, by default DECODE_CHUNK_SIZE
+    queue_size : int, optional
+        maximum number of chunks in flight, by default DECODE_QUEUE_SIZE
+    """
+    refs = metadata_refs(source)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        while True:
+            chunk = [ref for _, ref in zip(range(chunk_size), refs)]
+            if not chunk:
+                break
+            if len(pending) >= queue_size:
+                yield from pending.popleft().result()
+            pending.append(pool.submit(decode_metadata_chunk, chunk))
+        while pending:
+            yield from pending.popleft().result()
+
+
+def migrate_json_folder(json_folder: Path, store_dir: Path) -> int:
+    """Copies the documents of a folder of JSON files that aren't in the store yet
+
+    Parameters
+    ----------
+    json_folder : Path
+        folder of `<year>_<hash>.json` files
+    store_dir : Path
+        root of the store
+
+    Returns
+    -------
+    int
+        number of documents added
+    """
+    store = MetadataStore(store_dir)
+    n_added = 0
+    try:
+        for year, hash, doc in tqdm(iter_json_folder(json_folder), desc="Migrating", total=count_metadata(json_folder)):
+            if hash not in store:
+                store.append(year, hash, doc)
+                n_added += 1
+    finally:
+        store.close()
+    logger.info(f"{n_added} documents added to {store_dir} ({len(store)} in total).")
+    return n_added
@@ -6,11 +6,11 @@
 
 import coloredlogs
 import pandas as pd
-import requests
-from bs4 import BeautifulSoup
 from pydantic import BaseModel, NoneStr
 
 from .dbutils import MongoConnector
+from .html_extract import DEFAULT_HTML_PARSER, papers_table_cells
+from .http_client import get_http_client
 
 ML4PHYSICS_URL = "https://ml4physicalsciences.github.io/"
 CORE_API_URL = "https://core.ac.uk:443/api-v2/"
@@ -27,10 +27,17 @@ class DataMl4Physics(BaseModel):
     year: List[Optional[int]] = []
 
 
-def extract_ml4physics(save_file: Optional[Path] = None) -> pd.DataFrame:
+def extract_ml4physics(save_file: Optional[Path] = None, parser: str = DEFAULT_HTML_PARSER) -> pd.DataFrame:
     """Takes the information on the official website of `https://ml4physicalsciences.github.io/` and
     produces a dataframe with the title and the authors as columns
 
+    Parameters
+    ----------
+    save_file : Optional[Path], optional
+        CSV file the dataframe is saved to, by default None
+    parser : str, optional
+        HTML parser, one of `HTML_PARSERS`, by default DEFAULT_HTML_PARSER
+
     Returns
     -------
     pd.DataFrame
@@ -39,13 +46,11 @@ def extract_ml4physics(save_file: Optional[Path] = None) -> pd.DataFrame:
     data = DataMl4Physics()
     for y in range(2017, 2021):
         url = f"{ML4PHYSICS_URL}{y}"
-        r = requests.get(url)
+        r = get_http_client().get(url, cached=True)
         if r.status_code == 200:
-            soup = BeautifulSoup(r.content, "html.parser")
-            html_table = soup.select_one("section#papers").select_one("div.table-wrapper")
-            for el in html_table.select("td"):
-                if not el.text.isdigit():
-                    title, *_, authors = re.split(r"\[(pdf|poster|video)\]", el.text.strip())
+            for text in papers_table_cells(r.content, parser=parser):
+                if not text.isdigit():
+                    title, *_, authors = re.split(r"\[(pdf|poster|video)\]", text.strip())
                     data.title.append(title.strip())
                     data.authors.append(authors.strip())
                     data.year.append(y)
@@ -122,7 +127,7 @@ def download_ml4physics_pdf(year: int, idx: int, dest_folder: Path, chunk_size:
         else:
             url = f"{ML4PHYSICS_URL}{year}/files/NeurIPS_ML4PS_{year}_{idx}.pdf"
 
-        r = requests.get(url)
+        r = get_http_client().get(url, stream=True)
         if r.status_code == 200:
             with open(dest_file, "wb") as f:
                 for chunk in r.iter_content(chunk_size):
@@ -1,26 +1,37 @@
-import json
+import asyncio
+import datetime as dt
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import coloredlogs
 import pandas as pd
-import pymongo
-import requests
-from bs4 import BeautifulSoup
 from bs4.element import Tag
 from pydantic import BaseModel, NoneStr
+from sqlalchemy import insert
 from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import sessionmaker
 from tqdm import tqdm
 
-from . import Base
-from .db_models import Authors, Papers
+from .author_cache import AuthorCache, get_author_cache
+from .db_models import Authors, PaperAuthor, Papers
 from .dbutils import MongoConnector, NeuripsAPIConnector
+from .file_download import DEFAULT_CHUNK_SIZE, DEFAULT_WORKERS, FileDownloader
+from .html_extract import DEFAULT_HTML_PARSER, column_links, heading_sections
+from .http_client import REQUEST_ERRORS, get_http_client
+from .metadata_sinks import MetadataSink, MongoSink, StoreSink
+from .metadata_store import MetadataStore
+from .schema import upgrade_schema
 
 NEURIPS_URL = "https://papers.nips.cc/"
 ROOT_DIR = Path(__file__).resolve().parents[2]
-CURRENT_YEAR = 2021
+FIRST_YEAR = 1987
+CURRENT_YEAR = dt.date.today().year
+METADATA_STORE_DIR = ROOT_DIR / "data" / "raw" / "neurips_metadata_store"
+# Papers committed at once by `save_neurips_info_sql`
+SQL_BATCH_SIZE = 500
 
 
 log_fmt = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -73,45 +84,143 @@ def extract_text(el: Optional[Tag]) -> str:
     return ""
 
 
-def author_entry(authors: str) -> Authors:
+def author_name(authors: str) -> Tuple[str, str]:
     authors = authors.strip()
-    firstname, lastname = " ".join(authors.split()[:-1]), authors.split()[-1]
+    return " ".join(authors.split()[:-1]), authors.split()[-1]
+
+
+def author_entry(authors: str) -> Authors:
+    firstname, lastname = author_name(authors)
     return Authors(firstname=firstname, lastname=lastname)
 
 
-def get_neurips_hashs(save_file: Optional[Path] = None) -> pd.DataFrame:
+def abstract_url(year: int, hash: str) -> str:
+    return f"{NEURIPS_URL}paper/{year}/hash/{hash}-Abstract.html"
+
+
+def bibtex_url(year: int, hash: str) -> str:
+    return f"{NEURIPS_URL}paper/{year}/file/{hash}-Bibtex.bib"
+
+
+def pdf_url(year: int, hash: str) -> str:
+    return f"{NEURIPS_URL}paper/{year}/file/{hash}-Paper.pdf"
+
+
+def parse_abstract_page(page: bytes, parser: str = DEFAULT_HTML_PARSER) -> NeuripsInfoPaper:
+    """Extracts the title, the authors and the abstract of a paper from its abstract page
+
+    Parameters
+    ----------
+    page : bytes
+        the abstract page
+    parser : str, optional
+        HTML parser, one of `HTML_PARSERS`, by default DEFAULT_HTML_PARSER
+
+    Returns
+    -------
+    NeuripsInfoPaper
+        the fields found on the page
+    """
+    paper = NeuripsInfoPaper()
+    for title, content in heading_sections(page, parser=parser):
+        if "part of" in content.lower():
+            paper.title = title
+
+        if "authors" in title.lower():
+            paper.authors = content
+
+        if "abstract" in title.lower():
+            paper.abstract = content
+    return paper
+
+
+def scrape_neurips_year(year: int, parser: str = DEFAULT_HTML_PARSER) -> List[str]:
+    """Returns the hashes of the papers listed on the proceedings page of `year`, empty if there is no page"""
+    try:
+        r = get_http_client().get(NEURIPS_URL + f"paper/{year}", cached=True)
+    except REQUEST_ERRORS as e:
+        logger.warning(f"Couldn't fetch the proceedings of {year}: {e}")
+        return []
+    if r.status_code != 200:
+        logger.warning(f"No proceedings found for {year} (code {r.status_code})")
+        return []
+    hashes = []
+    for url in column_links(r.content, parser=parser):
+        *_, abstract = url.split("/")
+        hash_url, *_ = abstract.split("-")
+        hashes.append(hash_url)
+    return hashes
+
+
+def get_neurips_hashs(
+    save_file: Optional[Path] = None, workers: int = DEFAULT_WORKERS, refresh: bool = False
+) -> pd.DataFrame:
     """Retrieves the hashes from each NeurIPS abstract from the proceedings website: `https://papers.nips.cc/`
 
     The hashes and the year are needed to extract complementary information from that website, hence why the user can pass an optional parameter where the resut is stored in a CSV file.
 
+    If `save_file` already exists, only the years it is missing are scraped, along with
+    its latest year, whose proceedings may have grown since. The new hashes are merged into it:
+    the known hashes of a year are kept when its page couldn't be fetched again.
+
     Parameters
     ----------
     save_file : Optional[Path], optional
         The file where the results are saved, by default None
+    workers : int, optional
+        number of years scraped at the same time, by default DEFAULT_WORKERS
+    refresh : bool, optional
+        scrape every year again, by default False
 
     Returns
     -------
     pd.DataFrame
         The dataframe containing the hashs and year columns
     """
+    known = pd.DataFrame(HashYearDataFrame().dict())
+    if save_file and save_file.exists() and not refresh:
+        known = pd.read_csv(save_file, dtype={"hash": str})
+    # Every year before the latest known one is final
+    known_years = set(known.year.tolist())
+    complete_years = {year for year in known_years if year < max(known_years, default=FIRST_YEAR)}
+    years = [year for year in range(FIRST_YEAR, CURRENT_YEAR + 1) if year not in complete_years]
+    logger.info(f"{len(complete_years)} years already known, scraping {len(years)} years.")
+
     year_hash = HashYearDataFrame()
-    for y in range(1987, CURRENT_YEAR):
-        year_url = NEURIPS_URL + f"paper/{y}"
-        r = requests.get(year_url)
-        if r.status_code == 200:
-            soup = BeautifulSoup(r.content, "html.parser")
-            for p in soup.select("div.col li a"):
-                url = p["href"]
-                *_, abstract = url.split("/")
-                hash_url, *_ = abstract.split("-")
-                year_hash.hash.append(hash_url)
-                year_hash.year.append(y)
-    df = pd.DataFrame(year_hash.dict())
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for year, hashes in zip(years, pool.map(scrape_neurips_year, years)):
+            year_hash.hash.extend(hashes)
+            year_hash.year.extend([year] * len(hashes))
+
+    df = pd.concat([known, pd.DataFrame(year_hash.dict())], ignore_index=True)
+    df = df.astype({"year": int}).drop_duplicates().sort_values("year", kind="stable").reset_index(drop=True)
     if save_file:
         df.to_csv(save_file, index=None)
     return df
 
 
+def load_year_hash(hash_csv: Optional[Path] = None) -> pd.DataFrame:
+    """Reads the years and hashes of the papers from `hash_csv`, scraping them if the file is missing
+
+    Parameters
+    ----------
+    hash_csv : Optional[Path], optional
+        CSV written by `get_neurips_hashs`, by default None (always scraped)
+
+    Returns
+    -------
+    pd.DataFrame
+        The dataframe containing the hashs and year columns
+    """
+    if hash_csv:
+        try:
+            return pd.read_csv(hash_csv)
+        except FileNotFoundError:
+            logger.error(f"{hash_csv} not found. Retrieving data")
+            return get_neurips_hashs(save_file=hash_csv)
+    return get_neurips_hashs()
+
+
 def save_neurips_info(save_folder: Path, hash_csv: Optional[Path] = None) -> pd.DataFrame:
     """Saves information about the articles in CSV file
 
@@ -128,40 +237,16 @@ def save_neurips_info(save_folder: Path, hash_csv: Optional[Path] = None) -> pd.
         [description]
     """
     data = NeuripsInfoDataFrame()
-
-    if hash_csv:
-        try:
-            year_hash = pd.read_csv(hash_csv)
-        except FileNotFoundError:
-            logger.error(f"{hash_csv} not found. Retrieving data")
-            year_hash = get_neurips_hashs(save_file=hash_csv)
-    else:
-        year_hash = get_neurips_hashs()
-
+    year_hash = load_year_hash(hash_csv)
     for _, row in tqdm(year_hash.iterrows(), desc="Scraping abstracts", total=year_hash.shape[0], unit="row"):
-        url = f"{NEURIPS_URL}paper/{row.year}/hash/{row.hash}-Abstract.html"
-        paper = NeuripsInfoPaper()
-        r = requests.get(url)
+        r = get_http_client().get(abstract_url(row.year, row.hash), cached=True)
         if r.status_code == 200:
-            soup = BeautifulSoup(r.content, "html.parser")
-            for title, content in zip(soup.select("div.col h4"), soup.select("div.col h4 + p")):
-                title, content = extract_text(title), extract_text(content)
-
-                if "part of" in content.lower():
-                    paper.title = title
-
-                if "authors" in title.lower():
-                    paper.authors = content
-
-                if "abstract" in title.lower():
-                    paper.abstract = content
-
+            paper = parse_abstract_page(r.content)
             data.title.append(paper.title)
             data.authors.append(paper.authors)
             data.abstract.append(paper.abstract)
-
         else:
-            logger.error(f"Couldnt parse {url}. CODE: {r.status_code}")
+            logger.error(f"Couldnt parse {abstract_url(row.year, row.hash)}. CODE: {r.status_code}")
 
     df = pd.DataFrame(data.dict())
     logger.info(f"Done! Saving to {save_folder / 'neurips_info.csv'}")
@@ -169,181 +254,300 @@ def save_neurips_info(save_folder: Path, hash_csv: Optional[Path] = None) -> pd.
     return df
 
 
-def save_neurips_info_sql(engine: Engine, hash_csv: Optional[Path] = None) -> None:
+def scrape_abstract(year: int, hash: str) -> Optional[NeuripsInfoPaper]:
+    """Scrapes the abstract page of a paper, None if it couldn't be fetched"""
+    r = get_http_client().get(abstract_url(year, hash), cached=True)
+    if r.status_code != 200:
+        logger.error(f"Couldnt parse {abstract_url(year, hash)}. CODE: {r.status_code}")
+        return None
+    return parse_abstract_page(r.content)
+
+
+def save_neurips_batch(
+    session: sessionmaker, batch: List[Tuple[int, str, NeuripsInfoPaper]], author_cache: AuthorCache
+) -> bool:
+    """Inserts a batch of papers and their authors in a single transaction
+
+    The authors of the whole batch are resolved at once, so an author is only inserted
+    if neither the database nor another paper of the batch has it yet. The session is
+    emptied afterwards so that its identity map doesn't grow from one batch to the next.
+
+    Parameters
+    ----------
+    session : sessionmaker
+        The SQLAlchemy session in which every operation is done
+    batch : List[Tuple[int, str, NeuripsInfoPaper]]
+        the year, hash and scraped page of each paper
+    author_cache : AuthorCache
+        cache of the author ids of the database
+
+    Returns
+    -------
+    bool
+        whether the batch was committed
+    """
+    try:
+        papers = []
+        authors = {}
+        for year, hash, info in batch:
+            paper_entry = Papers(
+                hash=hash,
+                year=year,
+                title=info.title,
+                abstract=info.abstract,
+                category="deep learning",
+                dataset="neurips",
+            )
+            # A name listed twice is linked once
+            names = list(dict.fromkeys(author_name(author) for author in info.authors.split(",") if author.strip()))
+            papers.append((paper_entry, names))
+            authors.update({name: None for name in names})
+
+        session.add_all([paper_entry for paper_entry, _ in papers])
+        author_ids = author_cache.resolve_many(session, authors) if authors else {}
+        session.flush()
+        links = [
+            {"paper_id": paper_entry.id, "author_id": author_ids[name]}
+            for paper_entry, names in papers
+            for name in names
+        ]
+        if links:
+            session.execute(insert(PaperAuthor), links)
+        session.commit()
+    except SQLAlchemyError as e:
+        logger.error(f"SQLAlchemy error: {e}. Rerolling the batch of {len(batch)} papers...")
+        session.rollback()
+        author_cache.invalidate()
+        return False
+    finally:
+        session.expunge_all()
+    return True
+
+
+def save_neurips_info_sql(engine: Engine, hash_csv: Optional[Path] = None, batch_size: int = SQL_BATCH_SIZE) -> None:
     """Saves Neurips data inside the SQL database you logged in.
 
+    Papers are committed by batches of `batch_size`, so memory stays flat whatever the
+    size of the corpus and a failure only loses its own batch. Papers already in the
+    database are skipped, so a rerun picks up where the previous one stopped. Papers whose
+    page couldn't be scraped aren't saved, so that the next run fetches them again.
+
     Parameters
     ----------
     engine : Engine
         An SQLalchemy engine
     hash_csv : Optional[Path], optional
-        [description], by default None
+        CSV of the years and hashes of the papers, scraped if missing, by default None
+    batch_size : int, optional
+        number of papers committed at once, by default SQL_BATCH_SIZE
     """
 
-    # Creates the tables
-    Base.metadata.create_all(engine)
+    # Creates the tables, or brings them up to date
+    upgrade_schema(engine)
 
-    Session = sessionmaker(engine)
-    session = Session()
+    session = sessionmaker(engine)()
+    author_cache = get_author_cache(engine)
 
-    if hash_csv:
-        try:
-            year_hash = pd.read_csv(hash_csv)
-        except FileNotFoundError:
-            logger.error(f"{hash_csv} not found. Retrieving data")
-            year_hash = get_neurips_hashs(save_file=hash_csv)
-    else:
-        year_hash = get_neurips_hashs()
-
-    for _, row in tqdm(year_hash.iterrows(), desc="Scraping abstracts", total=year_hash.shape[0], unit="row"):
-        url = f"{NEURIPS_URL}paper/{row.year}/hash/{row.hash}-Abstract.html"
-        paper = NeuripsInfoPaper()
-        r = requests.get(url)
-        if r.status_code == 200:
-            soup = BeautifulSoup(r.content, "html.parser")
-            for title, content in zip(soup.select("div.col h4"), soup.select("div.col h4 + p")):
-                title, content = extract_text(title), extract_text(content)
-
-                if "part of" in content.lower():
-                    paper.title = title
-
-                if "authors" in title.lower():
-                    paper.authors = content
+    year_hash = load_year_hash(hash_csv)
+    # Earlier versions saved a row without title nor abstract for the pages they couldn't scrape
+    stubs = session.query(Papers).filter(
+        Papers.dataset == "neurips", Papers.title.is_(None), Papers.abstract.is_(None), ~Papers.authors.any()
+    )
+    n_stubs = stubs.delete(synchronize_session=False)
+    session.commit()
+    if n_stubs:
+        logger.info(f"{n_stubs} papers that couldn't be scraped before will be fetched again.")
+    saved = {hash for hash, in session.query(Papers.hash).filter(Papers.dataset == "neurips")}
+    pairs = [(year, hash) for year, hash in zip(year_hash.year.tolist(), year_hash.hash.tolist()) if hash not in saved]
+    logger.info(f"{len(saved)} papers already saved, {len(pairs)} to go.")
+
+    n_failed = 0
+    batch = []
+    for year, hash in tqdm(pairs, desc="Scraping abstracts", unit="paper"):
+        info = scrape_abstract(year, hash)
+        if info is None:
+            n_failed += 1
+            continue
+        batch.append((year, hash, info))
+        if len(batch) >= batch_size:
+            n_failed += 0 if save_neurips_batch(session, batch, author_cache) else len(batch)
+            batch = []
+    if batch:
+        n_failed += 0 if save_neurips_batch(session, batch, author_cache) else len(batch)
+
+    session.close()
+    author_cache.log_stats()
+    if n_failed:
+        logger.warning(f"{n_failed} papers couldn't be saved, run it again to retry them.")
+    logger.info("Done!")
 
-                if "abstract" in title.lower():
-                    paper.abstract = content
 
-            paper_entry = Papers(
-                hash=row.hash,
-                year=int(row.year),
-                title=paper.title,
-                abstract=paper.abstract,
-                authors=([author_entry(author) for author in paper.authors.split(",")] if paper.authors else []),
-            )
+def fetch_metadata(hash: str, year: int) -> Optional[Dict]:
+    """Requests the metadata of a paper.
 
-        else:
-            logger.error(f"Couldnt parse {url}. CODE: {r.status_code}")
-            paper_entry = Papers(hash=row.hash, year=int(row.year))
+    Returns None if the request failed. If the response couldn't be decoded, the
+    returned document is an error record holding the hash, the year and the
+    status "Download failed".
+    """
+    try:
+        metadata = NeuripsAPIConnector.get_metadata(hash, year)
+    except Exception as e:
+        logger.error(f"{e}. Skipping...")
+        return None
+
+    # Check the error report first
+    if "error" in metadata:
+        logger.error(f"{metadata['error']} with {metadata['url']}")
+        metadata["hash"] = hash
+        metadata["year"] = year
+        metadata["status"] = "Download failed"
+    return metadata
+
+
+async def _fetch_metadata_async(
+    pairs: List[Tuple[int, str]], sink: MetadataSink, concurrency: int, progress: tqdm
+) -> None:
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+
+        async def fetch(year: int, hash: str) -> None:
+            metadata = await loop.run_in_executor(pool, fetch_metadata, hash, year)
+            # The sink is only written to from the event loop
+            if metadata is not None:
+                sink.write(year, hash, metadata)
+            progress.update()
+
+        # At most `concurrency` requests in flight, the next one starts as soon as one ends
+        pending = set()
+        try:
+            for year, hash in pairs:
+                if len(pending) >= concurrency:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    # Raises the errors of the requests and of the sink, as the sequential loop does
+                    for task in done:
+                        task.result()
+                pending.add(asyncio.create_task(fetch(year, hash)))
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+def fetch_neurips_metadata(year_hash: pd.DataFrame, sink: MetadataSink, concurrency: int = 1) -> None:
+    """Fetches the metadata of every (year, hash) pair that isn't in `sink` yet
 
-        session.add(paper_entry)
+    Parameters
+    ----------
+    year_hash : pd.DataFrame
+        the year and hash of the papers
+    sink : MetadataSink
+        where the documents are written
+    concurrency : int, optional
+        number of requests in flight, by default 1 (one request after the other)
+    """
+    # Before requesting, find the entries already in the db / folder
+    all_pairs = list(zip(year_hash.year.tolist(), year_hash.hash.tolist()))
+    pairs = sink.missing(all_pairs)
+    logger.info(f"{len(all_pairs) - len(pairs)} entries already exist, {len(pairs)} to fetch.")
+
+    progress = tqdm(desc="retrieving metatdata", unit="hash", total=len(pairs))
+    if concurrency > 1:
+        asyncio.run(_fetch_metadata_async(pairs, sink, concurrency, progress))
+    else:
+        for year, hash in pairs:
+            metadata = fetch_metadata(hash, year)
+            if metadata is not None:
+                sink.write(year, hash, metadata)
+            progress.update()
+    progress.close()
+
+
+def metadata_sink(mongo_creds: Optional[MongoCreds] = None) -> MetadataSink:
+    """Mongo collection described by `mongo_creds`, or the local metadata store if there are none"""
+    if not mongo_creds:
+        return StoreSink(MetadataStore(METADATA_STORE_DIR))
+
+    mongo_conn = MongoConnector()
+    if mongo_creds.uri:
+        logger.info("Mongo Atlas URI detected.")
+        mongo_conn.connect_from_atlas(mongo_creds.uri)
+    else:
+        logger.info(f"Connecting to MongoDB at {mongo_creds.host}:{mongo_creds.port}")
+        mongo_conn.connect_locally(host=mongo_creds.host, port=mongo_creds.port)
 
-    session.commit()
-    logger.info("Done!")
+    client = mongo_conn.create_client()
+    return MongoSink(client[mongo_creds.database][mongo_creds.collection])
 
 
-def save_neurips_metadata(hash_csv: Optional[Path] = None, mongo_creds: Optional[MongoCreds] = None) -> None:
-    """[summary]
+def save_neurips_metadata(
+    hash_csv: Optional[Path] = None, mongo_creds: Optional[MongoCreds] = None, concurrency: int = 1
+) -> None:
+    """Downloads the metadata of every NeurIPS paper that wasn't fetched yet
 
     Parameters
     ----------
     hash_csv : Optional[Path], optional
-        [description], by default None
+        CSV of the years and hashes of the papers, scraped if missing, by default None
     mongo_creds : Optional[MongoCreds], optional
-        [description], by default None
+        credentials of the Mongo collection to fill, by default None (metadata store in data/raw)
+    concurrency : int, optional
+        number of requests in flight, by default 1
     """
-    if hash_csv:
-        try:
-            year_hash = pd.read_csv(hash_csv)
-        except FileNotFoundError:
-            logger.error(f"{hash_csv} not found. Retrieving data")
-            year_hash = get_neurips_hashs(save_file=hash_csv)
-    else:
-        year_hash = get_neurips_hashs()
-
-    if mongo_creds:
-        mongo_conn = MongoConnector()
-        if mongo_creds.uri:
-            logger.info("Mongo Atlas URI detected.")
-            mongo_conn.connect_from_atlas(mongo_creds.uri)
-        else:
-            logger.info(f"Connecting to MongoDB at {mongo_creds.host}:{mongo_creds.port}")
-            mongo_conn.connect_locally(host=mongo_creds.host, port=mongo_creds.port)
-
-        client = mongo_conn.create_client()
-        db = client[mongo_creds.database]
-        collection = db[mongo_creds.collection]
-    else:
-        json_dir = ROOT_DIR / "data" / "raw" / "neurips_metadata"
-        json_dir.mkdir(parents=True, exist_ok=True)
-
-    for _, row in tqdm(year_hash.iterrows(), desc="retrieving metatdata", unit="hash", total=year_hash.shape[0]):
-        # Before requesting, check if the entry isn't in the db / folder first
-        if mongo_creds:
-            current_entry = collection.find_one({"_id": row.hash})
-        else:
-            current_entry = (json_dir / f"{row.year}_{row.hash}.json").exists()
-
-        if not current_entry:
-            # Get request
-            try:
-                metadata = NeuripsAPIConnector.get_metadata(row.hash, row.year)
-            except Exception as e:
-                logger.error(f"{e}. Skipping...")
-            else:
-                # Check the error report first
-                if "error" in metadata:
-                    logger.error(f"{metadata['error']} with {metadata['url']}")
-                    metadata["hash"] = row.hash
-                    metadata["year"] = row.year
-                    metadata["status"] = "Download failed"
-
-                # Insert or register if everything is ok
-                if mongo_creds:
-                    metadata["_id"] = row.hash
-                    try:
-                        _ = collection.insert_one(metadata).inserted_id
-                    except pymongo.errors.DuplicateKeyError:
-                        logger.error(f"Entry {row.hash} already exists!")
-                    else:
-                        logger.info(f"Entry {row.hash} inserted!")
-
-                else:
-                    # Save everything as a JSON file
-                    with open(json_dir / f"{row.year}_{row.hash}.json", "w") as json_f:
-                        json.dump(metadata, json_f, indent=2)
-                    logger.info(f"{json_dir / f'{row.year}_{row.hash}.json'} written!")
-        else:
-            logger.warning(f"Entry {row.hash} from {row.year} already exists")
+    year_hash = load_year_hash(hash_csv)
 
+    sink = metadata_sink(mongo_creds)
+    try:
+        fetch_neurips_metadata(year_hash, sink, concurrency=concurrency)
+    finally:
+        sink.close()
     logger.info("Operation complete.")
 
 
-def download_neurips_bibtex(target_folder: Path, hash_csv: Optional[Path] = None) -> None:
-    """[summary]
+def download_neurips_bibtex(
+    target_folder: Path, hash_csv: Optional[Path] = None, workers: int = DEFAULT_WORKERS
+) -> Dict[str, int]:
+    """Downloads the BibTeX reference of every paper to `<year>_<hash>.bib`
 
     Parameters
     ----------
     target_folder : Path
-        [description]
+        folder to put the references in
     hash_csv : Optional[Path], optional
-        [description], by default None
+        metadata file containing the hashes and the years, by default None
+    workers : int, optional
+        number of files downloaded at the same time, by default DEFAULT_WORKERS
+
+    Returns
+    -------
+    Dict[str, int]
+        number of files per status, see `FileDownloader.download_all`
     """
     if not target_folder.exists():
         logger.warning("Provided folder doesn't exist. Creating a new one")
         target_folder.mkdir(parents=True)
 
-    if hash_csv:
-        try:
-            year_hash = pd.read_csv(hash_csv)
-        except FileNotFoundError:
-            logger.error(f"{hash_csv} not found. Retrieving data")
-            year_hash = get_neurips_hashs(save_file=hash_csv)
-    else:
-        year_hash = get_neurips_hashs()
-    for _, row in tqdm(year_hash.iterrows(), desc="Downloading bibtex refs", unit="hash", total=year_hash.shape[0]):
-        bibtex_url = f"{NEURIPS_URL}paper/{row.year}/file/{row.hash}-Bibtex.bib"
-        r = requests.get(bibtex_url)
-        if r.status_code == 200 and not (target_folder / f"{row.year}_{row.hash}.bib").exists():
-            with open(target_folder / f"{row.year}_{row.hash}.bib", "wb") as f:
-                f.write(r.content)
-            logger.info(f"{row.year}_{row.hash}.bib successfully written.")
+    year_hash = load_year_hash(hash_csv)
+    files = [
+        (bibtex_url(year, hash), target_folder / f"{year}_{hash}.bib")
+        for year, hash in zip(year_hash.year.tolist(), year_hash.hash.tolist())
+    ]
+    summary = FileDownloader(workers=workers).download_all(files, desc="Downloading bibtex refs")
     logger.info("Operation complete")
+    return summary
 
 
-def download_neurips_papers(target_folder: Path, hash_csv: Optional[Path] = None, chunk_size: int = 512) -> None:
+def download_neurips_papers(
+    target_folder: Path,
+    hash_csv: Optional[Path] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    workers: int = DEFAULT_WORKERS,
+) -> Dict[str, int]:
     """Function that downloads papers from the Neurips website.
-    It takes a destination folder as well as a chunk_size in the possible case that the
-    download might exceed the buffer's capacity.
+    PDFs whose file already exists are skipped without any request, and partial
+    downloads are resumed.
 
     Parameters
     ----------
@@ -352,26 +556,24 @@ def download_neurips_papers(target_folder: Path, hash_csv: Optional[Path] = None
     hash_csv : Optional[Path], optional
         metadata file containing the hashes and the years, by default None
     chunk_size : int, optional
-        array size when the PDF is donwloaded by parts, by default 512
+        size of the blocks read from the response and written to disk, by default DEFAULT_CHUNK_SIZE (1MB)
+    workers : int, optional
+        number of files downloaded at the same time, by default DEFAULT_WORKERS
+
+    Returns
+    -------
+    Dict[str, int]
+        number of files per status, see `FileDownloader.download_all`
     """
     if not target_folder.exists():
         logger.warning("Provided folder doesn't exist. Creating a new one")
         target_folder.mkdir(parents=True)
 
-    if hash_csv:
-        try:
-            year_hash = pd.read_csv(hash_csv)
-        except FileNotFoundError:
-            logger.error(f"{hash_csv} not found. Retrieving data")
-            year_hash = get_neurips_hashs(save_file=hash_csv)
-    else:
-        year_hash = get_neurips_hashs()
-    for _, row in tqdm(year_hash.iterrows(), desc="Downloading PDFS", unit="hash", total=year_hash.shape[0]):
-        pdf_url = f"{NEURIPS_URL}paper/{row.year}/file/{row.hash}-Paper.pdf"
-        r = requests.get(pdf_url, stream=True)
-        if r.status_code == 200 and not (target_folder / f"{row.year}_{row.hash}.pdf").exists():
-            with open(target_folder / f"{row.year}_{row.hash}.pdf", "wb") as f:
-                for chunk in r.iter_content(chunk_size):
-                    f.write(chunk)
-            logger.info(f"{row.year}_{row.hash}.pdf successfully written.")
+    year_hash = load_year_hash(hash_csv)
+    files = [
+        (pdf_url(year, hash), target_folder / f"{year}_{hash}.pdf")
+        for year, hash in zip(year_hash.year.tolist(), year_hash.hash.tolist())
+    ]
+    summary = FileDownloader(workers=workers, chunk_size=chunk_size).download_all(files, desc="Downloading PDFS")
     logger.info("Operation complete")
+    return summary
@@ -0,0 +1,249 @@
+"""Single-pass crawler of the NeurIPS proceedings.
+
+Each paper is visited once and only the selected artifacts that aren't stored yet are
+fetched: its abstract page, its metadata JSON, its BibTeX reference and its PDF. The
+papers are spread over a pool of threads sharing the connections of the HTTP client.
+Everything is stored under a single folder:
+
+- `neurips_info.csv`: year, hash, title, authors and abstract of each paper
+- `metadata/`: metadata store of the JSON documents
+- `bibtex/<year>_<hash>.bib` and `pdf/<year>_<hash>.pdf`
+"""
+
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import coloredlogs
+import pandas as pd
+from pydantic import BaseModel
+from tqdm import tqdm
+
+from .file_download import DEFAULT_WORKERS, FileDownloader
+from .http_client import REQUEST_ERRORS, HttpClient, get_http_client
+from .metadata_sinks import StoreSink
+from .metadata_store import MetadataStore
+from .neurips import abstract_url, bibtex_url, fetch_metadata, load_year_hash, parse_abstract_page, pdf_url
+
+ARTIFACTS = ("abstract", "metadata", "bibtex", "pdf")
+INFO_FILE = "neurips_info.csv"
+INFO_COLUMNS = ["year", "hash", "title", "authors", "abstract"]
+
+log_fmt = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+logging.basicConfig(level=logging.INFO, format=log_fmt)
+logger = logging.getLogger(__name__)
+coloredlogs.install()
+
+
+class ArtifactStats(BaseModel):
+    fetched: int = 0
+    skipped: int = 0
+    failed: int = 0
+    bytes: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def mean_latency(self) -> float:
+        return self.elapsed / (self.fetched + self.failed) if self.fetched + self.failed else 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Bytes per second spent fetching the artifact"""
+        return self.bytes / self.elapsed if self.elapsed else 0.0
+
+
+class NeuripsCrawler:
+    """Fetches the selected artifacts of each paper in a single pass.
+
+    Parameters
+    ----------
+    target_folder : Path
+        folder the artifacts are stored in, created if needed
+    artifacts : Sequence[str], optional
+        artifacts to fetch among ARTIFACTS, by default all of them
+    workers : int, optional
+        number of papers crawled at the same time, by default DEFAULT_WORKERS
+    client : Optional[HttpClient], optional
+        the HTTP client, by default the shared one
+    """
+
+    def __init__(
+        self,
+        target_folder: Path,
+        artifacts: Sequence[str] = ARTIFACTS,
+        workers: int = DEFAULT_WORKERS,
+        client: Optional[HttpClient] = None,
+    ):
+        unknown = set(artifacts) - set(ARTIFACTS)
+        if unknown:
+            raise ValueError(f"Unknown artifacts {sorted(unknown)}, expected some of {ARTIFACTS}")
+        self.target_folder = target_folder
+        self.artifacts = [artifact for artifact in ARTIFACTS if artifact in artifacts]
+        self.workers = workers
+        self.client = client or get_http_client()
+        self.downloader = FileDownloader(client=self.client)
+        self._lock = threading.Lock()
+        self.stats: Dict[str, ArtifactStats] = {artifact: ArtifactStats() for artifact in self.artifacts}
+
+    def file_path(self, artifact: str, year: int, hash: str) -> Path:
+        suffix = ".bib" if artifact == "bibtex" else ".pdf"
+        return self.target_folder / artifact / f"{year}_{hash}{suffix}"
+
+    def crawl(self, year_hash: pd.DataFrame) -> Dict[str, ArtifactStats]:
+        """Fetches the missing artifacts of every paper of `year_hash`
+
+        Returns
+        -------
+        Dict[str, ArtifactStats]
+            counters of each artifact
+        """
+        self.target_folder.mkdir(parents=True, exist_ok=True)
+        for artifact in ("bibtex", "pdf"):
+            if artifact in self.artifacts:
+                (self.target_folder / artifact).mkdir(exist_ok=True)
+        info_file = self.target_folder / INFO_FILE
+        info = pd.read_csv(info_file, dtype={"hash": str}) if info_file.exists() else pd.DataFrame(columns=INFO_COLUMNS)
+        sink = StoreSink(MetadataStore(self.target_folder / "metadata")) if "metadata" in self.artifacts else None
+
+        pairs = list(zip(year_hash.year.tolist(), year_hash.hash.tolist()))
+        todo = self.missing_artifacts(pairs, set(info.hash.tolist()), sink)
+        logger.info(f"{len(pairs) - len(todo)} papers already crawled, {len(todo)} to go.")
+
+        rows: List[Dict] = []
+        t1 = time.monotonic()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                futures = [pool.submit(self.crawl_paper, year, hash, artifacts) for (year, hash), artifacts in todo]
+                for future in tqdm(as_completed(futures), total=len(futures), desc="Crawling papers", unit="paper"):
+                    year, hash, results = future.result()
+                    # The store and the rows are only written to from this thread
+                    if "abstract" in results:
+                        rows.append(results["abstract"])
+                    if "metadata" in results:
+                        sink.write(year, hash, results["metadata"])
+        finally:
+            if sink is not None:
+                sink.close()
+            if rows:
+                pd.concat([info, pd.DataFrame(rows, columns=INFO_COLUMNS)], ignore_index=True).to_csv(
+                    info_file, index=None
+                )
+        self.log_stats(len(todo), time.monotonic() - t1)
+        return self.stats
+
+    def missing_artifacts(
+        self, pairs: List[Tuple[int, str]], known_abstracts: Set[str], sink: Optional[StoreSink]
+    ) -> List[Tuple[Tuple[int, str], List[str]]]:
+        """The artifacts left to fetch for each paper, leaving out the papers that are complete"""
+        missing_metadata = set(sink.missing(pairs)) if sink is not None else set()
+        todo = []
+        for year, hash in pairs:
+            artifacts = []
+            for artifact in self.artifacts:
+                if artifact == "abstract":
+                    stored = hash in known_abstracts
+                elif artifact == "metadata":
+                    stored = (year, hash) not in missing_metadata
+                else:
+                    stored = self.file_path(artifact, year, hash).exists()
+                if stored:
+                    self.stats[artifact].skipped += 1
+                else:
+                    artifacts.append(artifact)
+            if artifacts:
+                todo.append(((year, hash), artifacts))
+        return todo
+
+    def crawl_paper(self, year: int, hash: str, artifacts: List[str]) -> Tuple[int, str, Dict[str, Any]]:
+        """Fetches some artifacts of a paper, one after the other
+
+        Returns
+        -------
+        Tuple[int, str, Dict[str, Any]]
+            the year, the hash and the abstract row and metadata document that were fetched
+        """
+        results = {}
+        for artifact in artifacts:
+            t1 = time.monotonic()
+            try:
+                result, n_bytes = getattr(self, f"fetch_{artifact}")(year, hash)
+            except REQUEST_ERRORS as e:
+                logger.error(f"Couldn't fetch the {artifact} of {hash}: {e}")
+                result, n_bytes = None, 0
+            self._record(artifact, time.monotonic() - t1, n_bytes, failed=result is None)
+            if result is not None:
+                results[artifact] = result
+        return year, hash, results
+
+    def fetch_abstract(self, year: int, hash: str) -> Tuple[Optional[Dict], int]:
+        url = abstract_url(year, hash)
+        r = self.client.get(url, cached=True)
+        if r.status_code != 200:
+            logger.error(f"Couldnt parse {url}. CODE: {r.status_code}")
+            return None, 0
+        return {"year": year, "hash": hash, **parse_abstract_page(r.content).dict()}, len(r.content)
+
+    def fetch_metadata(self, year: int, hash: str) -> Tuple[Optional[Dict], int]:
+        metadata = fetch_metadata(hash, year)
+        return metadata, len(json.dumps(metadata)) if metadata is not None else 0
+
+    def fetch_bibtex(self, year: int, hash: str) -> Tuple[Optional[Path], int]:
+        return self._fetch_file("bibtex", bibtex_url(year, hash), year, hash)
+
+    def fetch_pdf(self, year: int, hash: str) -> Tuple[Optional[Path], int]:
+        return self._fetch_file("pdf", pdf_url(year, hash), year, hash)
+
+    def _fetch_file(self, artifact: str, url: str, year: int, hash: str) -> Tuple[Optional[Path], int]:
+        dst = self.file_path(artifact, year, hash)
+        if self.downloader.download_file(url, dst) != "done":
+            return None, 0
+        return dst, dst.stat().st_size
+
+    def _record(self, artifact: str, elapsed: float, n_bytes: int, failed: bool) -> None:
+        with self._lock:
+            stats = self.stats[artifact]
+            stats.fetched += not failed
+            stats.failed += failed
+            stats.bytes += n_bytes
+            stats.elapsed += elapsed
+
+    def log_stats(self, n_papers: int, elapsed: float) -> None:
+        logger.info(f"{n_papers:,d} papers crawled in {elapsed:.1f}s ({n_papers / max(elapsed, 1e-9):.1f} papers/s)")
+        for artifact, stats in self.stats.items():
+            logger.info(
+                f"{artifact}: {stats.fetched:,d} fetched, {stats.skipped:,d} skipped, {stats.failed:,d} failed, "
+                f"{stats.bytes / 2**20:.1f} MB, {stats.mean_latency * 1000:.0f}ms mean latency, "
+                f"{stats.throughput / 2**20:.2f} MB/s"
+            )
+
+
+def crawl_neurips(
+    target_folder: Path,
+    hash_csv: Optional[Path] = None,
+    artifacts: Sequence[str] = ARTIFACTS,
+    workers: int = DEFAULT_WORKERS,
+) -> Dict[str, ArtifactStats]:
+    """Crawls the papers of `hash_csv` once, fetching the selected artifacts
+
+    Parameters
+    ----------
+    target_folder : Path
+        folder the artifacts are stored in
+    hash_csv : Optional[Path], optional
+        CSV of the years and hashes of the papers, scraped if missing, by default None
+    artifacts : Sequence[str], optional
+        artifacts to fetch among ARTIFACTS, by default all of them
+    workers : int, optional
+        number of papers crawled at the same time, by default DEFAULT_WORKERS
+
+    Returns
+    -------
+    Dict[str, ArtifactStats]
+        counters of each artifact
+    """
+    crawler = NeuripsCrawler(target_folder, artifacts=artifacts, workers=workers)
+    return crawler.crawl(load_year_hash(hash_csv))
@@ -0,0 +1,255 @@
+"""Splits broad arXiv queries into submission date windows.
+
+The API returns at most MAX_RESULTS results for a query. The planner counts the
+results of the query over a date range with a one-result request, and splits the
+ranges holding too many results on calendar boundaries (years, then months, days,
+hours and minutes) until every window fits under the cap. Consecutive small ranges
+are merged back into a single window. Since the boundaries don't depend on the end
+date, every window but the last one keeps its bounds, and so its harvest job, when
+the planning is run again later. The windows are then harvested through a single
+`ArxivHarvester`: they share its rate limiter, each window is checkpointed as its
+own harvest job, and an entry returned by several windows is saved once.
+"""
+
+import asyncio
+import datetime as dt
+import logging
+from typing import List, Optional, Tuple
+
+import coloredlogs
+from pydantic import BaseModel
+from sqlalchemy.engine import Engine
+
+from .arxiv import (
+    BASE_URL,
+    MAX_RESULTS,
+    SUBMITTED_DATE_FMT,
+    DateRange,
+    build_arxiv_url,
+    feed_total_results,
+    log_arxiv_error,
+)
+from .harvest_jobs import JOB_DONE, PageTracker, close_harvest_job, open_window_job
+from .http_client import get_http_client
+from .harvester import ArxivHarvester, HarvestStats, RateLimiter, TokenBucketLimiter
+
+ARXIV_START = dt.datetime(1991, 8, 1)
+DEFAULT_PAGE_SIZE = 1000
+# Windows are sized to hold this fraction of the cap, so that their count can grow a bit
+FILL_RATIO = 0.8
+MIN_WINDOW = dt.timedelta(minutes=1)
+# Successive splits of a range holding too many results
+CALENDAR_UNITS = ("year", "month", "day", "hour", "minute")
+
+log_fmt = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+logging.basicConfig(level=logging.INFO, format=log_fmt)
+logger = logging.getLogger(__name__)
+coloredlogs.install()
+
+
+class DateWindow(BaseModel):
+    start: dt.datetime
+    end: dt.datetime
+    total: int
+
+    @property
+    def date_range(self) -> DateRange:
+        return self.start, self.end
+
+    @property
+    def label(self) -> str:
+        return f"submittedDate:[{self.start.strftime(SUBMITTED_DATE_FMT)} TO {self.end.strftime(SUBMITTED_DATE_FMT)}]"
+
+
+def next_calendar_boundary(moment: dt.datetime, unit: str) -> dt.datetime:
+    """The first start of a `unit` (e.g. the first day of a month) after `moment`"""
+    if unit == "year":
+        return dt.datetime(moment.year + 1, 1, 1)
+    if unit == "month":
+        return dt.datetime(moment.year + moment.month // 12, moment.month % 12 + 1, 1)
+    if unit == "day":
+        return dt.datetime(moment.year, moment.month, moment.day) + dt.timedelta(days=1)
+    if unit == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0) + dt.timedelta(hours=1)
+    return moment.replace(second=0, microsecond=0) + MIN_WINDOW
+
+
+def calendar_pieces(start: dt.datetime, end: dt.datetime, unit: str) -> List[Tuple[dt.datetime, dt.datetime]]:
+    """Splits [start, end] on the boundaries of `unit`. Both bounds of each piece are included."""
+    pieces = []
+    piece_start = start
+    while piece_start <= end:
+        boundary = next_calendar_boundary(piece_start, unit)
+        pieces.append((piece_start, min(boundary - MIN_WINDOW, end)))
+        piece_start = boundary
+    return pieces
+
+
+class DateWindowPlanner:
+    """Splits a query into windows of submission dates holding at most `cap` results each.
+
+    Parameters
+    ----------
+    limiter : Optional[RateLimiter], optional
+        limiter awaited before each counting request, by default a `TokenBucketLimiter`
+    cap : int, optional
+        maximum number of results of a window, by default MAX_RESULTS
+    fill_ratio : float, optional
+        fraction of the cap up to which consecutive ranges are merged, by default FILL_RATIO
+    base_url : str, optional
+        root of the API, by default BASE_URL
+    """
+
+    def __init__(
+        self,
+        limiter: Optional[RateLimiter] = None,
+        cap: int = MAX_RESULTS,
+        fill_ratio: float = FILL_RATIO,
+        base_url: str = BASE_URL,
+    ):
+        self.limiter = limiter or TokenBucketLimiter()
+        self.cap = cap
+        self.fill_ratio = fill_ratio
+        self.base_url = base_url
+        self.requests = 0
+
+    def count(self, query: str, date_range: DateRange) -> int:
+        """Number of results of the query among the articles submitted in `date_range`"""
+        asyncio.run(self.limiter.acquire())
+        self.requests += 1
+        r = get_http_client().get(build_arxiv_url(query, 0, 1, base_url=self.base_url, date_range=date_range))
+        if r.status_code != 200:
+            log_arxiv_error(r.content)
+            r.raise_for_status()
+        return feed_total_results(r.content)
+
+    def plan(
+        self, query: str, start: Optional[dt.datetime] = None, end: Optional[dt.datetime] = None
+    ) -> List[DateWindow]:
+        """Returns the windows covering [start, end], in chronological order and without overlap
+
+        Parameters
+        ----------
+        query : str
+            the full query. Can be one or multiple words.
+        start : Optional[dt.datetime], optional
+            first submission date, by default ARXIV_START
+        end : Optional[dt.datetime], optional
+            last submission date, by default now
+
+        Returns
+        -------
+        List[DateWindow]
+            the windows holding at least one result
+        """
+        start = (start or ARXIV_START).replace(second=0, microsecond=0)
+        end = (end or dt.datetime.utcnow()).replace(second=0, microsecond=0)
+        windows = self._split(query, start, end, self.count(query, (start, end)))
+        logger.info(
+            f"{sum(window.total for window in windows):,d} results split into {len(windows)} windows "
+            f"({self.requests} counting requests)."
+        )
+        return windows
+
+    def _split(self, query: str, start: dt.datetime, end: dt.datetime, total: int, level: int = 0) -> List[DateWindow]:
+        if total == 0:
+            return []
+        if total <= self.cap:
+            return [DateWindow(start=start, end=end, total=total)]
+        if level == len(CALENDAR_UNITS):
+            logger.warning(f"{total:,d} results submitted at {start}: only the first {self.cap:,d} can be fetched.")
+            return [DateWindow(start=start, end=end, total=self.cap)]
+
+        pieces = calendar_pieces(start, end, CALENDAR_UNITS[level])
+        if len(pieces) == 1:
+            return self._split(query, start, end, total, level + 1)
+        windows = []
+        group: Optional[DateWindow] = None
+        for piece_start, piece_end in pieces:
+            piece_total = self.count(query, (piece_start, piece_end))
+            if group is not None and group.total + piece_total <= self.cap * self.fill_ratio:
+                group = DateWindow(start=group.start, end=piece_end, total=group.total + piece_total)
+                continue
+            if group is not None and group.total:
+                windows.append(group)
+            group = None
+            if piece_total <= self.cap * self.fill_ratio:
+                group = DateWindow(start=piece_start, end=piece_end, total=piece_total)
+            else:
+                windows.extend(self._split(query, piece_start, piece_end, piece_total, level + 1))
+        if group is not None and group.total:
+            windows.append(group)
+        return windows
+
+
+def harvest_arxiv_windows(
+    query: str,
+    engine: Engine,
+    start: Optional[dt.datetime] = None,
+    end: Optional[dt.datetime] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    limiter: Optional[RateLimiter] = None,
+    max_fetchers: int = 1,
+    queue_size: int = 2,
+    base_url: str = BASE_URL,
+    parser: str = "lxml",
+    restart: bool = False,
+    planner: Optional[DateWindowPlanner] = None,
+) -> HarvestStats:
+    """Registers every result of a query, however many they are, by harvesting it window by window.
+
+    Parameters
+    ----------
+    query : str
+        the full query. Can be one or multiple words.
+    engine : Engine
+        SQLAlchemy engine.
+    start : Optional[dt.datetime], optional
+        first submission date, by default ARXIV_START
+    end : Optional[dt.datetime], optional
+        last submission date, by default now
+    page_size : int, optional
+        number of results per request, by default DEFAULT_PAGE_SIZE
+    limiter : Optional[RateLimiter], optional
+        limiter shared by the counting and the harvesting requests, by default one request every PAUSE_TIME seconds
+    max_fetchers : int, optional
+        number of requests allowed in flight, by default 1
+    queue_size : int, optional
+        capacity of the queues between the stages, by default 2
+    base_url : str, optional
+        root of the API, by default BASE_URL
+    parser : str, optional
+        Atom parser, "lxml" or "bs4", by default "lxml"
+    restart : bool, optional
+        ignore the checkpoints of a previous run of the windows, by default False
+    planner : Optional[DateWindowPlanner], optional
+        planner of the windows, by default a `DateWindowPlanner` sharing `limiter`
+
+    Returns
+    -------
+    HarvestStats
+        pages, entries, duplicates and throughput of the run
+    """
+    limiter = limiter or TokenBucketLimiter()
+    planner = planner or DateWindowPlanner(limiter=limiter, base_url=base_url)
+    windows = planner.plan(query, start=start, end=end)
+
+    queries = []
+    n_done = 0
+    for window in windows:
+        job = open_window_job(engine, f"{query} {window.label}", window.total, page_size, restart=restart)
+        if job.status == JOB_DONE:
+            n_done += 1
+            continue
+        pages = [
+            (offset, build_arxiv_url(query, offset, page_size, base_url=base_url, date_range=window.date_range))
+            for offset in range(job.next_offset, window.total, page_size)
+        ]
+        queries.append((pages, PageTracker(job.id, [offset for offset, _ in pages], end=window.total)))
+
+    logger.info(f"{n_done} windows already harvested, {len(queries)} to go.")
+    harvester = ArxivHarvester(engine, limiter=limiter, max_fetchers=max_fetchers, queue_size=queue_size, parser=parser)
+    stats = harvester.harvest_many(queries)
+    for _, tracker in queries:
+        close_harvest_job(engine, tracker.job_id)
+    return stats
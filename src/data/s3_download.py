@@ -0,0 +1,217 @@
+"""Parallel, resumable downloader for the arXiv bulk source tars.
+
+Each file is fetched with ranged GETs of `chunk_size` bytes, appended to a `.part`
+file and renamed once complete, so an interrupted download restarts from the last
+byte on disk. Files are spread over a pool of threads, and the state of every key is
+kept in `download_status.json` in the output folder so that a rerun knows what is
+left without stat-ing the whole directory. The MD5 of each file is computed on the
+stream and stored in the checksum cache, so verifying it doesn't read it again.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import boto3
+import coloredlogs
+from botocore.exceptions import BotoCoreError, ClientError
+from tqdm import tqdm
+
+from .integrity import CHECKSUM_FILE, READ_BUFFER_SIZE, ChecksumCache
+
+ARXIV_BUCKET = "arxiv"
+STATUS_FILE = "download_status.json"
+DEFAULT_WORKERS = 8
+DEFAULT_CHUNK_SIZE = 64 * 2**20
+READ_SIZE = 2**20
+
+log_fmt = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+logging.basicConfig(level=logging.INFO, format=log_fmt)
+logger = logging.getLogger(__name__)
+coloredlogs.install()
+
+
+def arxiv_s3_client():
+    """Creates an S3 client with the credentials stored in `AWS_ACCESS_KEY` and `AWS_SECRET_KEY`"""
+    return boto3.client(
+        "s3",  # the AWS resource we want to use
+        aws_access_key_id=os.environ.get("AWS_ACCESS_KEY"),
+        aws_secret_access_key=os.environ.get("AWS_SECRET_KEY"),
+        region_name="us-east-1",  # same region arxiv bucket is in
+    )
+
+
+class DownloadStatus:
+    """Per-key download state persisted as JSON.
+
+    Each key maps to a record holding its `status` ("done", "failed" or "missing"),
+    its `size`, the `md5` of the downloaded file and, for failures, the `error` message.
+    """
+
+    def __init__(self, status_file: Path):
+        self.status_file = status_file
+        self._lock = threading.Lock()
+        self.records: Dict[str, Dict[str, Any]] = {}
+        if status_file.exists():
+            with open(status_file, "r") as f:
+                self.records = json.load(f)
+
+    def get(self, key: str) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.records.get(key, {}))
+
+    def update(self, key: str, **fields) -> None:
+        with self._lock:
+            self.records.setdefault(key, {}).update(fields)
+            self._save()
+
+    def _save(self) -> None:
+        # Write then rename, so that a crash never leaves a truncated status file
+        tmp_file = self.status_file.with_suffix(".tmp")
+        with open(tmp_file, "w") as f:
+            json.dump(self.records, f)
+        os.replace(tmp_file, self.status_file)
+
+    def count(self, status: str) -> int:
+        with self._lock:
+            return sum(record.get("status") == status for record in self.records.values())
+
+
+class S3BulkDownloader:
+    """Downloads S3 objects to `output_dir` with a pool of threads.
+
+    Parameters
+    ----------
+    output_dir : Path
+        destination folder. Objects are saved under their basename.
+    client : optional
+        a boto3 S3 client, by default `arxiv_s3_client()`
+    bucket : str, optional
+        the bucket to download from, by default ARXIV_BUCKET
+    workers : int, optional
+        number of files downloaded at the same time, by default DEFAULT_WORKERS
+    chunk_size : int, optional
+        size of each ranged GET in bytes, by default DEFAULT_CHUNK_SIZE
+    requester_pays : bool, optional
+        whether the requests must be billed to the requester, by default True (arXiv's bucket)
+    checksums : Optional[ChecksumCache], optional
+        where the MD5 of the downloaded files are stored, by default `checksum_cache.json` in `output_dir`
+    """
+
+    def __init__(
+        self,
+        output_dir: Path,
+        client=None,
+        bucket: str = ARXIV_BUCKET,
+        workers: int = DEFAULT_WORKERS,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        requester_pays: bool = True,
+        checksums: Optional[ChecksumCache] = None,
+    ):
+        self.output_dir = output_dir
+        self.client = client or arxiv_s3_client()
+        self.bucket = bucket
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.extra_args = {"RequestPayer": "requester"} if requester_pays else {}
+        self.status = DownloadStatus(output_dir / STATUS_FILE)
+        self.checksums = checksums or ChecksumCache(output_dir / CHECKSUM_FILE)
+
+    def destination(self, key: str) -> Path:
+        return self.output_dir / Path(key).name
+
+    def download_all(self, files: List[Tuple[str, Optional[int]]]) -> Dict[str, int]:
+        """Downloads every (key, size) pair. The size is fetched with a HEAD request if unknown.
+
+        Returns
+        -------
+        Dict[str, int]
+            number of files per final status
+        """
+        pending = [(key, size) for key, size in files if not self._is_done(key, size)]
+        logger.info(f"{len(files) - len(pending)} files already downloaded, {len(pending)} to go.")
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                futures = [pool.submit(self.download_file, key, size) for key, size in pending]
+                for future in tqdm(as_completed(futures), total=len(futures), desc="File download"):
+                    future.result()
+        finally:
+            self.checksums.save()
+
+        summary = {status: self.status.count(status) for status in ["done", "failed", "missing"]}
+        logger.info(f"Download summary: {summary}")
+        return summary
+
+    def _is_done(self, key: str, size: Optional[int]) -> bool:
+        record = self.status.get(key)
+        dst = self.destination(key)
+        if record.get("status") == "done" and dst.exists():
+            return True
+        # Files fetched before the status file existed
+        if size is not None and dst.exists() and dst.stat().st_size == size:
+            self.status.update(key, status="done", size=size)
+            return True
+        return False
+
+    def download_file(self, key: str, size: Optional[int] = None) -> str:
+        """Downloads one object, resuming from its `.part` file if there is one.
+
+        Returns
+        -------
+        str
+            the final status of the key
+        """
+        dst = self.destination(key)
+        part = dst.with_name(dst.name + ".part")
+        try:
+            if size is None:
+                size = self.client.head_object(Bucket=self.bucket, Key=key, **self.extra_args)["ContentLength"]
+
+            offset = part.stat().st_size if part.exists() else 0
+            if offset > size:
+                logger.warning(f"{part} is larger than s3://{self.bucket}/{key}. Restarting.")
+                part.unlink()
+                offset = 0
+            hash_md5 = hashlib.md5()
+            if offset:
+                logger.info(f"Resuming s3://{self.bucket}/{key} at byte {offset:,d}/{size:,d}")
+                with open(part, "rb") as f:
+                    for chunk in iter(lambda: f.read(READ_BUFFER_SIZE), b""):
+                        hash_md5.update(chunk)
+
+            with open(part, "ab") as f:
+                while offset < size:
+                    end = min(offset + self.chunk_size, size) - 1
+                    response = self.client.get_object(
+                        Bucket=self.bucket, Key=key, Range=f"bytes={offset}-{end}", **self.extra_args
+                    )
+                    for data in response["Body"].iter_chunks(READ_SIZE):
+                        f.write(data)
+                        hash_md5.update(data)
+                        offset += len(data)
+            os.replace(part, dst)
+            md5sum = hash_md5.hexdigest()
+            self.checksums.put(dst, md5sum)
+
+        except ClientError as e:
+            code = e.response["Error"]["Code"]
+            if code in ("404", "NoSuchKey"):
+                logger.error(f"{key} does not exist in {self.bucket} bucket")
+                part.unlink(missing_ok=True)
+                self.status.update(key, status="missing", size=size)
+                return "missing"
+            logger.error(f"Download of {key} failed: {e}")
+            self.status.update(key, status="failed", size=size, error=str(e))
+            return "failed"
+        except (BotoCoreError, OSError) as e:
+            logger.error(f"Download of {key} failed: {e}")
+            self.status.update(key, status="failed", size=size, error=str(e))
+            return "failed"
+
+        self.status.update(key, status="done", size=size, md5=md5sum)
+        return "done"
@@ -0,0 +1,157 @@
+"""Versioned migrations of the database schema.
+
+New databases get the whole schema from the models of `db_models.py`. Databases
+created by older versions only get their missing tables from `create_all`: the
+migrations below bring their existing tables up to date. Each one runs in its own
+transaction, and its version is recorded in `schema_version` so that it only runs once.
+"""
+
+import datetime as dt
+import logging
+from typing import Callable, List, NamedTuple
+
+import coloredlogs
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from . import Base
+from .author_cache import get_author_cache
+from .db_models import Authors, Papers, SchemaVersion
+
+log_fmt = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+logging.basicConfig(level=logging.INFO, format=log_fmt)
+logger = logging.getLogger(__name__)
+coloredlogs.install()
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+def create_indexes(connection: Connection, *names: str) -> None:
+    """Creates the indexes of the models named `names` that don't exist yet"""
+    for table in [Papers.__table__, Authors.__table__]:
+        for index in table.indexes:
+            if index.name in names:
+                index.create(connection, checkfirst=True)
+
+
+def merge_duplicate_authors(connection: Connection) -> int:
+    """Keeps the first of the authors sharing a name, moving the links of the others to it"""
+    connection.execute(
+        text(
+            "CREATE TEMPORARY TABLE author_merge AS "
+            "SELECT authors.id AS dup_id, keep.keep_id AS keep_id FROM authors JOIN ("
+            "  SELECT firstname, lastname, MIN(id) AS keep_id FROM authors"
+            "  GROUP BY firstname, lastname HAVING COUNT(*) > 1"
+            ") keep ON authors.firstname = keep.firstname AND authors.lastname = keep.lastname "
+            "WHERE authors.id <> keep.keep_id"
+        )
+    )
+    n_merged = connection.execute(text("SELECT COUNT(*) FROM author_merge")).scalar()
+    connection.execute(
+        text(
+            "INSERT INTO paper_author (paper_id, author_id) "
+            "SELECT DISTINCT pa.paper_id, m.keep_id FROM paper_author pa JOIN author_merge m ON pa.author_id = m.dup_id "
+            "WHERE NOT EXISTS ("
+            "  SELECT 1 FROM paper_author x WHERE x.paper_id = pa.paper_id AND x.author_id = m.keep_id"
+            ")"
+        )
+    )
+    connection.execute(text("DELETE FROM paper_author WHERE author_id IN (SELECT dup_id FROM author_merge)"))
+    connection.execute(text("DELETE FROM authors WHERE id IN (SELECT dup_id FROM author_merge)"))
+    connection.execute(text("DROP TABLE author_merge"))
+    return n_merged
+
+
+def merge_duplicate_papers(connection: Connection) -> int:
+    """Keeps the first of the papers sharing a hash within a dataset, moving the links of the others to it"""
+    connection.execute(
+        text(
+            "CREATE TEMPORARY TABLE paper_merge AS "
+            "SELECT papers.id AS dup_id, keep.keep_id AS keep_id FROM papers JOIN ("
+            "  SELECT hash, dataset, MIN(id) AS keep_id FROM papers WHERE hash IS NOT NULL"
+            "  GROUP BY hash, dataset HAVING COUNT(*) > 1"
+            ") keep ON papers.hash = keep.hash AND papers.dataset = keep.dataset "
+            "WHERE papers.id <> keep.keep_id"
+        )
+    )
+    n_merged = connection.execute(text("SELECT COUNT(*) FROM paper_merge")).scalar()
+    connection.execute(
+        text(
+            "INSERT INTO paper_author (paper_id, author_id) "
+            "SELECT DISTINCT m.keep_id, pa.author_id FROM paper_author pa JOIN paper_merge m ON pa.paper_id = m.dup_id "
+            "WHERE NOT EXISTS ("
+            "  SELECT 1 FROM paper_author x WHERE x.paper_id = m.keep_id AND x.author_id = pa.author_id"
+            ")"
+        )
+    )
+    connection.execute(text("DELETE FROM paper_author WHERE paper_id IN (SELECT dup_id FROM paper_merge)"))
+    connection.execute(
+        text(
+            "UPDATE links SET paper = (SELECT keep_id FROM paper_merge WHERE dup_id = links.paper) "
+            "WHERE paper IN (SELECT dup_id FROM paper_merge)"
+        )
+    )
+    connection.execute(text("DELETE FROM papers WHERE id IN (SELECT dup_id FROM paper_merge)"))
+    connection.execute(text("DROP TABLE paper_merge"))
+    return n_merged
+
+
+def index_lookup_columns(connection: Connection) -> None:
+    create_indexes(connection, "ix_papers_title", "ix_papers_year", "ix_papers_dataset")
+
+
+def add_natural_keys(connection: Connection) -> None:
+    n_authors = merge_duplicate_authors(connection)
+    n_papers = merge_duplicate_papers(connection)
+    if n_authors or n_papers:
+        logger.warning(f"Merged {n_authors:,d} duplicate authors and {n_papers:,d} duplicate papers.")
+    create_indexes(connection, "uq_papers_hash_dataset", "uq_authors_name")
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Index the title, year and dataset of the papers", index_lookup_columns),
+    Migration(2, "Unique (hash, dataset) of the papers and (lastname, firstname) of the authors", add_natural_keys),
+]
+
+
+def schema_version(engine: Engine) -> int:
+    """The version of the last migration applied to the database, 0 if there is none"""
+    SchemaVersion.__table__.create(engine, checkfirst=True)
+    with engine.connect() as connection:
+        return connection.execute(select(func.max(SchemaVersion.version))).scalar() or 0
+
+
+def upgrade_schema(engine: Engine) -> int:
+    """Creates the missing tables and applies the migrations the database is missing
+
+    Parameters
+    ----------
+    engine : Engine
+        An SQLalchemy engine
+
+    Returns
+    -------
+    int
+        the version of the schema
+    """
+    Base.metadata.create_all(engine)
+    version = schema_version(engine)
+    for migration in MIGRATIONS:
+        if migration.version <= version:
+            continue
+        logger.info(f"Migrating the schema to version {migration.version}: {migration.description}")
+        with engine.begin() as connection:
+            migration.upgrade(connection)
+            connection.execute(
+                insert(SchemaVersion).values(
+                    version=migration.version, description=migration.description, applied_date=dt.datetime.now()
+                )
+            )
+        version = migration.version
+        # Merged authors may still be cached with their old ids
+        get_author_cache(engine).invalidate()
+    return version
@@ -2,9 +2,10 @@
 from typing import List, Union
 import streamlit as st
 import pandas as pd
-import requests
 from pydantic import BaseModel, NoneStr
 
+from src.data.http_client import get_http_client
+
 BASE_URL = "http://api.archives-ouvertes.fr/search/"
 FMT_LIST = [
     ("JSON", "json"),
@@ -43,7 +44,7 @@ def build_url(rp: RequestParams) -> str:
 @st.cache
 def get_instances():
     url_instance = "https://api.archives-ouvertes.fr/ref/instance"
-    r = requests.get(url_instance)
+    r = get_http_client().get(url_instance, cached=True)
     if r.status_code == 200:
         res = r.json()
     else:
@@ -59,7 +60,7 @@ def get_instances():
 
 @st.cache
 def get_response_params():
-    r = requests.get("http://api.archives-ouvertes.fr/search/?q=*:*&wt=jsonl&fl=*&rows=1")
+    r = get_http_client().get("http://api.archives-ouvertes.fr/search/?q=*:*&wt=jsonl&fl=*&rows=1", cached=True)
     res = r.json()
     return list(res["response"]["docs"][0].keys())
 
@@ -132,7 +133,7 @@ def get_response_params():
 
 if st.button("Request data"):
     r_url = build_url(request_params)
-    r = requests.get(r_url)
+    r = get_http_client().get(r_url)
     if r.status_code == 200:
         st.write(r.content if request_params.format != "json" else r.json())
     else:
@@ -0,0 +1,66 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.benchmarks import FIXTURES_DIR
+from src.data import Base, arxiv
+
+QUERY_PAGE = FIXTURES_DIR / "arxiv" / "query_page.xml"
+
+
+def test_parse_arxiv_feed_parsers_agree():
+    content = QUERY_PAGE.read_bytes()
+    assert arxiv.parse_arxiv_feed(content, parser="lxml") == arxiv.parse_arxiv_feed(content, parser="bs4")
+
+
+def test_iter_arxiv_entries_fields():
+    entries = list(arxiv.iter_arxiv_entries(QUERY_PAGE.read_bytes()))
+    assert len(entries) == 5
+    assert entries[1].authors[0].affiliation == "University of Wisconsin-Madison"
+    assert entries[3].comment.startswith("To appear")
+    assert entries[4].category == "math.OC"
+    assert entries[4].journal_ref == "ICML 2020"
+    assert [author.split_name() for author in entries[2].authors] == [
+        ("Michail", "Schlesinger"),
+        ("Evgeniy", "Vodolazskiy"),
+    ]
+
+
+@pytest.mark.parametrize("parser", arxiv.ATOM_PARSERS)
+def test_cross_listed_entry_keeps_its_first_category(parser):
+    # The category stored is the first `<category>` term, not `arxiv:primary_category`
+    content = QUERY_PAGE.read_bytes().replace(
+        b'<arxiv:primary_category xmlns:arxiv="http://arxiv.org/schemas/atom" term="math.OC"',
+        b'<arxiv:primary_category xmlns:arxiv="http://arxiv.org/schemas/atom" term="cs.LG"',
+    )
+    assert arxiv.parse_arxiv_feed(content, parser=parser)[4].category == "math.OC"
+
+
+def test_parse_arxiv_feed_falls_back_to_bs4():
+    truncated = QUERY_PAGE.read_bytes()[:-200]
+    assert len(arxiv.parse_arxiv_feed(truncated)) >= 4
+
+
+@pytest.mark.parametrize("parser", arxiv.ATOM_PARSERS)
+@pytest.mark.parametrize("content", [b"not xml <", b"<html><body><h1>Service unavailable</h1></body></html>", b""])
+def test_parse_arxiv_feed_rejects_other_documents(parser, content):
+    with pytest.raises(arxiv.ArxivFeedError):
+        arxiv.parse_arxiv_feed(content, parser=parser)
+
+
+def test_save_arxiv_entries_skips_known_titles(tmp_path):
+    engine = create_engine(f"sqlite:///{(tmp_path / 'dataset.db').as_posix()}")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(engine)()
+    entries = arxiv.parse_arxiv_feed(QUERY_PAGE.read_bytes())
+
+    assert arxiv.save_arxiv_entries(entries[:3], session) == 3
+    session.commit()
+    assert arxiv.save_arxiv_entries(entries, session) == 2
+    session.commit()
+
+    assert engine.execute("SELECT COUNT(*) FROM papers").scalar() == 5
+    assert engine.execute("SELECT COUNT(*) FROM authors").scalar() == 10
+    assert engine.execute("SELECT COUNT(*) FROM paper_author").scalar() == 10
+    assert engine.execute("SELECT COUNT(*) FROM links").scalar() == 11
+    session.close()
@@ -0,0 +1,65 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.data import Base
+from src.data.author_cache import AuthorCache
+
+
+def make_session(tmp_path):
+    engine = create_engine(f"sqlite:///{(tmp_path / 'dataset.db').as_posix()}")
+    Base.metadata.create_all(engine)
+    return engine, sessionmaker(engine)()
+
+
+def test_resolve_many_inserts_once(tmp_path):
+    engine, session = make_session(tmp_path)
+    cache = AuthorCache()
+    ids = cache.resolve_many(session, {("Ada", "Lovelace"): None, ("Alan", "Turing"): "Manchester"})
+    again = cache.resolve_many(session, {("Alan", "Turing"): None})
+    session.commit()
+
+    assert again[("Alan", "Turing")] == ids[("Alan", "Turing")]
+    assert engine.execute("SELECT COUNT(*) FROM authors").scalar() == 2
+    # One probe of the misses, one to fetch the inserted ids. The hit needs no lookup.
+    assert cache.stats()["db_lookups"] == 2
+    assert cache.stats()["hits"] == 1
+
+
+def test_lru_eviction_falls_back_to_database(tmp_path):
+    engine, session = make_session(tmp_path)
+    cache = AuthorCache(maxsize=2)
+    first = cache.resolve(session, "Ada", "Lovelace")
+    cache.resolve(session, "Alan", "Turing")
+    cache.resolve(session, "Grace", "Hopper")
+    session.commit()
+
+    assert len(cache) == 2
+    assert cache.resolve(session, "Ada", "Lovelace") == first
+    assert cache.stats()["db_lookups"] >= 1
+    assert engine.execute("SELECT COUNT(*) FROM authors").scalar() == 3
+
+
+def test_warm_from_table(tmp_path):
+    _, session = make_session(tmp_path)
+    AuthorCache().resolve_many(session, {("Ada", "Lovelace"): None, ("Alan", "Turing"): None})
+    session.commit()
+
+    cache = AuthorCache()
+    cache.warm(session)
+    assert len(cache) == 2
+    assert cache.get(("Ada", "Lovelace")) is not None
+
+
+def test_resolve_many_finds_authors_added_by_other_writers(tmp_path):
+    engine, session = make_session(tmp_path)
+    cache = AuthorCache()
+    cache.warm(session)
+    assert len(cache) == 0
+    # Another process adds an author after the cache was warmed
+    engine.execute("INSERT INTO authors (id, firstname, lastname) VALUES (42, 'Grace', 'Hopper')")
+
+    ids = cache.resolve_many(session, {("Grace", "Hopper"): None, ("Ada", "Lovelace"): None})
+    session.commit()
+
+    assert ids[("Grace", "Hopper")] == 42
+    assert engine.execute("SELECT COUNT(*) FROM authors").scalar() == 2
@@ -0,0 +1,43 @@
+import threading
+
+import pytest
+
+from src.data.dbutils import ENGINE_PROFILES, create_sql_engine
+
+PRAGMAS = ["journal_mode", "synchronous", "mmap_size", "cache_size", "temp_store"]
+SYNCHRONOUS = {"OFF": 0, "NORMAL": 1, "FULL": 2}
+TEMP_STORE = {"DEFAULT": 0, "FILE": 1, "MEMORY": 2}
+
+
+@pytest.mark.parametrize("profile", list(ENGINE_PROFILES))
+def test_sqlite_profiles_set_the_pragmas(tmp_path, profile):
+    engine = create_sql_engine(f"sqlite:///{(tmp_path / 'dataset.db').as_posix()}", profile=profile)
+    expected = ENGINE_PROFILES[profile].sqlite_pragmas
+    with engine.connect() as connection:
+        values = {pragma: connection.exec_driver_sql(f"PRAGMA {pragma}").scalar() for pragma in PRAGMAS}
+    assert values == {
+        "journal_mode": expected["journal_mode"].lower(),
+        "synchronous": SYNCHRONOUS[expected["synchronous"]],
+        "mmap_size": expected["mmap_size"],
+        "cache_size": expected["cache_size"],
+        "temp_store": TEMP_STORE[expected["temp_store"]],
+    }
+    assert not engine.echo
+
+    # The pooled connections are shared with the writer threads
+    results = []
+    thread = threading.Thread(target=lambda: results.append(engine.execute("SELECT 1").scalar()))
+    thread.start()
+    thread.join()
+    assert results == [1]
+
+
+def test_memory_database_keeps_its_connection():
+    engine = create_sql_engine("sqlite://", profile="bulk-load")
+    engine.execute("CREATE TABLE t (x INTEGER)")
+    assert engine.execute("SELECT COUNT(*) FROM t").scalar() == 0
+
+
+def test_unknown_profile():
+    with pytest.raises(ValueError):
+        create_sql_engine("sqlite://", profile="fast")
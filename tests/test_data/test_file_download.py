@@ -0,0 +1,99 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.data.file_download import FileDownloader
+from src.data.http_client import HttpClient
+
+PAYLOAD = bytes(range(256)) * 4096
+
+
+@pytest.fixture
+def file_server():
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests_seen.append((self.path, self.headers.get("Range")))
+            if self.path != "/paper.pdf":
+                self.send_error(404)
+                return
+            start = int(self.headers["Range"][len("bytes=") : -1]) if self.headers.get("Range") else 0
+            if start >= len(PAYLOAD):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(PAYLOAD)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206 if start else 200)
+            self.send_header("Content-Length", str(len(PAYLOAD) - start))
+            self.end_headers()
+            self.wfile.write(PAYLOAD[start:])
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/", requests_seen
+    server.shutdown()
+    server.server_close()
+
+
+def test_download_all_resumes_and_skips(tmp_path, file_server):
+    base_url, requests_seen = file_server
+    (tmp_path / "existing.pdf").write_bytes(b"done")
+    (tmp_path / "resumed.pdf.part").write_bytes(PAYLOAD[:1000])
+    (tmp_path / "complete.pdf.part").write_bytes(PAYLOAD)
+    files = [
+        (f"{base_url}paper.pdf", tmp_path / "existing.pdf"),
+        (f"{base_url}paper.pdf", tmp_path / "resumed.pdf"),
+        (f"{base_url}paper.pdf", tmp_path / "complete.pdf"),
+        (f"{base_url}paper.pdf", tmp_path / "new.pdf"),
+        (f"{base_url}missing.pdf", tmp_path / "missing.pdf"),
+    ]
+    summary = FileDownloader(workers=3, client=HttpClient()).download_all(files)
+
+    assert summary == {"skipped": 1, "done": 3, "missing": 1, "failed": 0}
+    assert len(requests_seen) == 4
+    assert ("/paper.pdf", "bytes=1000-") in requests_seen
+    for name in ["resumed.pdf", "complete.pdf", "new.pdf"]:
+        assert (tmp_path / name).read_bytes() == PAYLOAD
+    assert (tmp_path / "existing.pdf").read_bytes() == b"done"
+    assert not list(tmp_path.glob("*.part"))
+
+
+class TruncatedResponse:
+    """A response whose stream ends cleanly halfway through the announced body"""
+
+    status_code = 200
+    headers = {"Content-Length": str(len(PAYLOAD))}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def iter_content(self, chunk_size):
+        yield PAYLOAD[: len(PAYLOAD) // 2]
+
+
+class TruncatingClient:
+    def get(self, url, stream=False, headers=None):
+        return TruncatedResponse()
+
+
+def test_download_file_keeps_truncated_part(tmp_path, file_server):
+    base_url, requests_seen = file_server
+    dst = tmp_path / "paper.pdf"
+
+    assert FileDownloader(client=TruncatingClient()).download_file(f"{base_url}paper.pdf", dst) == "failed"
+    assert not dst.exists()
+    assert (tmp_path / "paper.pdf.part").stat().st_size == len(PAYLOAD) // 2
+
+    # The next attempt resumes from the part file
+    assert FileDownloader(client=HttpClient()).download_file(f"{base_url}paper.pdf", dst) == "done"
+    assert requests_seen == [("/paper.pdf", f"bytes={len(PAYLOAD) // 2}-")]
+    assert dst.read_bytes() == PAYLOAD
@@ -0,0 +1,143 @@
+import asyncio
+import re
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.benchmarks import FIXTURES_DIR, arxiv_fixture_server
+from src.data import Base, harvester
+from src.data.arxiv import compose_arxiv_query, parse_arxiv_feed, save_arxiv_page
+from src.data.harvest_jobs import JOB_DONE, JOB_INCOMPLETE, JOB_RUNNING, PageTracker, open_harvest_job
+from src.data.harvester import TokenBucketLimiter, harvest_arxiv_query
+
+
+def test_token_bucket_spacing():
+    limiter = TokenBucketLimiter(rate=20, capacity=1)
+
+    async def acquire_all():
+        for _ in range(5):
+            await limiter.acquire()
+
+    t1 = time.monotonic()
+    asyncio.run(acquire_all())
+    # The first token is available at once, the 4 others every 50ms
+    assert time.monotonic() - t1 >= 0.19
+
+
+def test_harvest_arxiv_query_fixture_server(tmp_path):
+    engine = create_engine(f"sqlite:///{(tmp_path / 'dataset.db').as_posix()}")
+    Base.metadata.create_all(engine)
+    with arxiv_fixture_server(FIXTURES_DIR / "arxiv" / "query_page.xml") as base_url:
+        stats = harvest_arxiv_query(
+            "machine learning",
+            engine,
+            max_results=15,
+            frac_requests=1 / 3,
+            limiter=TokenBucketLimiter(rate=100),
+            base_url=base_url,
+        )
+    assert stats.pages == 3
+    assert stats.entries == 15
+    assert engine.execute("SELECT COUNT(*) FROM papers").scalar() == 15
+
+
+def test_harvest_resumes_from_checkpoint(tmp_path):
+    engine = create_engine(f"sqlite:///{(tmp_path / 'dataset.db').as_posix()}")
+    Base.metadata.create_all(engine)
+    job = open_harvest_job(engine, "machine learning", max_results=15, page_size=5)
+    # A previous run committed the first page only
+    session = sessionmaker(engine)()
+    entries = parse_arxiv_feed((FIXTURES_DIR / "arxiv" / "query_page.xml").read_bytes())
+    assert save_arxiv_page(entries, session, checkpoint=(job.id, 5)) == 5
+    session.close()
+
+    with arxiv_fixture_server(FIXTURES_DIR / "arxiv" / "query_page.xml") as base_url:
+        stats = harvest_arxiv_query(
+            "machine learning",
+            engine,
+            max_results=15,
+            frac_requests=1 / 3,
+            limiter=TokenBucketLimiter(rate=100),
+            base_url=base_url,
+        )
+    assert stats.pages == 2
+    assert engine.execute("SELECT next_offset, status FROM harvest_jobs").fetchall() == [(15, JOB_DONE)]
+
+
+def test_page_tracker_waits_for_failed_pages():
+    tracker = PageTracker(1, [0, 5, 10, 15], end=20)
+    assert tracker.checkpoint(0) == (1, 5)
+    tracker.mark_saved(0)
+    # The page at 5 failed: saving later pages doesn't move the job past it
+    assert tracker.checkpoint(10) == (1, 5)
+    tracker.mark_saved(10)
+    assert tracker.checkpoint(5) == (1, 15)
+
+
+def test_harvest_stops_when_a_stage_fails(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{(tmp_path / 'dataset.db').as_posix()}")
+    Base.metadata.create_all(engine)
+
+    def broken_parser(content, parser):
+        raise RuntimeError("parser crashed")
+
+    monkeypatch.setattr(harvester, "parse_arxiv_feed", broken_parser)
+    with arxiv_fixture_server(FIXTURES_DIR / "arxiv" / "query_page.xml") as base_url:
+        # More pages than the queues hold: the fetchers would block forever on a dead parser
+        with pytest.raises(RuntimeError, match="parser crashed"):
+            harvest_arxiv_query(
+                "machine learning",
+                engine,
+                max_results=50,
+                frac_requests=1 / 10,
+                limiter=TokenBucketLimiter(rate=100),
+                base_url=base_url,
+            )
+    assert engine.execute("SELECT next_offset, status FROM harvest_jobs").fetchall() == [(0, JOB_RUNNING)]
+
+
+def test_harvest_skips_pages_that_arent_feeds(tmp_path):
+    engine = create_engine(f"sqlite:///{(tmp_path / 'dataset.db').as_posix()}")
+    Base.metadata.create_all(engine)
+    (tmp_path / "error.html").write_text("not xml <")
+    with arxiv_fixture_server(tmp_path / "error.html") as base_url:
+        stats = harvest_arxiv_query(
+            "machine learning",
+            engine,
+            max_results=15,
+            frac_requests=1 / 3,
+            limiter=TokenBucketLimiter(rate=100),
+            base_url=base_url,
+        )
+    assert stats.pages == 0 and stats.failed_pages == 3
+    assert engine.execute("SELECT next_offset, status FROM harvest_jobs").fetchall() == [(0, JOB_INCOMPLETE)]
+
+
+@pytest.mark.parametrize("sequential", [False, True])
+@pytest.mark.parametrize("total_results, next_offset, status", [(15, 0, JOB_INCOMPLETE), (0, 15, JOB_DONE)])
+def test_harvest_retries_empty_pages_before_the_total(tmp_path, total_results, next_offset, status, sequential):
+    engine = create_engine(f"sqlite:///{(tmp_path / 'dataset.db').as_posix()}")
+    Base.metadata.create_all(engine)
+    page = (FIXTURES_DIR / "arxiv" / "query_page.xml").read_text()
+    page = re.sub(r"<entry>.*</entry>", "", page, flags=re.S)
+    page = re.sub(r">\d+</opensearch:totalResults>", f">{total_results}</opensearch:totalResults>", page)
+    (tmp_path / "empty_page.xml").write_text(page)
+    with arxiv_fixture_server(tmp_path / "empty_page.xml") as base_url:
+        if sequential:
+            compose_arxiv_query(
+                "machine learning", engine, max_results=15, frac_requests=1 / 3, pause_time=0, base_url=base_url
+            )
+        else:
+            stats = harvest_arxiv_query(
+                "machine learning",
+                engine,
+                max_results=15,
+                frac_requests=1 / 3,
+                limiter=TokenBucketLimiter(rate=100),
+                base_url=base_url,
+            )
+            assert stats.entries == 0
+    assert engine.execute("SELECT COUNT(*) FROM papers").scalar() == 0
+    assert engine.execute("SELECT next_offset, status FROM harvest_jobs").fetchall() == [(next_offset, status)]
@@ -0,0 +1,37 @@
+import pytest
+
+from src.benchmarks import FIXTURES_DIR
+from src.data.html_extract import available_parsers, column_links, heading_sections, papers_table_cells
+from src.data.neurips import parse_abstract_page
+
+ABSTRACT_PAGE = (FIXTURES_DIR / "neurips" / "abstract_page.html").read_bytes()
+PROCEEDINGS_PAGE = (FIXTURES_DIR / "neurips" / "proceedings_page.html").read_bytes()
+PAPERS_PAGE = (FIXTURES_DIR / "ml4physics" / "papers_page.html").read_bytes()
+
+
+@pytest.mark.parametrize("parser", available_parsers())
+@pytest.mark.parametrize(
+    "extract, page",
+    [(heading_sections, ABSTRACT_PAGE), (column_links, PROCEEDINGS_PAGE), (papers_table_cells, PAPERS_PAGE)],
+)
+def test_parsers_agree_with_bs4(parser, extract, page):
+    assert extract(page, parser=parser) == extract(page, parser="bs4")
+
+
+@pytest.mark.parametrize("parser", available_parsers())
+def test_parse_abstract_page(parser):
+    paper = parse_abstract_page(ABSTRACT_PAGE, parser=parser)
+    assert paper.title == "Language Models are Few-Shot Learners"
+    assert paper.authors.split(", ")[-1] == "Dario Amodei"
+    assert paper.abstract.endswith("naïve n-gram overlap <13> and “contamination”.")
+
+
+@pytest.mark.parametrize("parser", available_parsers())
+def test_nested_paragraphs(parser):
+    page = b'<div class="col"><h4>Abstract</h4><p><p>Nested</p></p><h4>No paragraph</h4><div>x</div></div>'
+    assert heading_sections(page, parser=parser) == [("Abstract", "Nested")]
+
+
+def test_unknown_parser():
+    with pytest.raises(ValueError):
+        column_links(PROCEEDINGS_PAGE, parser="regex")
@@ -0,0 +1,113 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.data.http_cache import HttpCache
+from src.data.http_client import HttpClient
+
+PAGES = {"/a": b"<html>a</html>" * 100, "/b": b"<html>b</html>" * 100}
+
+
+@pytest.fixture
+def etag_server():
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            etag = f'"{self.path}-v1"'
+            requests_seen.append((self.path, self.headers.get("If-None-Match")))
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(PAGES[self.path])))
+            self.end_headers()
+            self.wfile.write(PAGES[self.path])
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", requests_seen
+    server.shutdown()
+    server.server_close()
+
+
+def test_revalidation_and_offline(tmp_path, etag_server):
+    base_url, requests_seen = etag_server
+    client = HttpClient(cache=HttpCache(tmp_path))
+    assert client.get(f"{base_url}/a", cached=True).content == PAGES["/a"]
+    r = client.get(f"{base_url}/a", cached=True)
+    assert r.status_code == 200
+    assert r.text == PAGES["/a"].decode()
+    assert requests_seen == [("/a", None), ("/a", '"/a-v1"')]
+    assert client.cache.stats.revalidated == 1
+    client.close()
+
+    # The index is reloaded, and nothing is requested offline
+    offline_client = HttpClient(cache=HttpCache(tmp_path, offline=True))
+    assert offline_client.get(f"{base_url}/a", cached=True).content == PAGES["/a"]
+    assert len(requests_seen) == 2
+    assert offline_client.cache.stats.hits == 1
+
+
+def test_lru_eviction(tmp_path, etag_server):
+    base_url, _ = etag_server
+    cache = HttpCache(tmp_path, max_bytes=len(PAGES["/a"]) + 10)
+    client = HttpClient(cache=cache)
+    client.get(f"{base_url}/a", cached=True)
+    client.get(f"{base_url}/b", cached=True)
+    assert cache.lookup(f"{base_url}/a") is None
+    assert cache.lookup(f"{base_url}/b") is not None
+    assert cache.total_bytes == len(PAGES["/b"])
+    assert cache.stats.evictions == 1
+
+
+def test_entry_evicted_before_the_304_is_refetched(tmp_path, etag_server):
+    base_url, requests_seen = etag_server
+    cache = HttpCache(tmp_path)
+    client = HttpClient(cache=cache)
+    client.get(f"{base_url}/a", cached=True)
+
+    # Another thread evicts the entry between the lookup and the revalidation
+    lookup = cache.lookup
+
+    def lookup_then_evict(url):
+        entry = lookup(url)
+        cache.body_path(cache.key(url)).unlink()
+        return entry
+
+    cache.lookup = lookup_then_evict
+    r = client.get(f"{base_url}/a", cached=True)
+    assert r.status_code == 200
+    assert r.content == PAGES["/a"]
+    assert requests_seen == [("/a", None), ("/a", '"/a-v1"'), ("/a", None)]
+    assert cache.response(f"{base_url}/b") is None
+
+
+def test_concurrent_stores_and_evictions(tmp_path, etag_server):
+    base_url, _ = etag_server
+    cache = HttpCache(tmp_path, max_bytes=len(PAGES["/a"]) + 10)
+    client = HttpClient(cache=cache)
+    errors = []
+
+    def crawl():
+        try:
+            for i in range(20):
+                path = "/a" if i % 2 else "/b"
+                assert client.get(f"{base_url}{path}", cached=True).content == PAGES[path]
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=crawl) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert not list(tmp_path.rglob("*.tmp"))
@@ -0,0 +1,23 @@
+from src.benchmarks import FIXTURES_DIR, arxiv_fixture_server
+from src.data.http_client import HttpClient
+
+
+def test_per_host_pools():
+    client = HttpClient(pool_sizes={"papers.nips.cc": 16}, default_pool_size=4)
+    assert client.session.get_adapter("https://papers.nips.cc/paper/2020")._pool_maxsize == 16
+    assert client.session.get_adapter("https://export.arxiv.org/api/query")._pool_maxsize == 4
+
+
+def test_host_stats():
+    client = HttpClient()
+    with arxiv_fixture_server(FIXTURES_DIR / "arxiv" / "query_page.xml") as base_url:
+        for start in range(3):
+            r = client.get(f"{base_url}query?start={start}")
+            assert r.status_code == 200
+    ((host, stats),) = client.host_stats.items()
+    assert host.startswith("127.0.0.1:")
+    assert stats.requests == 3
+    assert stats.errors == 0
+    assert stats.bytes == 3 * len(r.content)
+    assert stats.mean_latency > 0
+    client.close()
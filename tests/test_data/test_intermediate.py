@@ -0,0 +1,68 @@
+import json
+
+from sqlalchemy import create_engine
+
+from src.benchmarks import synthetic_neurips_corpus
+from src.data.author_cache import get_author_cache
+from src.data.intermediate import metadata_to_sql_db
+
+
+def test_metadata_to_sql_db_batches(tmp_path):
+    json_folder = tmp_path / "json"
+    synthetic_neurips_corpus(json_folder, 25, n_authors=10)
+    (json_folder / "2020_error.json").write_text(json.dumps({"error": "Not found", "url": "..."}))
+    # A document without title makes its whole batch fall back to one transaction per paper
+    (json_folder / "2020_broken.json").write_text(json.dumps({"authors": []}))
+    engine = create_engine(f"sqlite:///{(tmp_path / 'dataset.db').as_posix()}")
+    get_author_cache(engine).invalidate()
+
+    metadata_to_sql_db(json_folder, engine, options="create", batch_size=4)
+
+    assert engine.execute("SELECT COUNT(*) FROM papers").scalar() == 25
+    # 10 first names for each of the 3 positions
+    assert engine.execute("SELECT COUNT(*) FROM authors").scalar() == 30
+    assert engine.execute("SELECT COUNT(*) FROM paper_author").scalar() == 75
+    assert (
+        engine.execute(
+            "SELECT COUNT(*) FROM paper_author JOIN papers ON papers.id = paper_author.paper_id "
+            "JOIN authors ON authors.id = paper_author.author_id "
+            "WHERE papers.title = 'Synthetic paper #13' AND authors.firstname = 'Author1' AND authors.lastname = 'Name0'"
+        ).scalar()
+        == 1
+    )
+
+
+def test_metadata_to_sql_db_parallel_decoding(tmp_path):
+    json_folder = tmp_path / "json"
+    synthetic_neurips_corpus(json_folder, 30, n_authors=10)
+    query = "SELECT hash, title, full_text, COUNT(author_id) FROM papers JOIN paper_author ON id = paper_id GROUP BY id"
+    rows = {}
+    for workers in [0, 2]:
+        engine = create_engine(f"sqlite:///{(tmp_path / f'{workers}.db').as_posix()}")
+        get_author_cache(engine).invalidate()
+        metadata_to_sql_db(json_folder, engine, options="create", batch_size=7, workers=workers)
+        rows[workers] = sorted(engine.execute(query).fetchall())
+    assert len(rows[0]) == 30
+    assert rows[0] == rows[2]
+
+
+def test_metadata_to_sql_db_replace(tmp_path):
+    json_folder = tmp_path / "json"
+    paths = synthetic_neurips_corpus(json_folder, 20, n_authors=10)
+    engine = create_engine(f"sqlite:///{(tmp_path / 'dataset.db').as_posix()}")
+    get_author_cache(engine).invalidate()
+    metadata_to_sql_db(json_folder, engine, options="create")
+
+    for path in paths[:15]:
+        metadata = json.loads(path.read_text())
+        metadata["title"] = metadata["title"].replace("Synthetic", "Replaced")
+        path.write_text(json.dumps(metadata))
+    paths[15].write_text(json.dumps({"error": "Not found", "url": "..."}))
+    metadata_to_sql_db(json_folder, engine, options="replace", batch_size=6)
+
+    assert engine.execute("SELECT COUNT(*) FROM papers").scalar() == 20
+    assert engine.execute("SELECT COUNT(*) FROM papers WHERE title LIKE 'Replaced%'").scalar() == 15
+    # The error record leaves the content of its paper untouched
+    hash = paths[15].stem.split("_")[1]
+    assert engine.execute(f"SELECT title FROM papers WHERE hash = '{hash}'").scalar() == "Synthetic paper #15"
+    assert engine.execute("SELECT COUNT(*) FROM paper_author").scalar() == 60
@@ -0,0 +1,28 @@
+import shutil
+
+from src.benchmarks import FIXTURES_DIR
+from src.data.manifest import index_path, load_manifest
+
+MANIFEST = FIXTURES_DIR / "arxiv" / "arXiv_src_manifest.xml"
+
+
+def test_load_manifest(tmp_path):
+    manifest_xml = tmp_path / MANIFEST.name
+    shutil.copy(MANIFEST, manifest_xml)
+    manifest = load_manifest(manifest_xml)
+
+    assert manifest.timestamp == "Sat Nov 27 03:20:26 2021"
+    assert [file.filename for file in manifest.files][0] == "src/arXiv_src_0001_001.tar"
+    assert manifest.files[0].md5sum == "949ae880fbaf4649a02a5f0b3e2f9e7d"
+    assert manifest.total_size == 225605507 + 227036528 + 1208320
+    assert index_path(manifest_xml).exists()
+    assert load_manifest(manifest_xml) == manifest
+
+
+def test_filter_by_yymm(tmp_path):
+    manifest_xml = tmp_path / MANIFEST.name
+    shutil.copy(MANIFEST, manifest_xml)
+    manifest = load_manifest(manifest_xml)
+
+    assert [file.yymm for file in manifest.filter(until="0001").files] == ["0001", "9108"]
+    assert [file.yymm for file in manifest.filter(since="0002").files] == ["0002"]
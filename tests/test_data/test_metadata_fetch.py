@@ -0,0 +1,98 @@
+import json
+import threading
+import time
+
+import mongomock
+import pandas as pd
+import pytest
+
+from src.data import neurips
+from src.data.metadata_sinks import JsonFolderSink, MongoSink
+
+YEAR_HASH = pd.DataFrame({"year": [2019] * 6 + [2020] * 6, "hash": [f"{i:032x}" for i in range(12)]})
+
+
+def fake_get_metadata(hash, year):
+    time.sleep(0.01)
+    if hash.endswith("3"):
+        raise Exception("Code 404: page not found or too many requests")
+    if hash.endswith("5"):
+        return {"error": "Expecting value", "url": f"{year}/{hash}"}
+    return {"title": f"Paper {hash}", "full_text": "..."}
+
+
+def test_fetch_neurips_metadata_json_folder(tmp_path, monkeypatch):
+    in_flight, max_in_flight = [0], [0]
+    lock = threading.Lock()
+
+    def counting_get_metadata(hash, year):
+        with lock:
+            in_flight[0] += 1
+            max_in_flight[0] = max(max_in_flight[0], in_flight[0])
+        try:
+            return fake_get_metadata(hash, year)
+        finally:
+            with lock:
+                in_flight[0] -= 1
+
+    monkeypatch.setattr(neurips.NeuripsAPIConnector, "get_metadata", counting_get_metadata)
+    sink = JsonFolderSink(tmp_path)
+    sink.write(2019, YEAR_HASH.hash[0], {"title": "already fetched"})
+    neurips.fetch_neurips_metadata(YEAR_HASH, sink, concurrency=4)
+
+    # The existing file is kept and the failed request (hash 3) is skipped
+    assert len(list(tmp_path.iterdir())) == 11
+    assert json.loads(sink.path(2019, YEAR_HASH.hash[0]).read_text()) == {"title": "already fetched"}
+    error_record = json.loads(sink.path(2019, YEAR_HASH.hash[5]).read_text())
+    assert error_record["status"] == "Download failed"
+    assert 1 < max_in_flight[0] <= 4
+
+
+def test_fetch_neurips_metadata_mongo(monkeypatch):
+    monkeypatch.setattr(neurips.NeuripsAPIConnector, "get_metadata", fake_get_metadata)
+    collection = mongomock.MongoClient()["neurips"]["neurips_metadata"]
+    sink = MongoSink(collection)
+    neurips.fetch_neurips_metadata(YEAR_HASH, sink, concurrency=4)
+    sink.close()
+    assert collection.count_documents({}) == 11
+    assert collection.find_one({"_id": YEAR_HASH.hash[5]})["year"] == 2019
+
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+def test_fetch_neurips_metadata_raises_sink_errors(tmp_path, monkeypatch, concurrency):
+    monkeypatch.setattr(neurips.NeuripsAPIConnector, "get_metadata", fake_get_metadata)
+
+    class FullDiskSink(JsonFolderSink):
+        def write(self, year, hash, doc):
+            if hash.endswith("7"):
+                raise OSError("No space left on device")
+            super().write(year, hash, doc)
+
+    with pytest.raises(OSError, match="No space left"):
+        neurips.fetch_neurips_metadata(YEAR_HASH, FullDiskSink(tmp_path), concurrency=concurrency)
+
+
+def test_sinks_missing_pairs(tmp_path):
+    pairs = list(zip(YEAR_HASH.year.tolist(), YEAR_HASH.hash.tolist()))
+    json_sink = JsonFolderSink(tmp_path)
+    mongo_sink = MongoSink(mongomock.MongoClient()["neurips"]["neurips_metadata"])
+    for sink in [json_sink, mongo_sink]:
+        for year, hash in pairs[::3]:
+            sink.write(year, hash, {"title": hash})
+        sink.close()
+        assert sink.missing(pairs) == [pair for i, pair in enumerate(pairs) if i % 3]
+
+
+def test_mongo_sink_batches_and_duplicates():
+    collection = mongomock.MongoClient()["neurips"]["neurips_metadata"]
+    collection.insert_one({"_id": YEAR_HASH.hash[2]})
+    sink = MongoSink(collection, batch_size=5)
+    for year, hash in zip(YEAR_HASH.year.tolist(), YEAR_HASH.hash.tolist()):
+        sink.write(year, hash, {"title": hash})
+    assert collection.count_documents({}) == 1 + 10 - 1
+    sink.close()
+
+    assert collection.count_documents({}) == 12
+    assert sink.stats.batches == 3
+    assert sink.stats.inserted == 11
+    assert sink.stats.duplicates == 1
@@ -0,0 +1,93 @@
+import gzip
+import json
+
+from src.data.metadata_store import (
+    INDEX_FILE,
+    MetadataStore,
+    iter_metadata,
+    iter_metadata_parallel,
+    migrate_json_folder,
+    normalize_metadata,
+)
+
+DOCS = {f"{i:032x}": {"title": f"Paper {i}", "full_text": "lorem ipsum " * 200} for i in range(20)}
+
+
+def fill(store):
+    for i, (hash, doc) in enumerate(DOCS.items()):
+        store.append(2000 + i % 3, hash, doc)
+
+
+def test_store_append_get_scan(tmp_path):
+    store = MetadataStore(tmp_path, max_shard_bytes=1000)
+    fill(store)
+    assert store.get(f"{5:032x}") == DOCS[f"{5:032x}"]
+    store.close()
+
+    # Reopened from the index, with the documents spread over several shards
+    store = MetadataStore(tmp_path)
+    assert len(store) == 20
+    assert len({entry.shard for entry in store.index.values()}) > 1
+    assert [(year, hash) for year, hash, _ in store.scan()] == [(2000 + i % 3, hash) for i, hash in enumerate(DOCS)]
+    # A shard is a plain .jsonl.gz file
+    with gzip.open(store.shard_path(0), "rt") as f:
+        assert json.loads(f.readline()) == DOCS[f"{0:032x}"]
+
+
+def test_store_drops_unindexed_tail(tmp_path):
+    store = MetadataStore(tmp_path)
+    fill(store)
+    store.close()
+    # A crash between a document and its index line
+    with open(store.shard_path(0), "ab") as f:
+        f.write(gzip.compress(b'{"title": "lost"}\n'))
+    with open(tmp_path / INDEX_FILE, "a") as f:
+        f.write("cut")
+
+    store = MetadataStore(tmp_path)
+    store.append(2021, "new", {"title": "new"})
+    store.close()
+    store = MetadataStore(tmp_path)
+    assert len(store) == 21
+    assert [doc["title"] for _, _, doc in store.scan()][-1] == "new"
+
+    # An index line whose document never reached the shard, and a hash superseded by such a document
+    first_hash = f"{0:032x}"
+    shard_size = store.shard_path(0).stat().st_size
+    with open(tmp_path / INDEX_FILE, "a") as f:
+        f.write(f"lost\t2021\t0\t{shard_size}\t50\n")
+        f.write(f"{first_hash}\t2021\t0\t{shard_size + 50}\t50\n")
+
+    store = MetadataStore(tmp_path)
+    assert "lost" not in store
+    assert store.get(first_hash) == DOCS[first_hash]
+    store.append(2021, "newer", {"title": "newer"})
+    store.close()
+    store = MetadataStore(tmp_path)
+    assert len(store) == 22
+    assert "lost" not in store
+    assert {hash: doc["title"] for _, hash, doc in store.scan()}[first_hash] == DOCS[first_hash]["title"]
+    assert store.get("newer") == {"title": "newer"}
+
+
+def test_migrate_json_folder(tmp_path):
+    json_dir = tmp_path / "json"
+    json_dir.mkdir()
+    for i, (hash, doc) in enumerate(DOCS.items()):
+        (json_dir / f"{2000 + i % 3}_{hash}.json").write_text(json.dumps(doc, indent=2))
+
+    store_dir = tmp_path / "store"
+    assert migrate_json_folder(json_dir, store_dir) == 20
+    assert migrate_json_folder(json_dir, store_dir) == 0
+    assert sorted(iter_metadata(store_dir)) == sorted(iter_metadata(json_dir))
+
+
+def test_iter_metadata_parallel(tmp_path):
+    store = MetadataStore(tmp_path / "store", max_shard_bytes=1000)
+    fill(store)
+    store.append(2001, "error", {"error": "Not found", "url": "..."})
+    store.close()
+    expected = [(year, hash, normalize_metadata(doc)) for year, hash, doc in iter_metadata(tmp_path / "store")]
+    assert list(iter_metadata_parallel(tmp_path / "store", workers=2, chunk_size=3, queue_size=2)) == expected
+    assert expected[-1] == (2001, "error", {"error": "Not found"})
+    assert set(expected[0][2]) == {"title", "full_text"}
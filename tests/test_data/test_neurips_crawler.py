@@ -0,0 +1,72 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+from src.data import neurips_crawler
+from src.data.http_client import HttpClient
+from src.data.metadata_store import MetadataStore
+from src.data.neurips_crawler import NeuripsCrawler
+
+ABSTRACT_PAGE = b"""<html><body><div class="col">
+<h4>A paper</h4><p>Part of Advances in Neural Information Processing Systems</p>
+<h4>Authors</h4><p>Ada Lovelace, Alan Turing</p>
+<h4>Abstract</h4><p>We compute.</p>
+</div></body></html>"""
+
+
+@pytest.fixture
+def neurips_server(monkeypatch):
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests_seen.append(self.path)
+            kind, _, hash = self.path.strip("/").partition("/")
+            if hash == "missing":
+                self.send_error(404)
+                return
+            body = ABSTRACT_PAGE if kind == "abstract" else f"{kind} of {hash}".encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setattr(neurips_crawler, "abstract_url", lambda year, hash: f"{base_url}/abstract/{hash}")
+    monkeypatch.setattr(neurips_crawler, "bibtex_url", lambda year, hash: f"{base_url}/bibtex/{hash}")
+    monkeypatch.setattr(neurips_crawler, "pdf_url", lambda year, hash: f"{base_url}/pdf/{hash}")
+    monkeypatch.setattr(neurips_crawler, "fetch_metadata", lambda hash, year: {"hash": hash, "year": year})
+    yield requests_seen
+    server.shutdown()
+    server.server_close()
+
+
+def test_crawl_single_pass(tmp_path, neurips_server):
+    year_hash = pd.DataFrame({"year": [2019, 2020, 2020], "hash": ["h1", "h2", "missing"]})
+    (tmp_path / "pdf").mkdir()
+    (tmp_path / "pdf" / "2019_h1.pdf").write_bytes(b"already there")
+
+    stats = NeuripsCrawler(tmp_path, workers=2, client=HttpClient()).crawl(year_hash)
+
+    expected = {f"/{kind}/{hash}" for kind in ["abstract", "bibtex", "pdf"] for hash in ["h1", "h2", "missing"]}
+    assert sorted(neurips_server) == sorted(expected - {"/pdf/h1"})
+    assert stats["pdf"].skipped == 1 and stats["pdf"].fetched == 1 and stats["pdf"].failed == 1
+    assert stats["metadata"].fetched == 3
+    assert (tmp_path / "bibtex" / "2020_h2.bib").read_bytes() == b"bibtex of h2"
+    info = pd.read_csv(tmp_path / "neurips_info.csv")
+    assert sorted(info.hash) == ["h1", "h2"]
+    assert set(info.authors) == {"Ada Lovelace, Alan Turing"}
+    assert MetadataStore(tmp_path / "metadata").get("h2") == {"hash": "h2", "year": 2020}
+
+    # Only what failed is fetched again
+    neurips_server.clear()
+    stats = NeuripsCrawler(tmp_path, artifacts=["abstract", "pdf"], client=HttpClient()).crawl(year_hash)
+    assert sorted(neurips_server) == ["/abstract/missing", "/pdf/missing"]
+    assert stats["abstract"].skipped == 2
@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+
+import pandas as pd
+
+from src.data import neurips
+
+
+def test_get_neurips_hashs_incremental(tmp_path, monkeypatch):
+    scraped = []
+
+    def fake_scrape(year):
+        scraped.append(year)
+        return [f"{year}{i:028x}" for i in range(3)] if year <= 2020 else []
+
+    monkeypatch.setattr(neurips, "scrape_neurips_year", fake_scrape)
+    save_file = tmp_path / "neurips.csv"
+    df = neurips.get_neurips_hashs(save_file=save_file, workers=4)
+    assert sorted(scraped) == list(range(neurips.FIRST_YEAR, neurips.CURRENT_YEAR + 1))
+    assert df.shape[0] == 3 * (2020 - neurips.FIRST_YEAR + 1)
+
+    # Only the latest known year and the following ones are scraped again
+    scraped.clear()
+    monkeypatch.setattr(neurips, "scrape_neurips_year", lambda year: fake_scrape(year) + [f"new{year}"])
+    df = neurips.get_neurips_hashs(save_file=save_file)
+    assert sorted(scraped) == list(range(2020, neurips.CURRENT_YEAR + 1))
+    saved = pd.read_csv(save_file)
+    assert saved.shape[0] == df.shape[0] == 3 * (2020 - neurips.FIRST_YEAR + 1) + len(scraped)
+    assert saved.year.is_monotonic_increasing
+    assert saved.year.dtype == int
+
+
+def test_get_neurips_hashs_keeps_known_hashes_on_errors(tmp_path, monkeypatch):
+    save_file = tmp_path / "neurips.csv"
+    pd.DataFrame({"hash": ["a", "b", "c"], "year": [2019, 2020, 2020]}).to_csv(save_file, index=None)
+
+    class FailingClient:
+        def get(self, url, cached=False):
+            return SimpleNamespace(status_code=500, content=b"")
+
+    monkeypatch.setattr(neurips, "get_http_client", lambda: FailingClient())
+    df = neurips.get_neurips_hashs(save_file=save_file)
+    assert sorted(df.hash) == ["a", "b", "c"]
+    assert sorted(pd.read_csv(save_file).hash) == ["a", "b", "c"]
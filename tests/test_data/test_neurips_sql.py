@@ -0,0 +1,61 @@
+import pandas as pd
+from sqlalchemy import create_engine
+
+from src.data import neurips
+from src.data.author_cache import AuthorCache
+
+AUTHORS = {
+    "h1": "Ada Lovelace, Alan Turing",
+    "h2": "Alan Turing, Grace Hopper",
+    "h3": "Grace Hopper, Grace Hopper",
+    "h4": "Ada Lovelace",
+}
+
+
+def fake_scrape_abstract(year, hash):
+    if hash not in AUTHORS:
+        return None
+    return neurips.NeuripsInfoPaper(title=f"Paper {hash}", authors=AUTHORS[hash], abstract="...")
+
+
+def test_save_neurips_info_sql_batches(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{(tmp_path / 'dataset.db').as_posix()}")
+    monkeypatch.setattr(neurips, "scrape_abstract", fake_scrape_abstract)
+    monkeypatch.setattr(neurips, "get_author_cache", lambda engine: AuthorCache())
+    hash_csv = tmp_path / "hashes.csv"
+    pd.DataFrame({"hash": ["h1", "h2", "h3"], "year": [2019, 2019, 2020]}).to_csv(hash_csv, index=None)
+
+    neurips.save_neurips_info_sql(engine, hash_csv=hash_csv, batch_size=2)
+    assert engine.execute("SELECT COUNT(*) FROM papers").scalar() == 3
+    assert engine.execute("SELECT COUNT(*) FROM authors").scalar() == 3
+    assert engine.execute("SELECT COUNT(*) FROM paper_author").scalar() == 5
+
+    # Saved papers are skipped, known authors are reused
+    pd.DataFrame({"hash": ["h1", "h2", "h3", "h4", "h5"], "year": [2019] * 5}).to_csv(hash_csv, index=None)
+    neurips.save_neurips_info_sql(engine, hash_csv=hash_csv, batch_size=2)
+    assert engine.execute("SELECT COUNT(*) FROM papers").scalar() == 4
+    assert engine.execute("SELECT COUNT(*) FROM authors").scalar() == 3
+    # h5 couldn't be scraped: it isn't saved, so that the next run tries it again
+    assert engine.execute("SELECT COUNT(*) FROM papers WHERE hash = 'h5'").scalar() == 0
+    AUTHORS["h5"] = "Alan Turing"
+    try:
+        neurips.save_neurips_info_sql(engine, hash_csv=hash_csv, batch_size=2)
+    finally:
+        del AUTHORS["h5"]
+    assert engine.execute("SELECT title FROM papers WHERE hash = 'h5'").scalar() == "Paper h5"
+
+
+def test_save_neurips_info_sql_retries_legacy_stubs(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{(tmp_path / 'dataset.db').as_posix()}")
+    monkeypatch.setattr(neurips, "scrape_abstract", fake_scrape_abstract)
+    monkeypatch.setattr(neurips, "get_author_cache", lambda engine: AuthorCache())
+    hash_csv = tmp_path / "hashes.csv"
+    pd.DataFrame({"hash": ["h1", "h4"], "year": [2019, 2019]}).to_csv(hash_csv, index=None)
+    neurips.save_neurips_info_sql(engine, hash_csv=hash_csv)
+    # A row saved by an earlier version for a page it couldn't scrape
+    engine.execute("DELETE FROM paper_author WHERE paper_id = (SELECT id FROM papers WHERE hash = 'h4')")
+    engine.execute("UPDATE papers SET title = NULL, abstract = NULL WHERE hash = 'h4'")
+
+    neurips.save_neurips_info_sql(engine, hash_csv=hash_csv)
+    assert engine.execute("SELECT title FROM papers WHERE hash = 'h4'").fetchall() == [("Paper h4",)]
+    assert engine.execute("SELECT COUNT(*) FROM paper_author").scalar() == 3
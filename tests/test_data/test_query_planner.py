@@ -0,0 +1,115 @@
+import datetime as dt
+
+from sqlalchemy import create_engine
+
+from src.benchmarks import FIXTURES_DIR, arxiv_fixture_server
+from src.data import Base
+from src.data.harvest_jobs import open_window_job
+from src.data.harvester import TokenBucketLimiter
+from src.data.query_planner import DateWindow, DateWindowPlanner, harvest_arxiv_windows
+
+START = dt.datetime(2020, 1, 1)
+
+
+class FakePlanner(DateWindowPlanner):
+    """Counts results among fixed submission dates instead of querying the API"""
+
+    def __init__(self, submitted, **kwargs):
+        super().__init__(**kwargs)
+        self.submitted = submitted
+
+    def count(self, query, date_range):
+        self.requests += 1
+        first, last = date_range
+        return sum(first <= date <= last for date in self.submitted)
+
+
+def test_plan_windows_fit_under_cap():
+    # 1000 articles over 10 days, half of them on the last day
+    submitted = [START + dt.timedelta(minutes=14 * i) for i in range(500)]
+    submitted += [START + dt.timedelta(days=9, seconds=60 * i) for i in range(500)]
+    planner = FakePlanner(submitted, cap=100)
+    windows = planner.plan("machine learning", start=START, end=START + dt.timedelta(days=10))
+
+    assert all(window.total <= 100 for window in windows)
+    assert sum(window.total for window in windows) == 1000
+    for previous, window in zip(windows, windows[1:]):
+        assert previous.end < window.start
+
+
+def test_plan_keeps_earlier_windows_when_end_grows(tmp_path):
+    engine = create_engine(f"sqlite:///{(tmp_path / 'dataset.db').as_posix()}")
+    # About 70 articles a day over two months
+    submitted = [START + dt.timedelta(minutes=20 * i) for i in range(4000)]
+    planner = FakePlanner(submitted, cap=500)
+    first = planner.plan("machine learning", start=START, end=dt.datetime(2020, 1, 20, 13, 37))
+    second = planner.plan("machine learning", start=START, end=dt.datetime(2020, 2, 10, 8, 5))
+
+    assert all(window.total <= 500 for window in first + second)
+    assert {window.label for window in first[:-1]} <= {window.label for window in second}
+    # The windows of the first plan are resumed by the second one, only the last one starts over
+    jobs = {window.label: open_window_job(engine, window.label, window.total, 100).id for window in first}
+    resumed = [window.label for window in second if window.label in jobs]
+    assert resumed == [window.label for window in first[:-1]]
+    for window in second:
+        if window.label in jobs:
+            assert open_window_job(engine, window.label, window.total, 100).id == jobs[window.label]
+
+
+def test_harvest_arxiv_windows_dedupes_entries(tmp_path):
+    engine = create_engine(f"sqlite:///{(tmp_path / 'dataset.db').as_posix()}")
+    Base.metadata.create_all(engine)
+    # The fixture server replays the same page for both windows
+    windows = [
+        DateWindow(start=START, end=START + dt.timedelta(days=1), total=5),
+        DateWindow(start=START + dt.timedelta(days=2), end=START + dt.timedelta(days=3), total=5),
+    ]
+    planner = FakePlanner([])
+    planner.plan = lambda query, start, end: windows
+    with arxiv_fixture_server(FIXTURES_DIR / "arxiv" / "query_page.xml") as base_url:
+        stats = harvest_arxiv_windows(
+            "machine learning",
+            engine,
+            page_size=5,
+            limiter=TokenBucketLimiter(rate=100),
+            base_url=base_url,
+            planner=planner,
+        )
+    assert stats.pages == 2
+    assert stats.duplicates == 5
+    assert engine.execute("SELECT COUNT(*) FROM papers").scalar() == 5
+    assert engine.execute("SELECT COUNT(*) FROM harvest_jobs WHERE status = 'done'").scalar() == 2
+
+
+def test_harvest_arxiv_windows_skips_done_windows(tmp_path):
+    engine = create_engine(f"sqlite:///{(tmp_path / 'dataset.db').as_posix()}")
+    Base.metadata.create_all(engine)
+    windows = [
+        DateWindow(start=START, end=START + dt.timedelta(days=1), total=5),
+        DateWindow(start=START + dt.timedelta(days=2), end=START + dt.timedelta(days=3), total=10),
+    ]
+    planner = FakePlanner([])
+    planner.plan = lambda query, start, end: windows
+    # A previous run saved the first page of the second window only
+    job = open_window_job(engine, f"machine learning {windows[1].label}", 10, 5)
+    engine.execute(f"UPDATE harvest_jobs SET next_offset = 5, status = 'incomplete' WHERE id = {job.id}")
+
+    def harvest():
+        with arxiv_fixture_server(FIXTURES_DIR / "arxiv" / "query_page.xml") as base_url:
+            return harvest_arxiv_windows(
+                "machine learning",
+                engine,
+                page_size=5,
+                limiter=TokenBucketLimiter(rate=100),
+                base_url=base_url,
+                planner=planner,
+            )
+
+    # The second window resumes although its count changed
+    windows[1] = DateWindow(start=windows[1].start, end=windows[1].end, total=11)
+    assert harvest().pages == 3
+    assert engine.execute("SELECT COUNT(*) FROM harvest_jobs").scalar() == 2
+    assert engine.execute("SELECT COUNT(*) FROM harvest_jobs WHERE status = 'done'").scalar() == 2
+    # Nothing is left to fetch
+    assert harvest().pages == 0
+    assert engine.execute("SELECT COUNT(*) FROM harvest_jobs").scalar() == 2
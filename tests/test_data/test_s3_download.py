@@ -0,0 +1,66 @@
+import hashlib
+import json
+import os
+
+import boto3
+import pytest
+
+from src.data.integrity import CHECKSUM_FILE, ChecksumCache, verify_files
+from src.data.s3_download import STATUS_FILE, S3BulkDownloader
+
+moto = pytest.importorskip("moto")
+
+
+@pytest.fixture
+def s3_client():
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="arxiv")
+        yield client
+
+
+def test_download_all_resumes_partial_files(s3_client, tmp_path):
+    contents = {f"src/arXiv_src_0001_00{i}.tar": os.urandom(300_000 + i) for i in range(3)}
+    for key, body in contents.items():
+        s3_client.put_object(Bucket="arxiv", Key=key, Body=body)
+    # Simulates a crash halfway through the first file
+    (tmp_path / "arXiv_src_0001_000.tar.part").write_bytes(contents["src/arXiv_src_0001_000.tar"][:100_000])
+
+    downloader = S3BulkDownloader(tmp_path, client=s3_client, workers=2, chunk_size=64 * 1024)
+    summary = downloader.download_all([(key, len(body)) for key, body in contents.items()] + [("src/missing.tar", 10)])
+
+    assert summary == {"done": 3, "failed": 0, "missing": 1}
+    for key, body in contents.items():
+        assert (tmp_path / key.split("/")[-1]).read_bytes() == body
+    assert not list(tmp_path.glob("*.part"))
+    with open(tmp_path / STATUS_FILE) as f:
+        assert json.load(f)["src/arXiv_src_0001_001.tar"]["status"] == "done"
+
+
+def test_download_all_skips_done_files(s3_client, tmp_path):
+    s3_client.put_object(Bucket="arxiv", Key="src/a.tar", Body=b"tar")
+    S3BulkDownloader(tmp_path, client=s3_client).download_all([("src/a.tar", None)])
+    s3_client.delete_object(Bucket="arxiv", Key="src/a.tar")
+
+    summary = S3BulkDownloader(tmp_path, client=s3_client).download_all([("src/a.tar", None)])
+    assert summary["done"] == 1
+    assert (tmp_path / "a.tar").read_bytes() == b"tar"
+
+
+def test_streamed_md5_is_cached(s3_client, tmp_path):
+    body = os.urandom(200_000)
+    s3_client.put_object(Bucket="arxiv", Key="src/b.tar", Body=body)
+    (tmp_path / "b.tar.part").write_bytes(body[:50_000])
+    S3BulkDownloader(tmp_path, client=s3_client, chunk_size=64 * 1024).download_all([("src/b.tar", len(body))])
+
+    cache = ChecksumCache(tmp_path / CHECKSUM_FILE)
+    assert cache.get(tmp_path / "b.tar") == hashlib.md5(body).hexdigest()
+    assert verify_files({tmp_path / "b.tar": hashlib.md5(body).hexdigest()}, cache=cache) == []
+
+    # Any change of size or mtime invalidates the cached sum
+    (tmp_path / "b.tar").write_bytes(b"corrupted")
+    assert cache.get(tmp_path / "b.tar") is None
+    assert verify_files({tmp_path / "b.tar": hashlib.md5(body).hexdigest()}, cache=cache, workers=1) == [
+        tmp_path / "b.tar"
+    ]
@@ -0,0 +1,67 @@
+from sqlalchemy import create_engine, select
+
+from src.data import Base
+from src.data.db_models import Authors, Papers
+from src.data.schema import MIGRATIONS, schema_version, upgrade_schema
+
+
+def legacy_engine(tmp_path):
+    """A database created before the indexes, with duplicated authors and papers"""
+    engine = create_engine(f"sqlite:///{(tmp_path / 'dataset.db').as_posix()}")
+    for table in Base.metadata.sorted_tables:
+        if table.name != "schema_version":
+            table.create(engine)
+            for index in list(table.indexes):
+                index.drop(engine)
+    engine.execute(
+        "INSERT INTO papers (id, hash, title, dataset) VALUES "
+        "(1, 'h1', 'A', 'neurips'), (2, 'h1', 'A', 'neurips'), (3, 'h1', 'A', 'arxiv'), (4, 'h2', 'B', 'neurips')"
+    )
+    engine.execute(
+        "INSERT INTO authors (id, firstname, lastname) VALUES (1, 'Ada', 'Lovelace'), (2, 'Ada', 'Lovelace'), "
+        "(3, 'Alan', 'Turing')"
+    )
+    engine.execute("INSERT INTO paper_author VALUES (1, 1), (2, 2), (2, 3), (4, 2)")
+    engine.execute("INSERT INTO links (type, url, paper) VALUES ('pdf', 'http://a.pdf', 2)")
+    return engine
+
+
+def query_plan(engine, statement) -> str:
+    compiled = statement.compile(engine, compile_kwargs={"literal_binds": True})
+    return " ".join(str(row[-1]) for row in engine.execute(f"EXPLAIN QUERY PLAN {compiled}"))
+
+
+def test_upgrade_schema_merges_duplicates(tmp_path):
+    engine = legacy_engine(tmp_path)
+    assert schema_version(engine) == 0
+
+    assert upgrade_schema(engine) == MIGRATIONS[-1].version
+    assert engine.execute("SELECT id FROM papers ORDER BY id").fetchall() == [(1,), (3,), (4,)]
+    assert engine.execute("SELECT id FROM authors ORDER BY id").fetchall() == [(1,), (3,)]
+    assert engine.execute("SELECT * FROM paper_author ORDER BY paper_id, author_id").fetchall() == [
+        (1, 1),
+        (1, 3),
+        (4, 1),
+    ]
+    assert engine.execute("SELECT paper FROM links").scalar() == 1
+    indexes = {row[0] for row in engine.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"uq_papers_hash_dataset", "ix_papers_title", "uq_authors_name"} <= indexes
+
+    # Nothing left to apply
+    assert upgrade_schema(engine) == MIGRATIONS[-1].version
+    assert engine.execute("SELECT COUNT(*) FROM schema_version").scalar() == len(MIGRATIONS)
+
+
+def test_lookups_use_the_indexes(tmp_path):
+    engine = create_engine(f"sqlite:///{(tmp_path / 'dataset.db').as_posix()}")
+    upgrade_schema(engine)
+    lookups = {
+        "ix_papers_title": select(Papers.id).where(Papers.title.in_(["A", "B"])),
+        "uq_papers_hash_dataset": select(Papers.hash).where(Papers.hash.in_(["h1", "h2"])),
+        "ix_papers_dataset": select(Papers.id).where(Papers.dataset == "neurips"),
+        "ix_papers_year": select(Papers.id).where(Papers.year == 2020),
+        "uq_authors_name": select(Authors.id).where(Authors.lastname.in_(["Lovelace", "Turing"])),
+    }
+    for index, statement in lookups.items():
+        plan = query_plan(engine, statement)
+        assert index in plan and "SCAN" not in plan.replace("SCAN CONSTANT ROW", ""), plan